@@ -25,9 +25,6 @@ from PyQt4.QtXml import (
     QDomDocument,
     QDomElement
 )
-from PyQt4.QtCore import (
-    QTemporaryFile
-)
 from PyQt4.QtGui import (
     QApplication,
     QColor
@@ -38,6 +35,11 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 
+from .chart_image_cache import (
+    chart_image_cache,
+    chart_image_dpi,
+    chart_image_format
+)
 from .configuration_collection_base import (
     ConfigurationCollectionBase,
     LinkedTableValueHandler,
@@ -431,12 +433,56 @@ class ChartItemValueHandler(LinkedTableValueHandler):
         }
     def __init__(self, *args):
         LinkedTableValueHandler.__init__(self,*args)
-        self._fig, self._ax = plt.subplots()
+        #Figure is only created when the chart is not in the image cache
+        self._fig, self._ax = None, None
         self._legend_items = OrderedDict()
+        self._img_format = chart_image_format()
+        self._dpi = chart_image_dpi()
+
+    def init_figure(self):
+        """
+        Creates the figure and axes for plotting the chart.
+        """
+        self._fig, self._ax = plt.subplots()
+
+    def chart_key(self, *series):
+        """
+        :param series: Values plotted in the chart.
+        :return: Returns a hash of the chart configuration, series values,
+        size of the composer item and the image format and resolution.
+        :rtype: str
+        """
+        dom_doc = QDomDocument()
+        dom_doc.appendChild(self.config_item().to_dom_element(dom_doc))
+
+        size = ()
+        chart_item = self.composer_item()
+        if not chart_item is None:
+            rect = chart_item.rect()
+            size = (rect.width(), rect.height())
+
+        return chart_image_cache().key(
+            dom_doc.toString(),
+            series,
+            size,
+            self._img_format,
+            self._dpi
+        )
+
+    def set_cached_image(self, key):
+        """
+        Sets the picture path of the composer item to the cached image for
+        the given chart key.
+        :return: True if a cached image exists, else False.
+        :rtype: bool
+        """
+        img_path = chart_image_cache().get(key, self._img_format)
+        if img_path is None:
+            return False
 
-        #Clear figure and axes
-        #self.clear_figure()
-        #self.clear_axes()
+        self.composer_item().setPicturePath(img_path)
+
+        return True
 
     def add_legend_artist(self, label, artist):
         """
@@ -508,46 +554,53 @@ class ChartItemValueHandler(LinkedTableValueHandler):
         :type values: list
         :return: A sequence where 'None' types have been removed or
         replaced depending on the configuration of 'replace_none_by_zero' in
-        the configuration object.
+        the configuration object together with the indexes of the removed
+        values.
         :rtype: tuple
         """
-        val_arr = np.array(values)
+        val_arr = np.array(values, dtype=object)
+        none_mask = np.equal(val_arr, None)
+
         #Index of items to remove
         rem_idx = []
 
         if self.config_item().replace_none_by_zero():
-            val_arr = np.where(val_arr == np.array(None), 0, val_arr)
-            val_arr = val_arr.tolist()
+            val_arr[none_mask] = 0
 
         else:
-            rem_idx = list(np.where(val_arr == np.array(None))[0])
-            for i in rem_idx:
-                values.pop(i)
-
-            val_arr = values
+            rem_idx = np.flatnonzero(none_mask).tolist()
+            val_arr = val_arr[~none_mask]
 
-        return val_arr, rem_idx
+        return val_arr.tolist(), rem_idx
 
-    def render_plot(self, tight_layout=False):
+    def render_plot(self, key, tight_layout=False):
         """
-        Saves the pyplot instance as an image in the OS's temp folder
-        then refers the absolute path of the image to the QgsComposerPicture
-        item.
+        Saves the figure as an image in the chart image cache then refers
+        the absolute path of the image to the QgsComposerPicture item.
+        :param key: Chart key returned by 'chart_key'.
+        :type key: str
         """
-        chart_tmp = QTemporaryFile()
-        if chart_tmp.open():
-            tmp_file_name = chart_tmp.fileName()
+        if tight_layout:
+            self._fig.tight_layout()
 
-            if tight_layout:
-                plt.tight_layout()
+        def save_figure(img_path):
+            self._fig.savefig(img_path, format=self._img_format,
+                              dpi=self._dpi)
 
-            plt.savefig(tmp_file_name, format="tif", dpi=200)
+        try:
+            img_path = chart_image_cache().put(key, self._img_format,
+                                               save_figure)
 
-            #Set path of picture item
-            self.composer_item().setPicturePath(tmp_file_name)
+        except (IOError, OSError, ValueError) as ex:
+            raise RuntimeError(
+                "Chart item could not be rendered. {0}".format(ex)
+            )
 
-        else:
-            raise RuntimeError("Chart item could not be rendered")
+        finally:
+            plt.close(self._fig)
+
+        #Set path of picture item
+        self.composer_item().setPicturePath(img_path)
 
 class VerticalBarValueHandler(ChartItemValueHandler):
     """
@@ -584,6 +637,16 @@ class VerticalBarValueHandler(ChartItemValueHandler):
 
         x_values = column_values[self.config_item().x_field()]
 
+        #Use the cached image if the chart has been rendered before
+        key = self.chart_key(
+            x_values,
+            [column_values[vf] for vf in value_fields]
+        )
+        if self.set_cached_image(key):
+            return
+
+        self.init_figure()
+
         N = len(x_values)
         pos = np.arange(N)
         width = 0.35
@@ -597,10 +660,11 @@ class VerticalBarValueHandler(ChartItemValueHandler):
             if not value_cfg is None:
                 #Recode values accordingly
                 recoded_values, rem_idx = self._recode_values(column_values[vf])
+                if len(recoded_values) == 0:
+                    continue
 
-                #Remove values based on indexes containing invalid values
-                if len(rem_idx):
-                    pass
+                #Remove positions of the values that were removed
+                val_pos = np.delete(pos, rem_idx)
 
                 mv = max(recoded_values)
                 if mv > max_value:
@@ -608,7 +672,7 @@ class VerticalBarValueHandler(ChartItemValueHandler):
 
                 field_values = tuple(recoded_values)
                 x_delta = width * i
-                rect = self._ax.bar(pos + x_delta, field_values, width, color=value_cfg.fill_color())
+                rect = self._ax.bar(val_pos + x_delta, field_values, width, color=value_cfg.fill_color())
 
                 #Get legend label
                 legend_label = value_cfg.legend_name()
@@ -636,7 +700,7 @@ class VerticalBarValueHandler(ChartItemValueHandler):
         if self.config_item().insert_legend():
             self.insert_legend()
 
-        self.render_plot()
+        self.render_plot(key)
 
 class VerticalBarConfiguration(ChartConfiguration):
     """
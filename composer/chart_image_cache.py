@@ -0,0 +1,249 @@
+"""
+/***************************************************************************
+Name                 : Chart Image Cache
+Description          : Bounded on-disk cache of rendered chart images keyed
+                       by a hash of the chart configuration and data.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import glob
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+from PyQt4.QtCore import QDir
+
+from stdm.settings.registryconfig import registry_value
+
+LOGGER = logging.getLogger('stdm')
+
+CHART_CACHE_DIR = QDir.home().path() + '/.stdm/cache/charts'
+
+#Registry keys for the chart image settings
+CHART_IMAGE_FORMAT = 'ChartImageFormat'
+CHART_IMAGE_DPI = 'ChartImageDpi'
+
+DEFAULT_IMAGE_FORMAT = 'png'
+DEFAULT_IMAGE_DPI = 200
+
+#Maximum number of images retained in the cache
+MAX_CACHE_ENTRIES = 500
+
+#Fraction of the maximum number of images retained after an eviction
+EVICTION_RATIO = 0.9
+
+
+def chart_image_format():
+    """
+    :return: Returns the file format of rendered charts. Defaults to PNG.
+    :rtype: str
+    """
+    img_format = registry_value(CHART_IMAGE_FORMAT)
+    if not img_format:
+        return DEFAULT_IMAGE_FORMAT
+
+    return unicode(img_format).lower()
+
+
+def chart_image_dpi():
+    """
+    :return: Returns the resolution of rendered charts in dots per inch.
+    :rtype: int
+    """
+    dpi = registry_value(CHART_IMAGE_DPI)
+
+    try:
+        dpi = int(dpi)
+
+    except (TypeError, ValueError):
+        return DEFAULT_IMAGE_DPI
+
+    if dpi <= 0:
+        return DEFAULT_IMAGE_DPI
+
+    return dpi
+
+
+class ChartImageCache(object):
+    """
+    Stores rendered chart images in a directory where the file name is the
+    hash of the chart inputs. When the number of images exceeds the
+    maximum, the least recently used images are removed.
+    """
+    def __init__(self, cache_dir=CHART_CACHE_DIR,
+                 max_entries=MAX_CACHE_ENTRIES):
+        self._cache_dir = cache_dir
+        self._max_entries = max_entries
+        #Number of images in the cache, read on the first put
+        self._num_entries = None
+
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    @staticmethod
+    def key(*parts):
+        """
+        :param parts: Objects whose representation uniquely identifies a
+        chart e.g. configuration, series values, size and resolution.
+        :return: Returns a hash of the chart inputs.
+        :rtype: str
+        """
+        digest = hashlib.sha1()
+        for p in parts:
+            if isinstance(p, unicode):
+                p = p.encode('utf-8')
+
+            digest.update(repr(p))
+            digest.update('\0')
+
+        return digest.hexdigest()
+
+    def path(self, key, img_format):
+        """
+        :return: Returns the absolute path of the image for the given key.
+        :rtype: str
+        """
+        return u'{0}/{1}.{2}'.format(self._cache_dir, key, img_format)
+
+    def get(self, key, img_format):
+        """
+        :return: Returns the path of the cached image or None if there is
+        no image for the given key.
+        :rtype: str
+        """
+        img_path = self.path(key, img_format)
+        if not os.path.isfile(img_path):
+            return None
+
+        #Mark as recently used
+        try:
+            os.utime(img_path, None)
+
+        except OSError:
+            pass
+
+        return img_path
+
+    def put(self, key, img_format, render_func):
+        """
+        Renders an image for the given key and adds it to the cache. The
+        image is rendered to a temporary file which is then renamed so that
+        other processes sharing the cache never read a partial image.
+        :param render_func: Callable that writes the image to the path
+        passed to it.
+        :type render_func: function
+        :return: Returns the path of the rendered image.
+        :rtype: str
+        """
+        img_path = self.path(key, img_format)
+
+        #Hidden files are not listed in the cache entries
+        tmp_path = u'{0}/.{1}.{2}.{3}'.format(
+            self._cache_dir,
+            key,
+            uuid.uuid4().hex,
+            img_format
+        )
+
+        try:
+            render_func(tmp_path)
+
+            try:
+                os.rename(tmp_path, img_path)
+
+            except OSError:
+                #On Windows, the image may have been added by another process
+                if not os.path.isfile(img_path):
+                    raise
+
+        finally:
+            if os.path.isfile(tmp_path):
+                self._remove(tmp_path)
+
+        if self._num_entries is None:
+            self._num_entries = len(self._entries())
+
+        else:
+            self._num_entries += 1
+
+        if self._num_entries > self._max_entries:
+            self._evict(img_path)
+
+        return img_path
+
+    def clear(self):
+        """
+        Removes all images from the cache.
+        """
+        for img_path in self._entries():
+            self._remove(img_path)
+
+        self._num_entries = 0
+
+    def _entries(self):
+        return glob.glob(u'{0}/*'.format(self._cache_dir))
+
+    def _evict(self, keep_path):
+        #Evict below the maximum so that the next puts do not evict again
+        img_paths = self._entries()
+        excess = len(img_paths) - int(self._max_entries * EVICTION_RATIO)
+        self._num_entries = len(img_paths)
+        if excess <= 0:
+            return
+
+        img_paths.sort(key=self._mtime)
+        for img_path in img_paths:
+            if excess <= 0:
+                break
+
+            if img_path == keep_path:
+                continue
+
+            self._remove(img_path)
+            self._num_entries -= 1
+            excess -= 1
+
+    def _mtime(self, img_path):
+        try:
+            return os.path.getmtime(img_path)
+
+        except OSError:
+            return time.time()
+
+    def _remove(self, img_path):
+        try:
+            os.remove(img_path)
+
+        except OSError as ex:
+            LOGGER.debug('Could not remove cached chart image. {}'.format(ex))
+
+
+_CHART_IMAGE_CACHE = None
+
+
+def chart_image_cache():
+    """
+    :return: Returns the chart image cache shared by the chart value
+    handlers.
+    :rtype: ChartImageCache
+    """
+    global _CHART_IMAGE_CACHE
+
+    if _CHART_IMAGE_CACHE is None:
+        _CHART_IMAGE_CACHE = ChartImageCache()
+
+    return _CHART_IMAGE_CACHE
@@ -17,7 +17,9 @@ email                : gkahiu@gmail.com
  ***************************************************************************/
 """
 import uuid
+import hashlib
 import logging
+import os
 from datetime import date, datetime
 from numbers import Number
 
@@ -60,10 +62,6 @@ from qgis.utils import (
 from sqlalchemy.exc import ProgrammingError, SQLAlchemyError
 
 from sqlalchemy.sql.expression import text
-from sqlalchemy.schema import (
-    Table,
-    MetaData
-)
 
 from stdm.settings.registryconfig import RegistryConfig
 from stdm.data.pg_utils import (
@@ -75,6 +73,10 @@ from stdm.data.database import STDMDb
 from stdm.settings import (
     current_profile
 )
+from stdm.network import (
+    content_document_path,
+    is_content_hash
+)
 from stdm.ui.sourcedocument import (
     network_document_path
 )
@@ -84,8 +86,14 @@ from stdm.ui.forms.widgets import EntityValueFormatter
 from .composer_data_source import ComposerDataSource
 from .composer_wrapper import load_table_layers
 from .chart_configuration import ChartConfigurationCollection
+from .generation_manifest import (
+    DocumentManifest,
+    file_hash,
+    rows_digest
+)
 from .spatial_fields_config import SpatialFieldsConfiguration
 from .photo_configuration import PhotoConfigurationCollection
+from .sub_report_cache import SubReportRowCache
 from .table_configuration import TableConfigurationCollection
 
 LOGGER = logging.getLogger('stdm')
@@ -106,6 +114,12 @@ class DocumentGenerator(QObject):
         self._map_renderer = self._iface.mapCanvas().mapRenderer()
         
         self._dbSession = STDMDb.instance().session
+
+        #Rows of the data source and linked tables for a batch of records
+        self._row_cache = SubReportRowCache(
+            self._dbSession,
+            STDMDb.instance().engine
+        )
         
         self._attr_value_formatters = {}
 
@@ -115,6 +129,14 @@ class DocumentGenerator(QObject):
         
         #For cleanup after document compositions have been created
         self._map_memory_layers = []
+
+        #Memory layers re-used across records, keyed by map item id,
+        # spatial field, geometry type and SRID.
+        self._spatial_layer_pool = {}
+
+        #Geometry type and SRID of spatial fields in data sources
+        self._geometry_types = {}
+
         self.map_registry = QgsMapLayerRegistry.instance()
         self._table_mem_layers = []
         self._feature_ids = []
@@ -126,6 +148,12 @@ class DocumentGenerator(QObject):
         #Value formatter for output files
         self._file_name_value_formatter = None
 
+        #Manifests of output directories and template file hashes for
+        # regenerating changed documents only.
+        self._manifests = {}
+        self._manifest_worker = None
+        self._template_hashes = {}
+
     def link_field(self):
         """
         :return: The field name in the data source that should also exist
@@ -232,6 +260,78 @@ class DocumentGenerator(QObject):
 
         return composer_ds, ""
         
+    def prefetch(self, template_path, entity_field_name, entity_field_values):
+        """
+        Fetches the data source rows and the rows of the linked tables
+        referenced by the chart and photo configurations for a batch of
+        records. One query is executed per linked table instead of one per
+        configuration item per record. Subsequent calls to 'run' for the
+        values in the batch use the prefetched rows.
+        :param template_path: The file path to the user-defined template.
+        :type template_path: str
+        :param entity_field_name: Name of the column used to filter the
+        records in the data source.
+        :type entity_field_name: str
+        :param entity_field_values: Values of the records in the batch.
+        :type entity_field_values: list
+        :return: True if the rows were prefetched, else False.
+        :rtype: bool
+        """
+        template_doc, err_msg = self.template_document(template_path)
+        if template_doc is None:
+            return False
+
+        composer_ds = ComposerDataSource.create(template_doc)
+        if not self.data_source_exists(composer_ds):
+            return False
+
+        records = self._row_cache.prefetch(
+            composer_ds.name(),
+            entity_field_name,
+            entity_field_values
+        )
+        if len(records) == 0:
+            return False
+
+        chart_config_collection = ChartConfigurationCollection.create(
+            template_doc
+        )
+        for cc in chart_config_collection.items().values():
+            self._row_cache.prefetch(
+                cc.linked_table(),
+                cc.linked_field(),
+                [getattr(r, cc.source_field(), None) for r in records]
+            )
+
+        ph_config_collection = PhotoConfigurationCollection.create(
+            template_doc
+        )
+        supporting_doc_ids = set()
+        for conf in ph_config_collection.items().values():
+            photo_rows = self._row_cache.prefetch(
+                conf.linked_table(),
+                conf.linked_field(),
+                [getattr(r, conf.source_field(), None) for r in records]
+            )
+            supporting_doc_ids.update(
+                [getattr(r, 'supporting_doc_id', None) for r in photo_rows]
+            )
+
+        if len(supporting_doc_ids) > 0:
+            self._row_cache.prefetch(
+                self._current_profile.supporting_document.name,
+                'id',
+                supporting_doc_ids
+            )
+
+        return True
+
+    def clear_prefetched_rows(self):
+        """
+        Removes the rows fetched for the last batch of records.
+        """
+        self._row_cache.clear()
+
     def run(self, *args, **kwargs):
         """
         :param templatePath: The file path to the user-defined template.
@@ -248,6 +348,11 @@ class DocumentGenerator(QObject):
         :param data_source: Name of the data source table or view whose
         row values will be used to name output files if the options has been
         specified by the user.
+        :param outputDir: Directory for multiple mode output. Defaults to the
+        composer output directory in the registry.
+        :param changedOnly: True to skip records whose template and data
+        have not changed since the document was last generated. The inputs
+        are tracked in a manifest in the output directory.
         """
         templatePath = args[0]
         entityFieldName = args[1]
@@ -257,6 +362,8 @@ class DocumentGenerator(QObject):
         dataFields = kwargs.get("dataFields", [])
         fileExtension = kwargs.get("fileExtension", "")
         data_source = kwargs.get("data_source", "")
+        outputDir = kwargs.get("outputDir", None)
+        changedOnly = kwargs.get("changedOnly", False)
         
         templateFile = QFile(templatePath)
         
@@ -307,14 +414,42 @@ class DocumentGenerator(QObject):
                 return False, QApplication.translate("DocumentGenerator",
                                                     "No matching records in the database")
             
+            if changedOnly:
+                template_hash = self._template_hash(templatePath)
+
             """
             Iterate through records where a single file output will be generated for each matching record.
             """
 
             for rec in records:
+                docPath, err_msg = self._document_path(
+                    filePath,
+                    data_source,
+                    entityFieldName,
+                    entityFieldValue,
+                    dataFields,
+                    fileExtension,
+                    outputDir
+                )
+                if err_msg:
+                    return False, err_msg
+
+                #Skip the record if its inputs have not changed
+                if changedOnly and docPath:
+                    manifest = self._manifest(os.path.dirname(docPath))
+                    data_digest = self._record_digest(
+                        rec,
+                        ph_config_collection,
+                        table_config_collection,
+                        chart_config_collection
+                    )
+                    if manifest.is_current(docPath, template_hash,
+                                           data_digest):
+                        manifest.skip(docPath)
+                        continue
+
                 composition = QgsComposition(self._map_renderer)
                 composition.loadFromTemplate(templateDoc)
-                ref_layer = None
                 #Set value of composer items based on the corresponding db values
                 for composerId in composerDS.dataFieldMappings().reverse:
                     #Use composer item id since the uuid is stripped off
@@ -334,130 +469,362 @@ class DocumentGenerator(QObject):
                 self._refresh_composer_maps(composition,
                                             spatialFieldsConfig.spatialFieldsMapping().keys())
 
-                # Create memory layers for spatial features and add them to the map
+                # Fill the pooled memory layers with the record's features
+                self._clear_pooled_layer_features()
                 for mapId,spfmList in spatialFieldsConfig.spatialFieldsMapping().iteritems():
 
                     map_item = composition.getComposerItemById(mapId)
 
                     if not map_item is None:
-                        # #Clear any previous map memory layer
-                        #self.clear_temporary_map_layers()
+                        map_extent = None
 
                         for spfm in spfmList:
-                            #Use the value of the label field to name the layer
-                            lbl_field = spfm.labelField()
-                            spatial_field = spfm.spatialField()
-
-                            if not spatial_field:
-                                continue
-
-                            if lbl_field:
-                                if hasattr(rec, spfm.labelField()):
-                                    layerName = getattr(rec, spfm.labelField())
-
-                                else:
-                                    layerName = self._random_feature_layer_name(spatial_field)
-                            else:
-                                layerName = self._random_feature_layer_name(spatial_field)
-
-                            #Extract the geometry using geoalchemy spatial capabilities
-                            geom_value = getattr(rec, spatial_field)
-                            if geom_value is None:
-                                continue
-
-                            geom_func = geom_value.ST_AsText()
-                            geomWKT = self._dbSession.scalar(geom_func)
-
-                            #Get geometry type
-                            geom_type, srid = geometryType(composerDS.name(),
-                                                          spatial_field)
-
-                            #Create reference layer with feature
-                            ref_layer = self._build_vector_layer(layerName, geom_type, srid)
-
-                            if ref_layer is None or not ref_layer.isValid():
-                                continue
-                            #Add feature
-                            bbox = self._add_feature_to_layer(ref_layer, geomWKT)
-                            bbox.scale(spfm.zoomLevel())
-
-                            #Workaround for zooming to single point extent
-                            if ref_layer.wkbType() == QGis.WKBPoint:
-                                canvas_extent = self._iface.mapCanvas().fullExtent()
-                                cnt_pnt = bbox.center()
-                                canvas_extent.scale(1.0/32, cnt_pnt)
-                                bbox = canvas_extent
-
-                            #Style layer based on the spatial field mapping symbol layer
-                            symbol_layer = spfm.symbolLayer()
-                            if not symbol_layer is None:
-                                ref_layer.rendererV2().symbols()[0].changeSymbolLayer(0,spfm.symbolLayer())
-                            '''
-                            Add layer to map and ensure its always added at the top
-                            '''
-                            self.map_registry.addMapLayer(ref_layer)
-                            self._iface.mapCanvas().setExtent(bbox)
-                            self._iface.mapCanvas().refresh()
-                            # Add layer to map memory layer list
-                            self._map_memory_layers.append(ref_layer.id())
-                            self._hide_layer(ref_layer)
+                            bbox = self._set_spatial_field_feature(
+                                composerDS.name(),
+                                mapId,
+                                spfm,
+                                rec
+                            )
+                            if not bbox is None:
+                                map_extent = bbox
+
                         '''
                         Use root layer tree to get the correct ordering of layers
                         in the legend
                         '''
-                        self._refresh_map_item(map_item)
+                        self._refresh_map_item(
+                            map_item,
+                            map_extent,
+                            self._map_pooled_layer_ids(mapId)
+                        )
 
                 #Extract chart information and generate chart
                 self._generate_charts(composition, chart_config_collection, rec)
 
-                #Build output path and generate composition
-                if not filePath is None and len(dataFields) == 0:
-                    self._write_output(composition, outputMode, filePath)
-                    
-                elif filePath is None and len(dataFields) > 0:
-                    docFileName = self._build_file_name(data_source, entityFieldName,
-                                                      entityFieldValue, dataFields, fileExtension)
-
-                    # Replace unsupported characters in Windows file naming
-                    docFileName = docFileName.replace('/', '_').replace \
-                        ('\\', '_').replace(':', '_').strip('*?"<>|')
-
-
-                    if not docFileName:
-                        return (False, QApplication.translate("DocumentGenerator",
-                                    "File name could not be generated from the data fields."))
-                        
-                    outputDir = self._composer_output_path()
-                    if outputDir is None:
-                        return (False, QApplication.translate("DocumentGenerator",
-                            "System could not read the location of the output directory in the registry."))
-                    
-                    qDir = QDir()
-                    if not qDir.exists(outputDir):
-                        return (False, QApplication.translate("DocumentGenerator",
-                                "Output directory does not exist"))
+                #Generate composition
+                if docPath:
+                    self._write_output(composition, outputMode, docPath)
 
-                    absDocPath = u"{0}/{1}".format(outputDir, docFileName)
-                    self._write_output(composition, outputMode, absDocPath)
+                    if changedOnly:
+                        manifest.update(docPath, template_hash, data_digest)
 
             return True, "Success"
 
         return False, "Document composition could not be generated"
 
+    def _document_path(self, filePath, data_source, entityFieldName,
+                       entityFieldValue, dataFields, fileExtension,
+                       outputDir):
+        """
+        Builds the absolute path of the output document.
+        :return: A tuple containing the document path, which is None if no
+        output will be written, and error message where applicable.
+        :rtype: tuple
+        """
+        if not filePath is None and len(dataFields) == 0:
+            return filePath, ""
+
+        if not filePath is None or len(dataFields) == 0:
+            return None, ""
+
+        docFileName = self._build_file_name(data_source, entityFieldName,
+                                          entityFieldValue, dataFields, fileExtension)
+
+        # Replace unsupported characters in Windows file naming
+        docFileName = docFileName.replace('/', '_').replace \
+            ('\\', '_').replace(':', '_').strip('*?"<>|')
+
+        if not docFileName:
+            return (None, QApplication.translate("DocumentGenerator",
+                        "File name could not be generated from the data fields."))
+
+        if not outputDir:
+            outputDir = self._composer_output_path()
+        if outputDir is None:
+            return (None, QApplication.translate("DocumentGenerator",
+                "System could not read the location of the output directory in the registry."))
+
+        qDir = QDir()
+        if not qDir.exists(outputDir):
+            return (None, QApplication.translate("DocumentGenerator",
+                    "Output directory does not exist"))
+
+        return u"{0}/{1}".format(outputDir, docFileName), ""
+
+    def _template_hash(self, template_path):
+        """
+        :return: Returns the hash of the template file. The hash is only
+        recomputed when the file has been modified.
+        :rtype: str
+        """
+        key = (template_path, os.path.getmtime(template_path))
+        if not key in self._template_hashes:
+            self._template_hashes[key] = file_hash(template_path)
+
+        return self._template_hashes[key]
+
+    def _manifest(self, output_dir):
+        """
+        :return: Returns the manifest of the documents in the output
+        directory.
+        :rtype: DocumentManifest
+        """
+        manifest = self._manifests.get(output_dir, None)
+        if manifest is None:
+            manifest = DocumentManifest(output_dir, self._manifest_worker)
+            self._manifests[output_dir] = manifest
+
+        return manifest
+
+    def _record_digest(self, record, ph_config_collection,
+                       table_config_collection, chart_config_collection):
+        """
+        Computes a digest of the data source record and the rows of the
+        linked tables used by the photo, table and chart items.
+        :return: Hexadecimal digest of the record's inputs.
+        :rtype: str
+        """
+        digest = hashlib.sha1()
+        rows_digest(digest, [record])
+
+        linked_configs = []
+        linked_configs.extend(table_config_collection.items().values())
+        linked_configs.extend(chart_config_collection.items().values())
+
+        for conf in linked_configs:
+            if not conf.linked_table() or not conf.linked_field():
+                continue
+
+            source_value = getattr(record, conf.source_field(), None)
+            if source_value is None:
+                source_value = ""
+
+            ds_table, results = self._exec_query(
+                conf.linked_table(),
+                conf.linked_field(),
+                source_value
+            )
+            rows_digest(digest, results)
+
+        supporting_doc_base = self._current_profile.supporting_document.name
+        for conf in ph_config_collection.items().values():
+            ph_table, results = self._exec_query(
+                conf.linked_table(),
+                conf.linked_field(),
+                getattr(record, conf.source_field(), '')
+            )
+            rows_digest(digest, results)
+
+            for r in results:
+                doc_table, doc_results = self._exec_query(
+                    supporting_doc_base,
+                    'id',
+                    r.supporting_doc_id
+                )
+                rows_digest(digest, doc_results)
+
+        return digest.hexdigest()
+
+    def set_manifest_worker(self, worker):
+        """
+        Sets the identifier of the render farm worker running the
+        generator. The worker writes the generated documents to its own
+        manifest, which is merged by the render farm.
+        :param worker: Identifier of the worker, unique within a run.
+        :type worker: int
+        """
+        self._manifest_worker = worker
+
+    def save_manifests(self):
+        """
+        Writes the manifests of the output directories used in the
+        current session. This should be called once a batch of documents
+        has been generated using the 'changedOnly' option.
+        """
+        for manifest in self._manifests.values():
+            manifest.save()
+
+    def manifest_report(self):
+        """
+        :return: Returns a summary of the documents that were skipped and
+        rebuilt since the last call to 'reset_manifest_report'.
+        :rtype: str
+        """
+        return u'\n\n'.join([m.report() for m in self._manifests.values()])
+
+    def manifest_documents(self):
+        """
+        :return: Returns the paths of the documents that were rebuilt and
+        those that were skipped since the last call to
+        'reset_manifest_report'.
+        :rtype: tuple
+        """
+        rebuilt = []
+        skipped = []
+
+        for manifest in self._manifests.values():
+            rebuilt.extend(manifest.rebuilt())
+            skipped.extend(manifest.skipped())
+
+        return rebuilt, skipped
+
+    def reset_manifest_report(self):
+        """
+        Clears the lists of skipped and rebuilt documents.
+        """
+        for manifest in self._manifests.values():
+            manifest.reset_report()
+
     def _random_feature_layer_name(self, sp_field):
         return u"{0}-{1}".format(sp_field, str(uuid.uuid4())[0:8])
 
-    def _refresh_map_item(self, map_item):
+    def _geometry_type(self, data_source, spatial_field):
+        """
+        :return: Returns a tuple of geometry type and SRID of the spatial
+        field in the data source. The values are only read from the
+        database the first time.
+        :rtype: tuple
+        """
+        key = (data_source, spatial_field)
+        if not key in self._geometry_types:
+            self._geometry_types[key] = geometryType(data_source,
+                                                     spatial_field)
+
+        return self._geometry_types[key]
+
+    def _pooled_layer(self, map_id, spfm, geom_type, srid):
+        """
+        Returns the memory layer for the spatial field mapping. The layer is
+        created, styled and added to the map layer registry the first time
+        it is requested and is thereafter re-used for subsequent records.
+        :param map_id: Composer map item id.
+        :type map_id: str
+        :param spfm: Spatial field mapping.
+        :type spfm: SpatialFieldMapping
+        :return: Memory layer or None if it could not be created.
+        :rtype: QgsVectorLayer
+        """
+        key = (map_id, spfm.spatialField(), geom_type, srid)
+        ref_layer = self._spatial_layer_pool.get(key, None)
+
+        if not ref_layer is None:
+            return ref_layer
+
+        ref_layer = self._build_vector_layer(
+            self._random_feature_layer_name(spfm.spatialField()),
+            geom_type,
+            srid
+        )
+
+        if ref_layer is None or not ref_layer.isValid():
+            return None
+
+        #Style layer based on the spatial field mapping symbol layer
+        symbol_layer = spfm.symbolLayer()
+        if not symbol_layer is None:
+            ref_layer.rendererV2().symbols()[0].changeSymbolLayer(0, symbol_layer)
+
+        '''
+        Add layer to map and ensure its always added at the top
+        '''
+        self.map_registry.addMapLayer(ref_layer)
+        self._map_memory_layers.append(ref_layer.id())
+        self._hide_layer(ref_layer)
+        self._spatial_layer_pool[key] = ref_layer
+
+        return ref_layer
+
+    def _map_pooled_layer_ids(self, map_id):
+        """
+        :param map_id: Composer map item id.
+        :type map_id: str
+        :return: Returns the ids of the pooled memory layers of the map
+        item.
+        :rtype: list
+        """
+        return [
+            ref_layer.id()
+            for key, ref_layer in self._spatial_layer_pool.iteritems()
+            if key[0] == map_id
+        ]
+
+    def _clear_pooled_layer_features(self):
         """
-        Updates the map item with the current extents and layer set in the
-        map canvas.
+        Removes the features of the previous record from the pooled memory
+        layers.
         """
+        for ref_layer in self._spatial_layer_pool.values():
+            ref_layer.dataProvider().deleteFeatures(ref_layer.allFeatureIds())
+
+    def _set_spatial_field_feature(self, data_source, map_id, spfm, record):
+        """
+        Adds the geometry of the record's spatial field to the corresponding
+        pooled memory layer.
+        :return: Returns the extent to be used by the map item or None if
+        there is no geometry for the record.
+        :rtype: QgsRectangle
+        """
+        spatial_field = spfm.spatialField()
+        if not spatial_field:
+            return None
+
+        #Extract the geometry using geoalchemy spatial capabilities
+        geom_value = getattr(record, spatial_field)
+        if geom_value is None:
+            return None
+
+        geom_type, srid = self._geometry_type(data_source, spatial_field)
+
+        ref_layer = self._pooled_layer(map_id, spfm, geom_type, srid)
+        if ref_layer is None:
+            return None
+
+        #Use the value of the label field to name the layer
+        lbl_field = spfm.labelField()
+        if lbl_field and hasattr(record, lbl_field):
+            ref_layer.setLayerName(unicode(getattr(record, lbl_field)))
+
+        geom_func = geom_value.ST_AsText()
+        geomWKT = self._dbSession.scalar(geom_func)
+
+        #Add feature
+        bbox = self._add_feature_to_layer(ref_layer, geomWKT)
+        bbox.scale(spfm.zoomLevel())
+
+        #Workaround for zooming to single point extent
+        if ref_layer.wkbType() == QGis.WKBPoint:
+            canvas_extent = self._iface.mapCanvas().fullExtent()
+            cnt_pnt = bbox.center()
+            canvas_extent.scale(1.0/32, cnt_pnt)
+            bbox = canvas_extent
+
+        return bbox
+
+    def _refresh_map_item(self, map_item, extent=None, pooled_ids=None):
+        """
+        Updates the map item with the given extent, or the current extent of
+        the map canvas if not specified, and the layer set in the map
+        canvas. The pooled memory layers remain in the map layer registry
+        between records hence only those of the map item, in 'pooled_ids',
+        are included on top of the project layers.
+        """
+        if pooled_ids is None:
+            pooled_ids = []
+
         mode = map_item.previewMode()
         if mode == QgsComposerMap.Rectangle:
             tree_layers = QgsProject.instance().layerTreeRoot().findLayers()
-            layer_ids = [lyt.layerId() for lyt in tree_layers]
+            layer_ids = list(pooled_ids)
+            layer_ids.extend([
+                lyt.layerId() for lyt in tree_layers
+                if not lyt.layerId() in self._map_memory_layers
+            ])
             map_item.setLayerSet(layer_ids)
-            map_item.zoomToExtent(self._map_renderer.extent())
+
+            if extent is None:
+                extent = self._map_renderer.extent()
+
+            map_item.zoomToExtent(extent)
 
     def _refresh_composer_maps(self, composition, ignore_ids):
         """
@@ -475,6 +842,7 @@ class DocumentGenerator(QObject):
         used to create the composition.
         """
         self._clear_layers(self._map_memory_layers)
+        self._spatial_layer_pool = {}
 
     def clear_temporary_table_layers(self):
         """
@@ -493,7 +861,7 @@ class DocumentGenerator(QObject):
         if layers is None:
             return
         try:
-            for lyr_id in layers:
+            for lyr_id in list(layers):
                 self.map_registry.removeMapLayer(lyr_id)
                 layers.remove(lyr_id)
 
@@ -700,6 +1068,15 @@ class DocumentGenerator(QObject):
             return
 
         img_extension = extensions[1]
+        if is_content_hash(doc_id):
+            abs_path = content_document_path(
+                network_ph_path, doc_id, u'.{0}'.format(img_extension)
+            )
+            if QFile.exists(abs_path):
+                self._composeritem_value_handler(pic_item, abs_path)
+
+            return
+
         profile_name = self._current_profile.name.replace(' ', '_').lower()
         abs_path = u'{0}/{1}/{2}/{3}/{4}.{5}'.format(
             network_ph_path,
@@ -815,9 +1192,17 @@ class DocumentGenerator(QObject):
         Reflects the data source then execute the query using the specified
         query parameters.
         Returns a tuple containing the reflected table and results of the query.
+        Rows that have been prefetched for the current batch of records are
+        returned without querying the database.
         """
-        meta = MetaData(bind=STDMDb.instance().engine)
-        dsTable = Table(dataSourceName, meta, autoload=True)
+        dsTable = self._row_cache.table(dataSourceName)
+
+        if queryField:
+            results = self._row_cache.rows(dataSourceName, queryField,
+                                           queryValue)
+            if not results is None:
+                return dsTable, results
+
         try:
             if not queryField and not queryValue:
                 #Return all the rows; this is currently limited to 100 rows
@@ -910,4 +1295,4 @@ class DocumentGenerator(QObject):
                 composer_item.setPictureFile(value)
 
             
-    
\ No newline at end of file
+    
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""
+/***************************************************************************
+Name                 : Document Generation Manifest
+Description          : Records the template and data inputs of generated
+                       documents so that unchanged documents can be skipped
+                       when regenerating.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import uuid
+
+from PyQt4.QtGui import QApplication
+
+LOGGER = logging.getLogger('stdm')
+
+#Name of the manifest file in the output directory
+MANIFEST_FILE = '.stdm_manifest.json'
+
+#Name of the manifest files written by render farm workers, which are
+#merged into the manifest of the output directory once the run finishes
+WORKER_MANIFEST_FILE = '.stdm_manifest.{0}.json'
+
+#Number of updates after which the manifest is written to file
+SAVE_INTERVAL = 50
+
+
+def file_hash(path, block_size=65536):
+    """
+    :param path: Absolute path of the file.
+    :type path: str
+    :return: Returns the SHA-1 hash of the file contents.
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+
+    with open(path, 'rb') as f:
+        block = f.read(block_size)
+        while block:
+            digest.update(block)
+            block = f.read(block_size)
+
+    return digest.hexdigest()
+
+
+def _value_text(value):
+    #Geometry elements are represented by their WKB/WKT description
+    desc = getattr(value, 'desc', None)
+    if not desc is None:
+        return unicode(desc)
+
+    return unicode(value)
+
+
+def rows_digest(digest, rows):
+    """
+    Updates the digest with the column values of the rows.
+    :param digest: Hash object to be updated.
+    :type digest: object
+    :param rows: Result set rows.
+    :type rows: list
+    """
+    if rows is None:
+        digest.update('\0')
+
+        return
+
+    for r in rows:
+        values = u'\x1f'.join([_value_text(v) for v in r])
+        digest.update(values.encode('utf-8'))
+        digest.update('\x1e')
+
+    digest.update('\x1d')
+
+
+def manifest_report(rebuilt, skipped):
+    """
+    :param rebuilt: Paths of the documents that were generated.
+    :type rebuilt: list
+    :param skipped: Paths of the unchanged documents that were skipped.
+    :type skipped: list
+    :return: Returns a summary of the documents that were skipped and
+    rebuilt.
+    :rtype: str
+    """
+    lines = [
+        QApplication.translate(
+            'DocumentManifest',
+            u'{0} document(s) rebuilt, {1} unchanged document(s) '
+            u'skipped.'.format(len(rebuilt), len(skipped))
+        )
+    ]
+
+    if len(rebuilt) > 0:
+        lines.append(QApplication.translate('DocumentManifest',
+                                            'Rebuilt:'))
+        lines.extend([os.path.basename(p) for p in rebuilt])
+
+    if len(skipped) > 0:
+        lines.append(QApplication.translate('DocumentManifest',
+                                            'Skipped:'))
+        lines.extend([os.path.basename(p) for p in skipped])
+
+    return u'\n'.join(lines)
+
+
+def _read_entries(path):
+    """
+    :return: Returns the entries in the manifest file, an empty
+    dictionary if the file does not exist or None if it could not be read.
+    :rtype: dict
+    """
+    if not os.path.isfile(path):
+        return {}
+
+    try:
+        with open(path, 'rb') as f:
+            return json.load(f)
+
+    except (IOError, ValueError) as ex:
+        LOGGER.debug('Could not read document manifest. {}'.format(ex))
+
+        return None
+
+
+def _write_entries(path, entries):
+    """
+    Writes the entries to a temporary file which then replaces the
+    manifest file so that other processes never read a partial manifest.
+    :return: True if the manifest was written, else False.
+    :rtype: bool
+    """
+    tmp_path = u'{0}.{1}.tmp'.format(path, uuid.uuid4().hex)
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            json.dump(entries, f, indent=1, sort_keys=True)
+
+        #On Windows, an existing file cannot be renamed onto
+        if os.path.isfile(path) and sys.platform == 'win32':
+            os.remove(path)
+        os.rename(tmp_path, path)
+
+        return True
+
+    except (IOError, OSError) as ex:
+        LOGGER.debug('Could not write document manifest. {}'.format(ex))
+
+        return False
+
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
+
+def _worker_manifest_paths(output_dir):
+    prefix, suffix = WORKER_MANIFEST_FILE.split('{0}')
+
+    try:
+        names = os.listdir(output_dir)
+
+    except OSError:
+        return []
+
+    return [
+        os.path.join(output_dir, n) for n in sorted(names)
+        if n.startswith(prefix) and n.endswith(suffix) and
+        n != MANIFEST_FILE
+    ]
+
+
+def merge_worker_manifests(output_dir):
+    """
+    Adds the entries of the manifests written by render farm workers to
+    the manifest of the output directory and removes the worker manifests.
+    Worker manifests are left in place if the manifest of the output
+    directory cannot be read, so that they are merged in a later run.
+    :param output_dir: Directory where the documents were written to.
+    :type output_dir: str
+    :return: Returns the number of worker manifests that were merged.
+    :rtype: int
+    """
+    worker_paths = _worker_manifest_paths(output_dir)
+    if len(worker_paths) == 0:
+        return 0
+
+    path = u'{0}/{1}'.format(output_dir, MANIFEST_FILE)
+    entries = _read_entries(path)
+    if entries is None:
+        return 0
+
+    merged = []
+    for worker_path in worker_paths:
+        worker_entries = _read_entries(worker_path)
+        if worker_entries is None:
+            continue
+
+        entries.update(worker_entries)
+        merged.append(worker_path)
+
+    if not _write_entries(path, entries):
+        return 0
+
+    for worker_path in merged:
+        try:
+            os.remove(worker_path)
+
+        except OSError as ex:
+            LOGGER.debug('Could not remove worker manifest. {}'.format(ex))
+
+    return len(merged)
+
+
+class DocumentManifest(object):
+    """
+    Manifest of the documents generated in an output directory. For each
+    document, the hash of the template file and the digest of the data
+    source row and sub-report rows used to generate it are stored.
+    A render farm worker writes the documents it generates to its own
+    manifest file, see 'merge_worker_manifests'.
+    """
+    def __init__(self, output_dir, worker=None):
+        self._path = u'{0}/{1}'.format(output_dir, MANIFEST_FILE)
+        self._worker_path = None
+        if not worker is None:
+            self._worker_path = u'{0}/{1}'.format(
+                output_dir,
+                WORKER_MANIFEST_FILE.format(worker)
+            )
+        self._entries = {}
+        self._updated = {}
+        self._skipped = []
+        self._rebuilt = []
+        self._unsaved = 0
+        self.load()
+
+    def load(self):
+        """
+        Reads the manifest from the output directory. If the manifest
+        cannot be read, all the documents are regenerated.
+        """
+        self._entries = _read_entries(self._path) or {}
+        self._updated = {}
+
+    def save(self):
+        """
+        Writes the manifest to the output directory, or the entries updated
+        by a worker to the worker's manifest. Entries written by other
+        processes since the manifest was loaded are retained. The manifest
+        is not overwritten if it exists but cannot be read.
+        """
+        if not self._worker_path is None:
+            if _write_entries(self._worker_path, self._updated):
+                self._unsaved = 0
+
+            return
+
+        entries = _read_entries(self._path)
+        if entries is None:
+            return
+
+        entries.update(self._updated)
+        if _write_entries(self._path, entries):
+            self._entries = entries
+            self._unsaved = 0
+
+    def is_current(self, doc_path, template_hash, data_digest):
+        """
+        :param doc_path: Absolute path of the output document.
+        :type doc_path: str
+        :return: Returns True if the document exists and was generated
+        from the same template and data, else False.
+        :rtype: bool
+        """
+        entry = self._entries.get(os.path.basename(doc_path), None)
+        if entry is None:
+            return False
+
+        if not os.path.isfile(doc_path):
+            return False
+
+        return entry.get('template', '') == template_hash and \
+               entry.get('data', '') == data_digest
+
+    def update(self, doc_path, template_hash, data_digest):
+        """
+        Records the inputs of a document that has been generated. The
+        manifest is periodically written to file.
+        """
+        entry = {
+            'template': template_hash,
+            'data': data_digest
+        }
+        self._entries[os.path.basename(doc_path)] = entry
+        self._updated[os.path.basename(doc_path)] = entry
+        self._rebuilt.append(doc_path)
+
+        self._unsaved += 1
+        if self._unsaved >= SAVE_INTERVAL:
+            self.save()
+
+    def skip(self, doc_path):
+        """
+        Records a document that was not generated since its inputs have not
+        changed.
+        """
+        self._skipped.append(doc_path)
+
+    def skipped(self):
+        """
+        :return: Paths of the documents skipped in the current run.
+        :rtype: list
+        """
+        return self._skipped
+
+    def rebuilt(self):
+        """
+        :return: Paths of the documents generated in the current run.
+        :rtype: list
+        """
+        return self._rebuilt
+
+    def reset_report(self):
+        self._skipped = []
+        self._rebuilt = []
+
+    def report(self):
+        """
+        :return: Returns a summary of the documents that were skipped and
+        rebuilt in the current run.
+        :rtype: str
+        """
+        return manifest_report(self._rebuilt, self._skipped)
@@ -0,0 +1,526 @@
+"""
+/***************************************************************************
+Name                 : Document Render Farm
+Description          : Shards document generation across several headless
+                       QGIS worker processes and tracks the state of a run
+                       so that it can be resumed.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from PyQt4.QtCore import (
+    pyqtSignal,
+    QObject,
+    QProcess,
+    QProcessEnvironment
+)
+
+from stdm.composer.generation_manifest import (
+    manifest_report,
+    merge_worker_manifests
+)
+from stdm.utils.util import PLUGIN_DIR
+
+LOGGER = logging.getLogger('stdm')
+
+#Name of the file, in the output directory, holding the state of a run
+RUN_STATE_FILE = '.stdm_render_state.json'
+
+#Environment variable used to pass the database password to workers
+WORKER_PASSWORD_ENV = 'STDM_RENDER_DB_PASSWORD'
+
+#Prefixes of the lines written by the workers to the standard output
+WORKER_OK = 'OK'
+WORKER_FAIL = 'FAIL'
+WORKER_MANIFEST = 'MANIFEST'
+
+
+def python_executable():
+    """
+    Resolves the Python interpreter used to run the workers. The
+    interpreter of the current process cannot be used as is since, in QGIS
+    desktop, sys.executable is the QGIS binary on Windows and macOS.
+    :return: Absolute path of the Python interpreter or an empty string if
+    it could not be found.
+    :rtype: str
+    """
+    candidates = []
+
+    if sys.platform == 'win32':
+        candidates.append(os.path.join(sys.exec_prefix, 'python.exe'))
+
+        #OSGeo4W and standalone installers
+        osgeo4w_root = os.environ.get('OSGEO4W_ROOT', '')
+        if osgeo4w_root:
+            candidates.append(
+                os.path.join(osgeo4w_root, 'bin', 'python.exe')
+            )
+
+        candidates.append(
+            os.path.join(os.path.dirname(sys.executable), 'python.exe')
+        )
+
+    else:
+        if os.path.basename(sys.executable).startswith('python'):
+            candidates.append(sys.executable)
+
+        for name in ('python2.7', 'python2', 'python'):
+            candidates.append(os.path.join(sys.exec_prefix, 'bin', name))
+
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+
+    return ''
+
+
+def shard_records(record_ids, num_shards):
+    """
+    Splits the record ids into shards of approximately equal size. Ids are
+    distributed round-robin so that each worker gets a similar mix of
+    records.
+    :param record_ids: Ids of the records to be generated.
+    :type record_ids: list
+    :param num_shards: Number of shards i.e. worker processes.
+    :type num_shards: int
+    :return: List of non-empty shards each containing a list of ids.
+    :rtype: list
+    """
+    num_shards = max(1, int(num_shards))
+    shards = [[] for i in range(num_shards)]
+
+    for i, rec_id in enumerate(record_ids):
+        shards[i % num_shards].append(rec_id)
+
+    return [s for s in shards if len(s) > 0]
+
+
+class RenderRunState(object):
+    """
+    Persists the progress of a document generation run in the output
+    directory so that a partially completed run can be resumed.
+    """
+    def __init__(self, output_dir, template_path=''):
+        self._path = u'{0}/{1}'.format(output_dir, RUN_STATE_FILE)
+        self._template_path = template_path
+        self._completed = set()
+        self._failed = {}
+
+    def path(self):
+        """
+        :return: Absolute path of the state file.
+        :rtype: str
+        """
+        return self._path
+
+    def load(self):
+        """
+        Reads the state of a previous run. The state is only restored if it
+        was created for the same template.
+        :return: True if a previous state was restored, else False.
+        :rtype: bool
+        """
+        if not os.path.isfile(self._path):
+            return False
+
+        try:
+            with open(self._path, 'rb') as state_file:
+                state = json.load(state_file)
+
+        except (IOError, ValueError) as ex:
+            LOGGER.debug('Could not read render state file. {}'.format(ex))
+
+            return False
+
+        if state.get('template', '') != self._template_path:
+            return False
+
+        self._completed = set(state.get('completed', []))
+        self._failed = state.get('failed', {})
+
+        return True
+
+    def save(self):
+        """
+        Writes the current state to the output directory.
+        """
+        state = {
+            'template': self._template_path,
+            'completed': sorted(self._completed),
+            'failed': self._failed
+        }
+
+        try:
+            with open(self._path, 'wb') as state_file:
+                json.dump(state, state_file)
+
+        except IOError as ex:
+            LOGGER.debug('Could not write render state file. {}'.format(ex))
+
+    def reset(self):
+        """
+        Clears the state of the run and removes the state file.
+        """
+        self._completed = set()
+        self._failed = {}
+
+        if os.path.isfile(self._path):
+            os.remove(self._path)
+
+    def mark_completed(self, record_id):
+        self._completed.add(record_id)
+        self._failed.pop(unicode(record_id), None)
+
+    def mark_failed(self, record_id, message):
+        self._failed[unicode(record_id)] = message
+
+    def completed(self):
+        """
+        :return: Ids of the records whose documents have been generated.
+        :rtype: set
+        """
+        return self._completed
+
+    def failed(self):
+        """
+        :return: Collection of record ids (as text) and corresponding error
+        messages for the records that could not be generated.
+        :rtype: dict
+        """
+        return self._failed
+
+    def remaining(self, record_ids):
+        """
+        :param record_ids: Ids of all the records in the run.
+        :type record_ids: list
+        :return: Ids of the records that have not yet been generated.
+        :rtype: list
+        """
+        return [r for r in record_ids if not r in self._completed]
+
+
+class DocumentRenderFarm(QObject):
+    """
+    Generates documents for a list of records by sharding the record ids
+    across several headless QGIS processes. Each worker loads the same
+    template and database connection settings and writes the documents to
+    the output directory. Progress is reported through signals.
+    """
+    #Number of completed records (successful or failed) and total records
+    progress = pyqtSignal(int, int)
+
+    #Record id and error message
+    record_failed = pyqtSignal(object, unicode)
+
+    #True if all the records were generated successfully
+    finished = pyqtSignal(bool)
+
+    def __init__(self, db_connection, parent=None):
+        QObject.__init__(self, parent)
+        self._db_conn = db_connection
+        self._processes = []
+        self._job_files = []
+        self._state = None
+        self._record_ids = []
+        self._output_dir = ''
+        self._total = 0
+        self._processed = 0
+        self._python_exec = python_executable()
+        self._cancelled = False
+        self._starting = False
+        self._errors = []
+        self._rebuilt = []
+        self._skipped = []
+
+    def set_python_executable(self, path):
+        """
+        Sets the interpreter used to run the workers. Defaults to the
+        interpreter resolved by 'python_executable'.
+        :param path: Absolute path of the Python interpreter.
+        :type path: str
+        """
+        self._python_exec = path
+
+    def state(self):
+        """
+        :return: State of the current or last run.
+        :rtype: RenderRunState
+        """
+        return self._state
+
+    @staticmethod
+    def incomplete_run(output_dir, template_path, record_ids):
+        """
+        Reads the state of a previous run of the template in the output
+        directory that did not complete.
+        :param output_dir: Directory where the documents are written to.
+        :type output_dir: str
+        :param template_path: Absolute path to the document template.
+        :type template_path: str
+        :param record_ids: Ids of the records in the new run.
+        :type record_ids: list
+        :return: Returns the state of the previous run or None if there is
+        no incomplete run for the records.
+        :rtype: RenderRunState
+        """
+        state = RenderRunState(output_dir, template_path)
+        if not state.load():
+            return None
+
+        remaining = state.remaining(record_ids)
+        if len(remaining) == 0 or len(remaining) == len(record_ids):
+            return None
+
+        return state
+
+    def errors(self):
+        """
+        :return: Messages of the workers that could not be started in the
+        current or last run.
+        :rtype: list
+        """
+        return self._errors
+
+    def manifest_report(self):
+        """
+        :return: Returns a summary of the documents that the workers
+        rebuilt and skipped in the current or last run.
+        :rtype: str
+        """
+        return manifest_report(self._rebuilt, self._skipped)
+
+    def is_running(self):
+        return any(p.state() != QProcess.NotRunning for p in self._processes)
+
+    def start(self, template_path, record_ids, output_mode, output_dir,
+              num_workers, resume=True, **kwargs):
+        """
+        Starts the generation of documents for the given records.
+        :param template_path: Absolute path to the document template.
+        :type template_path: str
+        :param record_ids: Ids of the records in the data source.
+        :type record_ids: list
+        :param output_mode: Output type, either DocumentGenerator.Image or
+        DocumentGenerator.PDF
+        :type output_mode: int
+        :param output_dir: Directory where the documents will be written to.
+        :type output_dir: str
+        :param num_workers: Number of worker processes.
+        :type num_workers: int
+        :param resume: True to skip the records that were generated in a
+        previous incomplete run of the same template in the output
+        directory. If all the records were generated in the previous run,
+        the documents are generated afresh.
+        :type resume: bool
+        :param kwargs: 'entity_field', 'data_fields', 'file_extension',
+        'data_source' and 'changed_only' as used by DocumentGenerator.run.
+        :return: Number of records queued for generation.
+        :rtype: int
+        """
+        if not self._python_exec or not os.path.isfile(self._python_exec):
+            raise RuntimeError(
+                u'The Python interpreter for running the document '
+                u'generation processes could not be found.'
+            )
+
+        self._cancelled = False
+        self._errors = []
+        self._rebuilt = []
+        self._skipped = []
+        self._state = RenderRunState(output_dir, template_path)
+
+        if not resume or not self._state.load() or \
+                len(self._state.remaining(record_ids)) == 0:
+            self._state.reset()
+
+        #Entries of the workers of a run that was interrupted
+        self._output_dir = output_dir
+        merge_worker_manifests(output_dir)
+
+        self._record_ids = list(record_ids)
+        pending = self._state.remaining(record_ids)
+        self._total = len(record_ids)
+        self._processed = self._total - len(pending)
+
+        if len(pending) == 0:
+            self.finished.emit(len(self._state.failed()) == 0)
+
+            return 0
+
+        job = {
+            'template': template_path,
+            'output_mode': output_mode,
+            'output_dir': output_dir,
+            'entity_field': kwargs.get('entity_field', 'id'),
+            'data_fields': kwargs.get('data_fields', []),
+            'file_extension': kwargs.get('file_extension', ''),
+            'data_source': kwargs.get('data_source', ''),
+            'changed_only': kwargs.get('changed_only', False),
+            'host': self._db_conn.Host,
+            'port': self._db_conn.Port,
+            'database': self._db_conn.Database,
+            'user': self._db_conn.User.UserName
+        }
+
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert(WORKER_PASSWORD_ENV, unicode(self._db_conn.User.Password))
+
+        worker_script = u'{0}/composer/render_worker.py'.format(PLUGIN_DIR)
+
+        #The run is only finished once all the workers have been started
+        self._starting = True
+
+        for i, shard in enumerate(shard_records(pending, num_workers)):
+            job['records'] = shard
+            job['worker'] = i
+            job_file = self._write_job_file(job)
+
+            process = QProcess(self)
+            process.setProcessEnvironment(env)
+            process.readyReadStandardOutput.connect(
+                lambda p=process: self._on_worker_output(p)
+            )
+            process.error.connect(
+                lambda err, p=process: self._on_worker_error(p, err)
+            )
+            process.finished.connect(self._on_worker_finished)
+            self._processes.append(process)
+            process.start(self._python_exec, [worker_script, job_file])
+
+        self._starting = False
+
+        #All the workers failed to start
+        if not self.is_running():
+            self._on_worker_finished()
+
+        return len(pending)
+
+    def cancel(self):
+        """
+        Stops all the workers. Records that have been completed are kept in
+        the run state so that the run can be resumed.
+        """
+        self._cancelled = True
+
+        for p in self._processes:
+            if p.state() != QProcess.NotRunning:
+                p.kill()
+
+    def _write_job_file(self, job):
+        fd, path = tempfile.mkstemp(prefix='stdm_render_', suffix='.json')
+        with os.fdopen(fd, 'wb') as job_file:
+            json.dump(job, job_file)
+
+        self._job_files.append(path)
+
+        return path
+
+    def _on_worker_output(self, process):
+        while process.canReadLine():
+            line = unicode(process.readLine()).strip()
+            self._parse_worker_line(line)
+
+    def _parse_worker_line(self, line):
+        parts = line.split('\t', 2)
+        if len(parts) == 2 and parts[0] == WORKER_MANIFEST:
+            self._parse_manifest_documents(parts[1])
+
+            return
+
+        if len(parts) < 2 or not parts[0] in (WORKER_OK, WORKER_FAIL):
+            if line:
+                LOGGER.debug(u'Render worker: {0}'.format(line))
+
+            return
+
+        try:
+            rec_id = json.loads(parts[1])
+
+        except ValueError:
+            LOGGER.debug(u'Invalid render worker output: {0}'.format(line))
+
+            return
+
+        if parts[0] == WORKER_OK:
+            self._state.mark_completed(rec_id)
+
+        else:
+            msg = parts[2] if len(parts) > 2 else u''
+            self._state.mark_failed(rec_id, msg)
+            self.record_failed.emit(rec_id, msg)
+
+        self._processed += 1
+        self._state.save()
+        self.progress.emit(self._processed, self._total)
+
+    def _parse_manifest_documents(self, documents):
+        try:
+            documents = json.loads(documents)
+
+        except ValueError:
+            LOGGER.debug(u'Invalid render worker manifest: {0}'.format(
+                documents
+            ))
+
+            return
+
+        self._rebuilt.extend(documents.get('rebuilt', []))
+        self._skipped.extend(documents.get('skipped', []))
+
+    def _on_worker_error(self, process, error):
+        msg = unicode(process.errorString())
+        LOGGER.debug(u'Render worker error: {0}'.format(msg))
+
+        #A worker that could not be started does not emit 'finished'
+        if error == QProcess.FailedToStart:
+            self._errors.append(msg)
+            self._on_worker_finished()
+
+    def _on_worker_finished(self, *args):
+        if self._starting or len(self._processes) == 0 or \
+                self.is_running():
+            return
+
+        #Pick any lines that were not read before the process exited
+        for p in self._processes:
+            self._on_worker_output(p)
+
+        self._state.save()
+        self._processes = []
+
+        #Each worker writes the generated documents to its own manifest
+        merge_worker_manifests(self._output_dir)
+
+        for path in self._job_files:
+            if os.path.isfile(path):
+                os.remove(path)
+
+        self._job_files = []
+
+        #Records of a crashed worker remain pending for a resumed run
+        pending = self._state.remaining(self._record_ids)
+        success = not self._cancelled and len(pending) == 0 and \
+                  len(self._state.failed()) == 0
+
+        #A complete run is not resumed
+        if success:
+            self._state.reset()
+
+        self.finished.emit(success)
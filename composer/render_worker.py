@@ -0,0 +1,217 @@
+"""
+/***************************************************************************
+Name                 : Document Render Worker
+Description          : Headless QGIS process that generates documents for a
+                       shard of records on behalf of DocumentRenderFarm.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import os
+import sys
+
+#The plugins directory needs to be in the path for the stdm package imports
+_PLUGINS_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+)
+if not _PLUGINS_DIR in sys.path:
+    sys.path.insert(0, _PLUGINS_DIR)
+
+from PyQt4.QtCore import (
+    QCoreApplication,
+    QSize
+)
+from PyQt4.QtGui import QWidget
+
+from qgis.core import QgsApplication
+from qgis.gui import QgsMapCanvas
+
+
+class _LegendInterface(object):
+    """
+    Layers are not shown in a legend in headless mode hence visibility
+    changes are ignored.
+    """
+    def setLayerVisible(self, layer, visible):
+        pass
+
+
+class HeadlessInterface(object):
+    """
+    Minimal implementation of the QGIS interface methods used by the
+    document generator when running outside the QGIS desktop.
+    """
+    def __init__(self, canvas):
+        self._canvas = canvas
+        self._legend = _LegendInterface()
+
+    def mapCanvas(self):
+        return self._canvas
+
+    def legendInterface(self):
+        return self._legend
+
+
+def _write_result(status, record_id, message=u''):
+    line = u'{0}\t{1}\t{2}\n'.format(
+        status,
+        json.dumps(record_id),
+        unicode(message).replace(u'\n', u' ')
+    )
+    sys.stdout.write(line.encode('utf-8'))
+    sys.stdout.flush()
+
+
+def _write_manifest_documents(rebuilt, skipped):
+    documents = {
+        'rebuilt': rebuilt,
+        'skipped': skipped
+    }
+    line = u'MANIFEST\t{0}\n'.format(json.dumps(documents))
+    sys.stdout.write(line.encode('utf-8'))
+    sys.stdout.flush()
+
+
+def _connect(job):
+    import stdm.data
+    from stdm.data.connection import DatabaseConnection
+    from stdm.security.user import User
+    from stdm.composer.render_farm import WORKER_PASSWORD_ENV
+
+    db_conn = DatabaseConnection(job['host'], job['port'], job['database'])
+    db_conn.User = User(
+        job['user'],
+        os.environ.get(WORKER_PASSWORD_ENV, '')
+    )
+    stdm.data.app_dbconn = db_conn
+
+
+def _load_configuration():
+    from PyQt4.QtGui import QDesktopServices
+    from stdm.settings.config_serializer import ConfigurationFileSerializer
+
+    config_path = QDesktopServices.storageLocation(
+        QDesktopServices.HomeLocation) + '/.stdm/configuration.stc'
+    ConfigurationFileSerializer(config_path).load()
+
+
+def run_job(job, iface):
+    """
+    Generates a document for each record in the job.
+    :param job: Job settings written by DocumentRenderFarm.
+    :type job: dict
+    :param iface: Interface object used by the document generator.
+    :type iface: HeadlessInterface
+    """
+    from stdm.composer.document_generator import DocumentGenerator
+
+    _connect(job)
+    _load_configuration()
+
+    doc_generator = DocumentGenerator(iface)
+    doc_generator.set_manifest_worker(job.get('worker', os.getpid()))
+    records = job['records']
+
+    try:
+        _run_records(job, doc_generator, records)
+
+    finally:
+        #Documents generated before an error are kept in the manifest
+        doc_generator.clear_temporary_layers()
+        doc_generator.save_manifests()
+        _write_manifest_documents(*doc_generator.manifest_documents())
+
+
+def _run_records(job, doc_generator, records):
+    from stdm.composer.sub_report_cache import PREFETCH_BATCH_SIZE
+
+    for i, rec_id in enumerate(records):
+        if i % PREFETCH_BATCH_SIZE == 0:
+            doc_generator.clear_prefetched_rows()
+
+            #The rows are fetched per record if the batch cannot be fetched
+            try:
+                doc_generator.prefetch(
+                    job['template'],
+                    job['entity_field'],
+                    records[i:i + PREFETCH_BATCH_SIZE]
+                )
+
+            except Exception as ex:
+                doc_generator.clear_prefetched_rows()
+                sys.stderr.write(
+                    u'Rows could not be prefetched. {0}\n'.format(
+                        ex
+                    ).encode('utf-8')
+                )
+
+        try:
+            status, msg = doc_generator.run(
+                job['template'],
+                job['entity_field'],
+                rec_id,
+                job['output_mode'],
+                dataFields=job['data_fields'],
+                fileExtension=job['file_extension'],
+                data_source=job['data_source'],
+                outputDir=job['output_dir'],
+                changedOnly=job.get('changed_only', False)
+            )
+
+        except Exception as ex:
+            status, msg = False, unicode(ex)
+
+        finally:
+            doc_generator.clear_temporary_table_layers()
+
+        if status:
+            _write_result('OK', rec_id)
+
+        else:
+            _write_result('FAIL', rec_id, msg)
+
+
+def main(argv):
+    if len(argv) < 2:
+        sys.stderr.write('Usage: render_worker.py <job file>\n')
+
+        return 1
+
+    with open(argv[1], 'rb') as job_file:
+        job = json.load(job_file)
+
+    #Use the same settings store as QGIS desktop
+    QCoreApplication.setOrganizationName('QGIS')
+    QCoreApplication.setOrganizationDomain('qgis.org')
+    QCoreApplication.setApplicationName('QGIS2')
+
+    app = QgsApplication(argv, True)
+    app.initQgis()
+
+    parent = QWidget()
+    canvas = QgsMapCanvas(parent)
+    canvas.resize(QSize(400, 400))
+
+    try:
+        run_job(job, HeadlessInterface(canvas))
+
+    finally:
+        app.exitQgis()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,143 @@
+"""
+/***************************************************************************
+Name                 : Sub-report Row Cache
+Description          : Prefetches rows of linked tables for a batch of data
+                       source records so that composer item value handlers
+                       do not issue a query per record.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from collections import defaultdict
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import (
+    Table,
+    MetaData
+)
+
+__all__ = ['PREFETCH_BATCH_SIZE', 'SubReportRowCache']
+
+#Number of records whose sub-report rows are fetched in one go
+PREFETCH_BATCH_SIZE = 100
+
+
+class SubReportRowCache(object):
+    """
+    Holds rows of linked tables grouped by the value of the link column.
+    Rows are fetched using one 'WHERE link_col IN (...)' query per table and
+    link column for a batch of link values. Reflected tables are also cached
+    so that each table is only reflected once.
+    """
+    def __init__(self, session, engine, chunk_size=500):
+        self._session = session
+        self._meta = MetaData(bind=engine)
+        self._chunk_size = chunk_size
+        self._tables = {}
+        #(table name, link column) -> {link value: [rows]}
+        self._rows = defaultdict(dict)
+
+    def table(self, table_name):
+        """
+        :param table_name: Name of the table or view.
+        :type table_name: str
+        :return: Returns the reflected table, the table is only reflected
+        the first time it is requested.
+        :rtype: Table
+        """
+        ds_table = self._tables.get(table_name, None)
+        if ds_table is None:
+            ds_table = Table(table_name, self._meta, autoload=True)
+            self._tables[table_name] = ds_table
+
+        return ds_table
+
+    def prefetch(self, table_name, link_field, values):
+        """
+        Fetches the rows in the table whose link column value is in the
+        specified values. Values that have already been fetched are skipped.
+        :param table_name: Name of the linked table or view.
+        :type table_name: str
+        :param link_field: Name of the link column in the table.
+        :type link_field: str
+        :param values: Link values, normally from the data source records.
+        :type values: list
+        :return: Rows that were fetched in this call.
+        :rtype: list
+        """
+        if not table_name or not link_field:
+            return []
+
+        key = (table_name, link_field)
+        cached = self._rows[key]
+
+        pending = set()
+        for v in values:
+            if v is None or v == '':
+                continue
+            if not v in cached:
+                pending.add(v)
+
+        if len(pending) == 0:
+            return []
+
+        ds_table = self.table(table_name)
+        link_col = ds_table.c[link_field]
+        pending = list(pending)
+        fetched = []
+
+        try:
+            for i in range(0, len(pending), self._chunk_size):
+                chunk = pending[i:i + self._chunk_size]
+                results = self._session.query(ds_table).filter(
+                    link_col.in_(chunk)
+                ).all()
+
+                #Values without matching rows are cached as empty lists
+                for v in chunk:
+                    cached[v] = []
+
+                for r in results:
+                    cached.setdefault(getattr(r, link_field), []).append(r)
+
+                fetched.extend(results)
+
+        except SQLAlchemyError as ex:
+            self._session.rollback()
+            raise ex
+
+        return fetched
+
+    def rows(self, table_name, link_field, value):
+        """
+        :return: Returns the prefetched rows in the table matching the link
+        value or None if the value has not been prefetched.
+        :rtype: list
+        """
+        cached = self._rows.get((table_name, link_field), None)
+        if cached is None:
+            return None
+
+        try:
+            return cached.get(value, None)
+
+        #Unhashable values cannot be cached
+        except TypeError:
+            return None
+
+    def clear(self):
+        """
+        Removes all the prefetched rows. Reflected tables are retained.
+        """
+        self._rows = defaultdict(dict)
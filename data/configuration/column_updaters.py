@@ -44,12 +44,16 @@ from stdm.data.database import (
 )
 from . import _bind_metadata
 from stdm.data.configuration.db_items import DbItem
+from stdm.data.configuration.schema_plan import table_alteration
 from stdm.data.pg_utils import (
     drop_cascade_column
 )
 
 LOGGER = logging.getLogger('stdm')
 
+#Extension with the operator classes used by the trigram indexes
+TRIGRAM_EXTENSION = 'pg_trgm'
+
 
 def _base_col_attrs(col):
     """
@@ -67,29 +71,68 @@ def _base_col_attrs(col):
     return col_attrs
 
 
+def index_name(*parts):
+    """
+    :return: Returns the name of an index from the table, column and
+    optional suffix, truncated to the maximum length of a PostgreSQL name.
+    :rtype: str
+    """
+    return u'_'.join([u'idx'] + list(parts))[:63]
+
+
+def column_indexes(column, trigram=False):
+    """
+    Indexes of a column: GiST for geometry columns, btree for foreign key,
+    lookup and administrative unit columns and for columns flagged to be
+    indexed.
+    :param column: Base column.
+    :type column: BaseColumn
+    :param trigram: True to add a trigram index for searchable character
+    varying columns.
+    :type trigram: bool
+    :return: Returns the name, indexed expression and method of each index.
+    :rtype: list
+    """
+    from stdm.data.configuration.columns import (
+        ForeignKeyColumn,
+        VarCharColumn
+    )
+
+    indexes = []
+    idx_name = index_name(column.entity.name, column.name)
+
+    if column.TYPE_INFO == 'GEOMETRY':
+        indexes.append((idx_name, column.name, 'gist'))
+
+    elif column.index or isinstance(column, ForeignKeyColumn):
+        indexes.append((idx_name, column.name, 'btree'))
+
+    # Searches compare the lower case values
+    if trigram and column.searchable and isinstance(column, VarCharColumn):
+        indexes.append((
+            index_name(column.entity.name, column.name, 'trgm'),
+            u'lower({0}) gin_trgm_ops'.format(column.name),
+            'gin'
+        ))
+
+    return indexes
+
+
 def _quote_value(value):
     # Encloses value in single quotes
     return u'\'{0}\''.format(value)
 
 
-def check_constraint(column, sa_column, table):
+def check_constraint_sql(column):
     """
-    Creates minimum and/or maximum check constraints.
-    .. versionadded:: 1.5
+    Creates the SQL expression of the minimum and/or maximum check
+    constraint.
     :param column: BoundsColumn object.
     :type column: BoundsColumn
-    :param sa_column: SQLAlchemy column object
-    :type sa_column: Column
-    :param table: SQLAlchemy table object
-    :type table: Table
-    :return: Returns a check constraint object.
-    :rtype: CheckConstraint
+    :return: Returns the SQL expression or None if the column is not
+    bounded.
+    :rtype: str
     """
-    if not hasattr(table.c, column.name):
-        return None
-
-    col_attr = getattr(table.c, column.name)
-
     min_value = str(column.minimum)
     max_value = str(column.maximum)
 
@@ -103,19 +146,42 @@ def check_constraint(column, sa_column, table):
     max_sql = u'{0} <= {1}'.format(column.name, max_value)
 
     if column.minimum > column.SQL_MIN and column.maximum == column.SQL_MAX:
-        return CheckConstraint(min_sql, columns=[col_attr])
+        return min_sql
 
     if column.minimum == column.SQL_MIN and column.maximum < column.SQL_MAX:
-        return CheckConstraint(max_sql, columns=[col_attr])
+        return max_sql
 
     if column.minimum > column.SQL_MIN and column.maximum < column.SQL_MAX:
-        min_max_sql = u'{0} AND {1}'.format(min_sql, max_sql)
-
-        return CheckConstraint(min_max_sql, columns=[col_attr])
+        return u'{0} AND {1}'.format(min_sql, max_sql)
 
     return None
 
 
+def check_constraint(column, sa_column, table):
+    """
+    Creates minimum and/or maximum check constraints.
+    .. versionadded:: 1.5
+    :param column: BoundsColumn object.
+    :type column: BoundsColumn
+    :param sa_column: SQLAlchemy column object
+    :type sa_column: Column
+    :param table: SQLAlchemy table object
+    :type table: Table
+    :return: Returns a check constraint object.
+    :rtype: CheckConstraint
+    """
+    if not hasattr(table.c, column.name):
+        return None
+
+    col_attr = getattr(table.c, column.name)
+
+    chk_sql = check_constraint_sql(column)
+    if chk_sql is None:
+        return None
+
+    return CheckConstraint(chk_sql, columns=[col_attr])
+
+
 def _update_col(column, table, data_type, columns):
     """
     Update the column based on the database operation.
@@ -130,13 +196,18 @@ def _update_col(column, table, data_type, columns):
 
     alchemy_column = Column(column.name, data_type, **_base_col_attrs(column))
 
-    idx_name = None
-    if column.index:
-        idx_name = u'idx_{0}_{1}'.format(column.entity.name, column.name)
     unique_name = None
     if column.unique:
         unique_name = u'unq_{0}_{1}'.format(column.entity.name, column.name)
 
+    # Changes are added to the alteration of the table if there is one
+    alteration = table_alteration(table)
+    if not alteration is None:
+        _alter_col(column, alchemy_column, table, alteration, columns,
+                   unique_name)
+
+        return alchemy_column
+
     if column.action == DbItem.CREATE:
         # Ensure the column does not exist otherwise an exception will be thrown
         if not column.name in columns:
@@ -173,28 +244,69 @@ def _update_col(column, table, data_type, columns):
     if alchemy_column.table is None:
         alchemy_column._set_parent(table)
     # add different type of index for columns with index
-    if column.index:
+    col_indexes = column_indexes(column)
+    if len(col_indexes) > 0 and column.action != DbItem.DROP:
         _bind_metadata(metadata)
         inspector = reflection.Inspector.from_engine(metadata.bind)
         indexes_list = inspector.get_indexes(column.entity.name)
         indexes = [i['name'] for i in indexes_list if not i['unique']]
         # get_indexes do not get gist indexes so try/ except needs to be used.
-        try:
-            if idx_name not in indexes:
-
-                if column.TYPE_INFO == 'GEOMETRY':
-                    idx = Index(idx_name, alchemy_column, postgresql_using='gist')
+        for idx_name, expression, using in col_indexes:
+            try:
+                if idx_name not in indexes:
+                    idx = Index(idx_name, alchemy_column,
+                                postgresql_using=using)
                     idx.create()
-
-                else:
-                    idx = Index(idx_name, alchemy_column, postgresql_using='btree')
-                    idx.create()
-        except Exception:
-            pass
+            except Exception:
+                pass
 
     return alchemy_column
 
 
+def _alter_col(column, alchemy_column, table, alteration, columns,
+               unique_name):
+    # Adds the column changes to the alteration of the table
+    from stdm.data.configuration.columns import BoundsColumn
+
+    if column.action == DbItem.CREATE:
+        if not column.name in columns:
+            alteration.add_column(alchemy_column, unique_name)
+
+            if isinstance(column, BoundsColumn) and \
+                    column.can_create_check_constraints():
+                chk_sql = check_constraint_sql(column)
+                if not chk_sql is None:
+                    chk_name = u'{0}_{1}_check'.format(
+                        column.entity.name, column.name
+                    )
+                    alteration.add_constraint(
+                        chk_name, u'CHECK ({0})'.format(chk_sql)
+                    )
+
+    elif column.action == DbItem.ALTER:
+        if column.name in columns:
+            alteration.alter_column(alchemy_column)
+
+    elif column.action == DbItem.DROP:
+        if column.name in columns:
+            alteration.drop_column(column.name)
+
+            # The relations are removed once the plan has been executed
+            alteration.defer(
+                u'Remove relations of {0} column'.format(column.name),
+                lambda: _clear_ref_in_entity_relations(column)
+            )
+
+        return
+
+    if alchemy_column.table is None:
+        alchemy_column._set_parent(table)
+
+    col_indexes = column_indexes(column, alteration.trigram_indexes)
+    for idx_name, expression, using in col_indexes:
+        alteration.add_index(idx_name, expression, using)
+
+
 def _clear_ref_in_entity_relations(column):
     #Check if the column is referenced by entity relation objects and delete.
     child_relations = column.child_entity_relations()
@@ -236,7 +348,13 @@ def serial_updater(column, table, columns):
         return col
 
     if column.action == DbItem.CREATE:
-        col.create(table=table)
+        alteration = table_alteration(table)
+        if not alteration is None:
+            alteration.add_column(col)
+            col._set_parent(table)
+
+        else:
+            col.create(table=table)
 
     return col
 
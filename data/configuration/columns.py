@@ -846,6 +846,7 @@ class ForeignKeyColumn(IntegerColumn):
 
         # Rename FK reference
         self.entity_relation.child_column = self.name
+        self.profile._reset_indexes()
 
 ForeignKeyColumn.register()
 
@@ -18,6 +18,7 @@ email                : stdm@unhabitat.org
  ***************************************************************************/
 """
 import logging
+from collections import OrderedDict
 
 from PyQt4.QtCore import (
     pyqtSignal,
@@ -35,7 +36,12 @@ from stdm.data.database import (
 from stdm.data.configuration.db_items import DbItem
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 from stdm.data.configuration.exception import ConfigurationException
-from stdm.data.configuration import profile_foreign_keys
+from stdm.data.configuration.column_updaters import TRIGRAM_EXTENSION
+from stdm.data.configuration.index_updater import reconcile_indexes
+from stdm.data.configuration.schema_plan import (
+    SchemaCatalog,
+    SchemaUpdatePlan
+)
 
 LOGGER = logging.getLogger('stdm')
 
@@ -70,13 +76,31 @@ class ConfigurationSchemaUpdater(QObject):
         if self.metadata.bind is None:
             self.metadata.bind = self.engine
 
-    def exec_(self):
+        #Imported here since the settings package imports this module
+        from stdm.settings.registryconfig import trigram_indexes
+        self.trigram_indexes = trigram_indexes()
+
+        #True once the statements of the plan have been committed
+        self._committed = False
+
+    def exec_(self, dry_run=False, plan=None):
         """
         Initiate the process of updating the schema based on the specified
         configuration. The object will determine whether the schema needs to
         be created or updated.
+        The changes are first computed in a plan whose statements are
+        executed in a single transaction. The deferred steps, such as
+        writing the lookup values and creating the social tenure views, are
+        run after the commit.
+        :param dry_run: True to only report the statements of the plan
+        without executing them.
+        :type dry_run: bool
+        :param plan: Plan returned by 'plan', e.g. one that has been
+        previewed by the user. A new plan is computed if None.
+        :type plan: SchemaUpdatePlan
         """
         self.update_started.emit()
+        self._committed = False
 
         if self.config.is_null:
             msg = self.tr('The specified configuration is empty, the schema '
@@ -91,21 +115,33 @@ class ConfigurationSchemaUpdater(QObject):
             return
 
         try:
-            #Iterate through removed profiles first
-            for rp in self.config.removed_profiles:
-                self.remove_profile(rp)
+            if plan is None:
+                plan = self.plan()
+
+            if dry_run:
+                for step_text in plan.preview():
+                    self.update_progress.emit(
+                        ConfigurationSchemaUpdater.INFORMATION, step_text
+                    )
 
-            #Iterate through profiles
-            for p in self.config.profiles.values():
-                self.update_profile(p)
+                self.update_completed.emit(True)
 
-            #Delete removed profile objects
-            self._clean_removed_profiles()
+                return
+
+            plan.execute(self.engine, self._on_step_started)
+
+            timings = plan.timings_text()
+            LOGGER.debug(u'Schema update timings:\n%s', timings)
+            self.update_progress.emit(
+                ConfigurationSchemaUpdater.INFORMATION, timings
+            )
+
+            self.update_indexes()
 
             self.update_completed.emit(True)
 
         except SQLAlchemyError as sae:
-            msg = unicode(sae)
+            msg = self._deferred_error(unicode(sae))
 
             self.update_progress.emit(ConfigurationSchemaUpdater.ERROR, msg)
 
@@ -113,6 +149,121 @@ class ConfigurationSchemaUpdater(QObject):
 
             self.update_completed.emit(False)
 
+    def _deferred_error(self, msg):
+        #Errors in the deferred steps do not roll back the committed changes
+        if not self._committed:
+            return msg
+
+        partial_msg = self.tr('The schema changes had already been '
+                              'committed, the database is partially updated. '
+                              'Run the configuration wizard again to complete '
+                              'the update.')
+
+        return u'{0}\n{1}'.format(msg, partial_msg)
+
+    def plan(self):
+        """
+        Computes the changes between the configuration and the database.
+        :return: Returns the plan with the statements for updating the
+        schema in the order that they are to be executed.
+        :rtype: SchemaUpdatePlan
+        """
+        connection = self.engine.connect()
+
+        try:
+            catalog = SchemaCatalog.read(connection)
+
+        finally:
+            connection.close()
+
+        #Trigram indexes of new columns are created in the plan if the
+        #extension is installed, otherwise by update_indexes
+        trigram = self.trigram_indexes and \
+                  catalog.has_extension(TRIGRAM_EXTENSION)
+        plan = SchemaUpdatePlan(catalog, self.engine.dialect, trigram)
+
+        #Iterate through removed profiles first
+        for rp in self.config.removed_profiles:
+            self.remove_profile(rp, plan)
+
+        #Iterate through profiles
+        for p in self.config.profiles.values():
+            self.update_profile(p, plan)
+
+        #Delete removed profile objects
+        plan.add_deferred(self.tr('Cleaning removed profiles'),
+                          self._clean_removed_profiles)
+
+        return plan
+
+    def update_indexes(self):
+        """
+        Creates the indexes of the profile tables that do not exist in the
+        database e.g. for databases created before the geometry and foreign
+        key columns were indexed. Errors are reported as warnings since the
+        schema has already been updated.
+        :return: Returns the names of the indexes that were created.
+        :rtype: list
+        """
+        try:
+            created = reconcile_indexes(
+                self.config.profiles.values(),
+                self.engine,
+                self.trigram_indexes,
+                self._on_index_started
+            )
+
+        except SQLAlchemyError as sae:
+            msg = unicode(sae)
+
+            self.update_progress.emit(ConfigurationSchemaUpdater.WARNING, msg)
+
+            LOGGER.debug(msg)
+
+            return []
+
+        LOGGER.debug(u'%s missing indexes created.', len(created))
+
+        return created
+
+    def _on_index_started(self, name):
+        msg = self.tr(u'Creating {0} index...'.format(name))
+        self.update_progress.emit(ConfigurationSchemaUpdater.INFORMATION, msg)
+
+        QgsApplication.processEvents()
+
+    def preview(self):
+        """
+        :return: Returns the statements for updating the schema without
+        executing them.
+        :rtype: list
+        """
+        return self.plan().preview()
+
+    def _on_step_started(self, step):
+        msg = step.description
+
+        if step.deferred:
+            if not self._committed:
+                self._committed = True
+
+                commit_msg = self.tr('The schema changes have been '
+                                     'committed. Lookup values and social '
+                                     'tenure views are now written after '
+                                     'the commit, if one of these steps '
+                                     'fails the database is left partially '
+                                     'updated.')
+                self.update_progress.emit(
+                    ConfigurationSchemaUpdater.INFORMATION,
+                    commit_msg
+                )
+
+            msg = self.tr(u'{0} (after commit)'.format(msg))
+
+        self.update_progress.emit(ConfigurationSchemaUpdater.INFORMATION, msg)
+
+        QgsApplication.processEvents()
+
     def _clean_removed_profiles(self):
         #Delete removed profiles
         for p in self.config.removed_profiles:
@@ -121,11 +272,13 @@ class ConfigurationSchemaUpdater(QObject):
 
         self.config.reset_removed_profiles()
 
-    def remove_profile(self, profile):
+    def remove_profile(self, profile, plan):
         """
-        Deletes the entities in the given profile from the database.
+        Adds the deletion of the entities in the given profile to the plan.
         :param profile: Profile whose entities are to be deleted.
         :type profile: Profile
+        :param plan: Schema update plan.
+        :type plan: SchemaUpdatePlan
         """
         trans_msg = u'Attempting to delete {0} profile...'.format(
             profile.name)
@@ -136,55 +289,75 @@ class ConfigurationSchemaUpdater(QObject):
         self.update_progress.emit(ConfigurationSchemaUpdater.INFORMATION, msg)
 
         #Delete basic view first
-        profile.social_tenure.delete_view(self.engine)
+        self._drop_views(profile, plan)
 
         #Drop relations
-        self._drop_entity_relations(profile)
+        self._drop_entity_relations(profile, plan)
 
         #Drop entities
-        self._update_entities(profile.removed_entities)
+        self._update_entities(profile.removed_entities, plan)
 
-    def _drop_entity_relations(self, profile):
-        trans_msg = self.tr('Removing redundant foreign key constraints...')
-        self.update_progress.emit(ConfigurationSchemaUpdater.INFORMATION, trans_msg)
+    def _drop_views(self, profile, plan):
+        for v in profile.social_tenure.views.keys():
+            plan.drop_view(v)
 
-        #Get existing foreign key names
-        fks = profile_foreign_keys(profile)
+    def _active_relations(self, profile):
+        #Relations in the profile that have not been flagged for removal
+        return [er for er in profile.relations.values()
+                if not any(er is rr for rr in profile.removed_relations)]
 
-        try:
+    def _drop_entity_relations(self, profile, plan):
+        #Constraints that are still used by other relations are retained
+        active_fks = set(
+            [er.autoname for er in self._active_relations(profile)]
+        )
+        alterations = OrderedDict()
 
-            # Drop removed relations
-            for er in profile.removed_relations:
-                # Assert if the foreign key exists and skip drop if it exists
-                if er.autoname in fks:
-                    continue
+        for er in profile.removed_relations:
+            fk_name = er.autoname
 
-                status = er.drop_foreign_key_constraint()
+            if fk_name and plan.catalog.has_constraint(fk_name) and \
+                    not fk_name in active_fks:
+                child = er.child.name
+                if not child in alterations:
+                    alterations[child] = plan.alter_table(child)
 
-                if not status:
-                    msg = self.tr(u'Error in removing {0} foreign key '
-                                  'constraint.'.format(er.autoname))
+                alterations[child].drop_constraint(fk_name)
 
-                else:
-                    del profile.relations[er.name]
+            plan.add_deferred(
+                u'Remove {0} relation'.format(er.name),
+                lambda er=er: self._remove_relation(profile, er)
+            )
 
-                    msg = self.tr(u'{0} foreign key constraint successfully '
-                                  'removed.'.format(er.autoname))
+        for alteration in alterations.values():
+            plan.add_alteration(alteration)
 
-                QgsApplication.processEvents()
+    def _remove_relation(self, profile, entity_relation):
+        if profile.relations.get(entity_relation.name) is entity_relation:
+            del profile.relations[entity_relation.name]
+            profile._reset_indexes()
 
-                LOGGER.debug(msg)
-        except ConfigurationException as ce:
-            msg = unicode(ce)
-            self.update_progress.emit(ConfigurationSchemaUpdater.ERROR, msg)
-            LOGGER.debug(msg)
-            self.update_completed.emit(False)
+        LOGGER.debug(u'%s foreign key constraint successfully removed.',
+                     entity_relation.autoname)
+
+    def _has_changes(self, profile):
+        if len(profile.removed_entities) > 0 or \
+                len(profile.removed_relations) > 0:
+            return True
+
+        for e in profile.entities.values():
+            if e.action != DbItem.NONE:
+                return True
+
+        return False
 
-    def update_profile(self, profile):
+    def update_profile(self, profile, plan):
         """
-        Updates the given profile.
+        Adds the changes in the given profile to the plan.
         :param profile: Profile instance.
         :type profile: Profile
+        :param plan: Schema update plan.
+        :type plan: SchemaUpdatePlan
         """
         trans_msg = u'Scanning for changes in {0} profile...'.format(
             profile.name)
@@ -195,23 +368,35 @@ class ConfigurationSchemaUpdater(QObject):
 
         self.update_progress.emit(ConfigurationSchemaUpdater.INFORMATION, msg)
 
-        self._drop_entity_relations(profile)
+        #Views cannot reference columns whose type is being changed so they
+        #are dropped and recreated with the new columns.
+        if self._has_changes(profile):
+            self._drop_views(profile, plan)
+
+        self._drop_entity_relations(profile, plan)
 
         #Drop removed entities first
-        self._update_entities(profile.removed_entities)
+        self._update_entities(profile.removed_entities, plan)
 
         #Now iterate through new or updated entities
-        self._update_entities(profile.entities.values())
+        self._update_entities(profile.entities.values(), plan)
 
         #Update entity relations by creating foreign key references
-        self.update_entity_relations(profile)
+        self.update_entity_relations(profile, plan)
+
+        #Create basic STR database view. The view definition uses the lookup
+        #values which are written after the commit.
+        plan.add_deferred(
+            u'Create {0} social tenure views'.format(profile.name),
+            lambda: self._create_views(profile)
+        )
 
-        #Create basic STR database view
+    def _create_views(self, profile):
         try:
             profile.social_tenure.create_view(self.engine)
 
         except ConfigurationException as ce:
-            msg = unicode(ce)
+            msg = self._deferred_error(unicode(ce))
 
             self.update_progress.emit(ConfigurationSchemaUpdater.ERROR, msg)
 
@@ -219,7 +404,7 @@ class ConfigurationSchemaUpdater(QObject):
 
             self.update_completed.emit(False)
 
-    def _update_entities(self, entities):
+    def _update_entities(self, entities, plan):
         for e in entities:
             action = e.action
 
@@ -229,47 +414,61 @@ class ConfigurationSchemaUpdater(QObject):
                 trans_msg = u'{0} {1} {2}...'.format(
                     action_txt.capitalize(), e.short_name, entity_text)
 
-                msg = trans_msg
-
                 LOGGER.debug(trans_msg)
 
-                self.update_progress.emit(ConfigurationSchemaUpdater.INFORMATION, msg)
-
-                e.update(self.engine, self.metadata)
+                e.update(self.engine, self.metadata, plan)
 
             QgsApplication.processEvents()
 
-    def update_entity_relations(self, profile):
+    def update_entity_relations(self, profile, plan):
         """
-        Update entity relations in the profile by creating the corresponding
-        foreign key references.
+        Adds the foreign key references of the entity relations in the
+        profile to the plan. The references of each table are created in
+        one statement.
         :param profile: Profile whose foreign key references are to be updated.
         :type profile: Profile
+        :param plan: Schema update plan.
+        :type plan: SchemaUpdatePlan
         """
-        fks = profile_foreign_keys(profile)
+        catalog = plan.catalog
+        alterations = OrderedDict()
 
-        for er in profile.relations.values():
+        for er in self._active_relations(profile):
             #Assert if the EntityRelation object is valid
-            if er.valid()[0]:
-                #Assert if the entity relation already exists
-                if er.autoname in fks:
-                    LOGGER.debug('{0} foreign key already exists.'.format(er.autoname))
+            if not er.valid()[0]:
+                continue
 
-                    continue
+            #Assert if the entity relation already exists
+            if catalog.has_constraint(er.autoname):
+                LOGGER.debug('{0} foreign key already exists.'.format(er.autoname))
 
+                continue
 
-                status = er.create_foreign_key_constraint()
-                if not status:
-                    msg = self.tr(u'Error in creating {0} foreign key '
-                                  'constraint.'.format(er.name))
+            child = er.child.name
+            parent = er.parent.name
 
-                else:
-                    msg = self.tr(u'{0} foreign key constraint successfully '
-                                  'created.'.format(er.name))
+            if not catalog.has_column(child, er.child_column) or \
+                    not catalog.has_column(parent, er.parent_column):
+                LOGGER.debug(u'Columns of %s relation do not exist, the '
+                             u'foreign key constraint will not be '
+                             u'created.', er.name)
 
-                LOGGER.debug(msg)
+                continue
 
-            QgsApplication.processEvents()
+            if not child in alterations:
+                alterations[child] = plan.alter_table(child)
+
+            alterations[child].add_foreign_key(
+                er.autoname,
+                er.child_column,
+                parent,
+                er.parent_column,
+                er.on_update_action,
+                er.on_delete_action
+            )
+
+        for alteration in alterations.values():
+            plan.add_alteration(alteration)
 
     def _action_text(self, action):
         if action == DbItem.CREATE:
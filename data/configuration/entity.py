@@ -171,6 +171,9 @@ class Entity(QObject, TableItem):
         self.short_name = shortname
         self.name = self._shortname_to_name(shortname)
 
+        #Entity and relation lookups in the profile use the name
+        self.profile._reset_indexes()
+
         # Rename supporting documents if enabled
         if self.supports_documents:
             self.supporting_doc.rename(shortname)
@@ -341,7 +344,7 @@ class Entity(QObject, TableItem):
         """
         pass
 
-    def update(self, engine, metadata):
+    def update(self, engine, metadata, plan=None):
         """
         Update the entity in the database using the 'sql_updater' callable
         attribute.
@@ -350,13 +353,20 @@ class Entity(QObject, TableItem):
         :param metadata: Object containing all the schema constructs
         associated with our database.
         :type metadata: MetaData
+        :param plan: Schema update plan that the changes are added to
+        instead of being executed immediately.
+        :type plan: SchemaUpdatePlan
         """
         if self.sql_updater is None:
             LOGGER.debug('%s entity has no sql_updater callable class.', self.name)
 
             return
 
-        self.sql_updater(engine, metadata)
+        if plan is None:
+            self.sql_updater(engine, metadata)
+
+        else:
+            self.sql_updater(engine, metadata, plan)
 
     def parents(self):
         """
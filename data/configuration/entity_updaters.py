@@ -37,7 +37,7 @@ from stdm.data.pg_utils import (
 LOGGER = logging.getLogger('stdm')
 
 
-def entity_updater(entity, engine, metadata):
+def entity_updater(entity, engine, metadata, plan=None):
     """
     Creates/updates/deletes an entity in the database using SQLAlchemy.
     :param entity: Entity instance.
@@ -46,6 +46,9 @@ def entity_updater(entity, engine, metadata):
     :type engine: Engine
     :param metadata: Database container with the schema definition.
     :type metadata: MetaData
+    :param plan: Schema update plan that the changes are added to. If
+    None, the changes are executed immediately.
+    :type plan: SchemaUpdatePlan
     """
     if entity.is_proxy:
         LOGGER.debug('%s is a proxy entity. Table creation will be skipped.',
@@ -61,6 +64,11 @@ def entity_updater(entity, engine, metadata):
                   extend_existing=True
                   )
 
+    if not plan is None:
+        plan_entity_update(entity, table, plan)
+
+        return
+
     if entity.action == DbItem.CREATE:
         LOGGER.debug('Creating %s entity...', entity.name)
         create_entity(entity, table, engine)
@@ -78,6 +86,45 @@ def entity_updater(entity, engine, metadata):
         drop_cascade_table(entity.name)
 
 
+def plan_entity_update(entity, table, plan):
+    """
+    Adds the statements for creating, altering or dropping the entity to
+    the plan. The column changes are merged into one ALTER TABLE statement.
+    :param entity: Entity instance.
+    :type entity: Entity
+    :param table: Table object
+    :type table: Table
+    :param plan: Schema update plan.
+    :type plan: SchemaUpdatePlan
+    """
+    if entity.action == DbItem.DROP:
+        LOGGER.debug('Planning deletion of %s entity...', entity.name)
+        plan.drop_table(entity.name)
+
+        return
+
+    if entity.action == DbItem.CREATE:
+        LOGGER.debug('Planning creation of %s entity...', entity.name)
+        plan.create_table(entity.name)
+
+        #Dropped columns are cleared as in create_entity
+        columns = entity.columns.values() + [
+            c for c in entity.updated_columns.values()
+            if c.action == DbItem.DROP
+        ]
+
+    else:
+        LOGGER.debug('Planning alteration of %s entity...', entity.name)
+        columns = entity.updated_columns.values()
+
+    col_names = plan.catalog.column_names(entity.name)
+
+    with plan.alteration(table):
+        for c in columns:
+            if c.name != 'id':
+                c.update(table, col_names)
+
+
 def create_entity(entity, table, engine):
     """
     Creates a database table corresponding to the entity.
@@ -160,7 +207,7 @@ def update_entity_columns(entity, table, columns):
             LOGGER.debug('Finished updating %s column.', c.name)
 
 
-def value_list_updater(value_list, engine, metadata):
+def value_list_updater(value_list, engine, metadata, plan=None):
     """
     Creates the value list table and adds the lookup values in the table.
     :param value_list: ValueList object containing lookup values.
@@ -169,13 +216,36 @@ def value_list_updater(value_list, engine, metadata):
     :type engine: Engine
     :param metadata: Database container with the schema definition.
     :type metadata: MetaData
+    :param plan: Schema update plan that the changes are added to. If
+    None, the changes are executed immediately.
+    :type plan: SchemaUpdatePlan
     """
-    entity_updater(value_list, engine, metadata)
+    entity_updater(value_list, engine, metadata, plan)
 
     # Return if action is to delete the lookup table
     if value_list.action == DbItem.DROP:
         return
 
+    if plan is None:
+        update_lookup_values(value_list)
+
+        return
+
+    # The values are written through the ORM session which cannot see the
+    # table until the transaction of the plan has been committed.
+    plan.add_deferred(
+        u'Update {0} lookup values'.format(value_list.short_name),
+        lambda: update_lookup_values(value_list)
+    )
+
+
+def update_lookup_values(value_list):
+    """
+    Adds, updates and removes the lookup values in the value list table so
+    that they match the values in the ValueList object.
+    :param value_list: ValueList object containing lookup values.
+    :type value_list: ValueList
+    """
     # Update lookup values
     model = entity_model(value_list, True)
 
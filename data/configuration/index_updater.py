@@ -0,0 +1,149 @@
+"""
+/***************************************************************************
+Name                 : Index Updater
+Description          : Creates the missing indexes of the profile tables in
+                       an existing database without blocking writes to the
+                       tables.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import text
+
+from stdm.data.configuration.column_updaters import (
+    column_indexes,
+    TRIGRAM_EXTENSION
+)
+from stdm.data.configuration.schema_plan import (
+    index_sql,
+    SchemaCatalog
+)
+
+LOGGER = logging.getLogger('stdm')
+
+
+def missing_indexes(profiles, catalog, trigram=False):
+    """
+    Compares the indexes of the columns in the profiles with the indexes
+    in the database.
+    :param profiles: Profiles whose tables are to be indexed.
+    :type profiles: list
+    :param catalog: Catalog of the database.
+    :type catalog: SchemaCatalog
+    :param trigram: True to include the trigram indexes of the searchable
+    columns.
+    :type trigram: bool
+    :return: Returns the name, table, indexed expression and method of the
+    indexes that do not exist.
+    :rtype: list
+    """
+    missing = []
+    names = set()
+
+    for p in profiles:
+        for e in p.entities.values():
+            if e.is_proxy or not catalog.has_table(e.name):
+                continue
+
+            for c in e.columns.values():
+                if not catalog.has_column(e.name, c.name):
+                    continue
+
+                for name, expression, using in column_indexes(c, trigram):
+                    if catalog.has_index(name) or name in names:
+                        continue
+
+                    names.add(name)
+                    missing.append((name, e.name, expression, using))
+
+    return missing
+
+
+def _create_extension(connection, name):
+    #Requires the privileges to create the extension in the database
+    try:
+        connection.execute(
+            text(u'CREATE EXTENSION IF NOT EXISTS {0}'.format(name))
+        )
+
+        return True
+
+    except SQLAlchemyError as err:
+        LOGGER.debug(u'%s extension could not be created. %s', name,
+                     unicode(err))
+
+        return False
+
+
+def reconcile_indexes(profiles, engine, trigram=False, index_started=None):
+    """
+    Creates the missing indexes of the profile tables. The indexes are
+    built concurrently, outside a transaction, so that the tables can still
+    be edited while the indexes of large tables are created. An index that
+    cannot be created is logged and skipped.
+    :param profiles: Profiles whose tables are to be indexed.
+    :type profiles: list
+    :param engine: SQLAlchemy engine.
+    :type engine: Engine
+    :param trigram: True to create the trigram indexes of the searchable
+    columns. The pg_trgm extension is created if it is not installed.
+    :type trigram: bool
+    :param index_started: Callable which is passed the name of each index
+    before it is created.
+    :type index_started: callable
+    :return: Returns the names of the indexes that were created.
+    :rtype: list
+    """
+    connection = engine.connect().execution_options(
+        isolation_level='AUTOCOMMIT'
+    )
+    created = []
+
+    try:
+        catalog = SchemaCatalog.read(connection)
+
+        if trigram and not catalog.has_extension(TRIGRAM_EXTENSION):
+            trigram = _create_extension(connection, TRIGRAM_EXTENSION)
+
+        for name, table, expression, using in missing_indexes(
+                profiles, catalog, trigram):
+            if not index_started is None:
+                index_started(name)
+
+            sql = index_sql(name, table, expression, using, True)
+
+            try:
+                connection.execute(text(sql))
+                created.append(name)
+
+            except SQLAlchemyError as err:
+                LOGGER.debug(u'%s index could not be created. %s', name,
+                             unicode(err))
+
+                #A failed concurrent build leaves an invalid index
+                try:
+                    connection.execute(text(
+                        u'DROP INDEX IF EXISTS {0}'.format(name)
+                    ))
+
+                except SQLAlchemyError as drop_err:
+                    LOGGER.debug(unicode(drop_err))
+
+    finally:
+        connection.close()
+
+    return created
@@ -79,6 +79,8 @@ class Profile(QObject):
         self.entities = OrderedDict()
         self.relations = OrderedDict()
         self.removed_relations = []
+        #Lookups of entities by name and relations by entity
+        self._reset_indexes()
         #Base entity for supporting documents within the profile
         self.supporting_document = SupportingDocument(self)
 
@@ -227,13 +229,61 @@ class Profile(QObject):
         ValueLists are also searched and returned.
         :rtype: Entity
         """
-        items = [e for e in self.entities.values() if e.name == name]
+        ent = self._entity_index().get(name, None)
 
-        if len(items) == 0:
-            return None
-        
-        else:
-            return items[0]
+        #The entity has been renamed since the lookup was built
+        if not ent is None and ent.name != name:
+            self._entity_index_key = None
+            ent = self._entity_index().get(name, None)
+
+        return ent
+
+    def _reset_indexes(self):
+        """
+        Clears the entity and relation lookups so that they are rebuilt on
+        the next lookup. Used when entities or relations are renamed.
+        """
+        self._entity_name_index = None
+        self._entity_index_key = None
+        self._relation_indexes = None
+        self._relation_index_key = None
+
+    @staticmethod
+    def _collection_key(collection):
+        #Changes when items are added or removed or the collection replaced
+        return id(collection), len(collection)
+
+    def _entity_index(self):
+        #Entities by name, the first entity is used if names are duplicated
+        key = self._collection_key(self.entities)
+        if self._entity_name_index is None or self._entity_index_key != key:
+            index = {}
+            for e in self.entities.values():
+                index.setdefault(e.name, e)
+
+            self._entity_name_index = index
+            self._entity_index_key = key
+
+        return self._entity_name_index
+
+    def _relation_index(self):
+        #Relations by parent name, child name and child column
+        key = self._collection_key(self.relations)
+        if self._relation_indexes is None or self._relation_index_key != key:
+            parents, children, child_columns = {}, {}, {}
+            for er in self.relations.values():
+                if not er.parent is None:
+                    parents.setdefault(er.parent.name, []).append(er)
+
+                if not er.child is None:
+                    children.setdefault(er.child.name, []).append(er)
+
+                child_columns.setdefault(er.child_column, []).append(er)
+
+            self._relation_indexes = parents, children, child_columns
+            self._relation_index_key = key
+
+        return self._relation_indexes
 
     def relation(self, name):
         """
@@ -275,8 +325,9 @@ class Profile(QObject):
             raise TypeError(self.tr('Entity object type expected.'))
 
         name = item.name
+        parents = self._relation_index()[0]
 
-        return [er for er in self.relations.values()
+        return [er for er in parents.get(name, [])
                 if er.parent.name == name]
 
     def child_relations(self, item):
@@ -293,10 +344,24 @@ class Profile(QObject):
             return []
 
         name = item.name
+        children = self._relation_index()[1]
 
-        return [er for er in self.relations.values()
+        return [er for er in children.get(name, [])
                 if er.child.name == name]
 
+    def child_column_relations(self, column_name):
+        """
+        :param column_name: Name of the child column.
+        :type column_name: str
+        :return: Returns a list of entity relations whose child column
+        matches the specified name.
+        :rtype: list
+        """
+        child_columns = self._relation_index()[2]
+
+        return [er for er in child_columns.get(column_name, [])
+                if er.child_column == column_name]
+
     def add_entity_relation(self, entity_relation):
         """
         Add an EntityRelation object to the collection
@@ -330,6 +395,24 @@ class Profile(QObject):
 
         self.relations[entity_relation.name] = entity_relation
 
+        #Update the lookups if they were current before the addition
+        if self._relation_index_key == (id(self.relations),
+                                        len(self.relations) - 1):
+            parents, children, child_columns = self._relation_indexes
+            parents.setdefault(entity_relation.parent.name, []).append(
+                entity_relation
+            )
+            children.setdefault(entity_relation.child.name, []).append(
+                entity_relation
+            )
+            child_columns.setdefault(entity_relation.child_column, []).append(
+                entity_relation
+            )
+            self._relation_index_key = self._collection_key(self.relations)
+
+        else:
+            self._relation_index_key = None
+
         LOGGER.debug('%s entity relation added.', entity_relation.name)
 
         return True
@@ -370,13 +453,25 @@ class Profile(QObject):
         """
         # If there is an existing item with the same name,
         # and that item action is not DROP, then do not add this.
+        replace = False
         if item.short_name in self.entities:
             old_item = self.entities[item.short_name]
             if old_item.action <> DbItem.DROP:
                 return
 
+            replace = True
+
         self.entities[item.short_name] = item
 
+        #Update the name lookup if it was current before the addition
+        if not replace and self._entity_index_key == (id(self.entities),
+                                                      len(self.entities) - 1):
+            self._entity_name_index.setdefault(item.name, item)
+            self._entity_index_key = self._collection_key(self.entities)
+
+        else:
+            self._entity_index_key = None
+
         LOGGER.debug('%s entity added to %s profile', item.short_name, self.name)
 
         # Raise entity added signal if enabled
@@ -424,6 +519,7 @@ class Profile(QObject):
 
         #Now remove the entity from the collection
         del_entity = self.entities.pop(name, None)
+        self._reset_indexes()
 
         LOGGER.debug('%s entity removed from %s profile', name, self.name)
 
@@ -618,6 +714,7 @@ class Profile(QObject):
         rn_entity = self.entities.pop(original_name)
 
         rn_entity.rename(new_name)
+        self._reset_indexes()
 
         # Re-insert the entity
         self.add_entity(rn_entity, True)
@@ -629,6 +726,8 @@ class Profile(QObject):
         for cr in child_relations:
             cr.child = rn_entity
 
+        self._reset_indexes()
+
         # Update entities in the STR definition
         if update_party:
             self.social_tenure.add_party(rn_entity)
@@ -0,0 +1,611 @@
+"""
+/***************************************************************************
+Name                 : Schema Update Plan
+Description          : Collects the statements for updating the database
+                       schema from the configuration, merges the column
+                       changes of each table into a single statement and
+                       executes them in one transaction.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table
+)
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.sql.expression import text
+
+LOGGER = logging.getLogger('stdm')
+
+#Key of the alteration in the info of an SQLAlchemy table
+_ALTERATION_KEY = 'stdm_alteration'
+
+_COLUMNS_SQL = u'SELECT c.relname AS table_name, a.attname AS column_name, ' \
+               u'format_type(a.atttypid, a.atttypmod) AS data_type, ' \
+               u'a.attnotnull AS not_null ' \
+               u'FROM pg_catalog.pg_attribute a ' \
+               u'JOIN pg_catalog.pg_class c ON c.oid = a.attrelid ' \
+               u'JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace ' \
+               u'WHERE n.nspname = :schema AND c.relkind = \'r\' ' \
+               u'AND a.attnum > 0 AND NOT a.attisdropped'
+
+_INDEXES_SQL = u'SELECT indexname FROM pg_indexes WHERE schemaname = :schema'
+
+_EXTENSIONS_SQL = u'SELECT extname FROM pg_extension'
+
+_CONSTRAINTS_SQL = u'SELECT con.conname, c.relname ' \
+                   u'FROM pg_catalog.pg_constraint con ' \
+                   u'JOIN pg_catalog.pg_class c ON c.oid = con.conrelid ' \
+                   u'JOIN pg_catalog.pg_namespace n ' \
+                   u'ON n.oid = con.connamespace ' \
+                   u'WHERE n.nspname = :schema'
+
+
+def normalize_type(data_type):
+    """
+    :param data_type: Name of a data type as returned by the database or
+    compiled by SQLAlchemy.
+    :type data_type: str
+    :return: Returns the name of the data type in a form where the names
+    returned by the database and SQLAlchemy can be compared.
+    :rtype: str
+    """
+    name = u''.join(unicode(data_type).lower().split())
+
+    return name.replace(u'charactervarying', u'varchar')
+
+
+def index_sql(name, table, expression, using='btree', concurrently=False):
+    """
+    :return: Returns the CREATE INDEX statement. Concurrent builds do not
+    block writes to the table but cannot run in a transaction.
+    :rtype: str
+    """
+    create = u'CREATE INDEX CONCURRENTLY' if concurrently else u'CREATE INDEX'
+
+    return u'{0} {1} ON {2} USING {3} ({4})'.format(
+        create, name, table, using, expression
+    )
+
+
+def table_alteration(table):
+    """
+    :param table: SQLAlchemy table object.
+    :type table: Table
+    :return: Returns the alteration that the column changes of the table are
+    added to or None if the changes are to be executed immediately.
+    :rtype: TableAlteration
+    """
+    return table.info.get(_ALTERATION_KEY, None)
+
+
+class SchemaCatalog(object):
+    """
+    Tables, columns, indexes and constraints in the database, read with
+    one query for each type of object. The catalog is updated as
+    statements are added to a plan so that the later statements are
+    planned against the schema that the earlier ones will create.
+    """
+    def __init__(self, columns=None, indexes=None, constraints=None,
+                 extensions=None):
+        #Table name: {column name: (data type, not null)}
+        self._columns = columns or {}
+        self._indexes = set(indexes or [])
+        #Constraint name: table name
+        self._constraints = constraints or {}
+        self._extensions = set(extensions or [])
+
+    @classmethod
+    def read(cls, connection, schema='public'):
+        """
+        Reads the catalog of the given schema.
+        :param connection: SQLAlchemy connection.
+        :type connection: Connection
+        :param schema: Name of the database schema.
+        :type schema: str
+        :return: Returns the catalog of the schema.
+        :rtype: SchemaCatalog
+        """
+        columns = {}
+        for r in connection.execute(text(_COLUMNS_SQL), schema=schema):
+            table_cols = columns.setdefault(r['table_name'], {})
+            table_cols[r['column_name']] = (r['data_type'], r['not_null'])
+
+        indexes = [r['indexname'] for r in
+                   connection.execute(text(_INDEXES_SQL), schema=schema)]
+
+        constraints = {}
+        for r in connection.execute(text(_CONSTRAINTS_SQL), schema=schema):
+            constraints[r['conname']] = r['relname']
+
+        extensions = [r['extname'] for r in
+                      connection.execute(text(_EXTENSIONS_SQL))]
+
+        return cls(columns, indexes, constraints, extensions)
+
+    def has_table(self, table):
+        return table in self._columns
+
+    def column_names(self, table):
+        """
+        :return: Returns the names of the columns in the table.
+        :rtype: list
+        """
+        return sorted(self._columns.get(table, {}).keys())
+
+    def has_column(self, table, column):
+        return column in self._columns.get(table, {})
+
+    def column(self, table, column):
+        """
+        :return: Returns the data type and not null flag of the column or
+        None if the column does not exist.
+        :rtype: tuple
+        """
+        return self._columns.get(table, {}).get(column, None)
+
+    def has_index(self, name):
+        return name in self._indexes
+
+    def has_constraint(self, name):
+        return name in self._constraints
+
+    def has_extension(self, name):
+        return name in self._extensions
+
+    def create_table(self, table):
+        self._columns[table] = {'id': (u'integer', True)}
+
+    def drop_table(self, table):
+        self._columns.pop(table, None)
+
+        for name, con_table in self._constraints.items():
+            if con_table == table:
+                del self._constraints[name]
+
+    def add_column(self, table, column, data_type, not_null):
+        self._columns.setdefault(table, {})[column] = (data_type, not_null)
+
+    def drop_column(self, table, column):
+        self._columns.get(table, {}).pop(column, None)
+
+    def add_index(self, name):
+        self._indexes.add(name)
+
+    def add_constraint(self, name, table):
+        self._constraints[name] = table
+
+    def drop_constraint(self, name):
+        self._constraints.pop(name, None)
+
+
+class TableAlteration(object):
+    """
+    Column and constraint changes of a table that are executed as a single
+    ALTER TABLE statement. Indexes are created in separate statements
+    after the table has been altered.
+    """
+    def __init__(self, table, plan):
+        self.table = table
+        self._plan = plan
+        self._catalog = plan.catalog
+        self._clauses = []
+        self._indexes = []
+
+    @property
+    def trigram_indexes(self):
+        """
+        :return: Returns True if trigram indexes are to be created for the
+        searchable columns of the table.
+        :rtype: bool
+        """
+        return self._plan.trigram_indexes
+
+    def _type_sql(self, sa_column):
+        if sa_column.primary_key and isinstance(sa_column.type, Integer):
+            return u'SERIAL'
+
+        return unicode(sa_column.type.compile(dialect=self._plan.dialect))
+
+    def add_column(self, sa_column, unique_name=None):
+        """
+        Adds the column and its unique constraint to the table.
+        :param sa_column: SQLAlchemy column object.
+        :type sa_column: Column
+        :param unique_name: Name of the unique constraint or None if the
+        column is not unique.
+        :type unique_name: str
+        """
+        type_sql = self._type_sql(sa_column)
+        not_null = not sa_column.nullable
+
+        col_sql = u'ADD COLUMN {0} {1}'.format(sa_column.name, type_sql)
+        if not_null:
+            col_sql = u'{0} NOT NULL'.format(col_sql)
+
+        self._clauses.append(col_sql)
+        self._catalog.add_column(self.table, sa_column.name, type_sql,
+                                 not_null)
+
+        if not unique_name is None:
+            self.add_constraint(
+                unique_name, u'UNIQUE ({0})'.format(sa_column.name)
+            )
+
+    def alter_column(self, sa_column):
+        """
+        Changes the data type and nullability of the column where they are
+        different from the column in the database.
+        :param sa_column: SQLAlchemy column object.
+        :type sa_column: Column
+        """
+        db_column = self._catalog.column(self.table, sa_column.name)
+        if db_column is None:
+            return
+
+        db_type, db_not_null = db_column
+        type_sql = self._type_sql(sa_column)
+        not_null = not sa_column.nullable
+
+        if normalize_type(type_sql) != normalize_type(db_type):
+            self._clauses.append(u'ALTER COLUMN {0} TYPE {1}'.format(
+                sa_column.name, type_sql
+            ))
+
+        if not_null != db_not_null:
+            null_sql = u'SET NOT NULL' if not_null else u'DROP NOT NULL'
+            self._clauses.append(u'ALTER COLUMN {0} {1}'.format(
+                sa_column.name, null_sql
+            ))
+
+        self._catalog.add_column(self.table, sa_column.name, type_sql,
+                                 not_null)
+
+    def drop_column(self, name):
+        """
+        Drops the column and the objects that depend on it.
+        :param name: Name of the column.
+        :type name: str
+        """
+        self._clauses.append(
+            u'DROP COLUMN IF EXISTS {0} CASCADE'.format(name)
+        )
+        self._catalog.drop_column(self.table, name)
+
+    def add_constraint(self, name, definition):
+        """
+        Adds a constraint to the table if it does not exist.
+        :param name: Name of the constraint.
+        :type name: str
+        :param definition: Definition of the constraint e.g. CHECK (...).
+        :type definition: str
+        """
+        if self._catalog.has_constraint(name):
+            LOGGER.debug('%s constraint already exists.', name)
+
+            return
+
+        self._clauses.append(u'ADD CONSTRAINT {0} {1}'.format(
+            name, definition
+        ))
+        self._catalog.add_constraint(name, self.table)
+
+    def add_foreign_key(self, name, column, parent, parent_column,
+                        on_update='', on_delete=''):
+        """
+        Adds a foreign key constraint to the table.
+        """
+        definition = u'FOREIGN KEY ({0}) REFERENCES {1} ({2})'.format(
+            column, parent, parent_column
+        )
+        if on_update:
+            definition = u'{0} ON UPDATE {1}'.format(definition, on_update)
+
+        if on_delete:
+            definition = u'{0} ON DELETE {1}'.format(definition, on_delete)
+
+        self.add_constraint(name, definition)
+
+    def drop_constraint(self, name):
+        """
+        Drops the constraint from the table.
+        :param name: Name of the constraint.
+        :type name: str
+        """
+        self._clauses.append(
+            u'DROP CONSTRAINT IF EXISTS {0} CASCADE'.format(name)
+        )
+        self._catalog.drop_constraint(name)
+
+    def add_index(self, name, expression, using='btree'):
+        """
+        Creates an index if it does not exist.
+        :param name: Name of the index.
+        :type name: str
+        :param expression: Name of the column or an expression, optionally
+        followed by an operator class.
+        :type expression: str
+        :param using: Index method.
+        :type using: str
+        """
+        if self._catalog.has_index(name):
+            return
+
+        self._indexes.append(
+            (name, index_sql(name, self.table, expression, using))
+        )
+        self._catalog.add_index(name)
+
+    def defer(self, description, action):
+        """
+        Adds a callable to the plan that is run after the transaction has
+        been committed e.g. for updating the configuration.
+        """
+        self._plan.add_deferred(description, action)
+
+    def statement(self):
+        """
+        :return: Returns the ALTER TABLE statement with all the changes or
+        None if the table has not been changed.
+        :rtype: str
+        """
+        if len(self._clauses) == 0:
+            return None
+
+        return u'ALTER TABLE {0}\n    {1}'.format(
+            self.table, u',\n    '.join(self._clauses)
+        )
+
+    def index_statements(self):
+        """
+        :return: Returns the index names and CREATE INDEX statements.
+        :rtype: list
+        """
+        return list(self._indexes)
+
+
+class SchemaStep(object):
+    """
+    Statement that is executed in the transaction of the plan or an action
+    that is run after the transaction has been committed.
+    """
+    def __init__(self, description, sql=None, action=None):
+        self.description = description
+        self.sql = sql
+        self.action = action
+        self.seconds = None
+
+    @property
+    def deferred(self):
+        return self.sql is None
+
+    def preview(self):
+        """
+        :return: Returns the text of the step in the preview of the plan.
+        :rtype: str
+        """
+        if self.deferred:
+            return u'-- {0} (after commit)'.format(self.description)
+
+        return u'-- {0}\n{1};'.format(self.description, self.sql)
+
+    def run(self, connection):
+        start = time.time()
+
+        try:
+            if self.deferred:
+                self.action()
+
+            else:
+                connection.execute(text(self.sql))
+
+        finally:
+            self.seconds = time.time() - start
+
+
+class SchemaUpdatePlan(object):
+    """
+    Ordered steps for updating the schema. The statements are executed in
+    a single transaction which is rolled back if one of them fails. Steps
+    that use other connections, such as those writing lookup values through
+    the ORM session, cannot see the uncommitted changes so they are run
+    after the commit.
+    """
+    def __init__(self, catalog, dialect, trigram_indexes=False):
+        self.catalog = catalog
+        self.dialect = dialect
+        #Trigram indexes need the operator classes of the pg_trgm extension
+        self.trigram_indexes = trigram_indexes
+        self.steps = []
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add_statement(self, description, sql):
+        """
+        Adds an SQL statement that is executed in the transaction.
+        """
+        self.steps.append(SchemaStep(description, sql=sql))
+
+    def add_deferred(self, description, action):
+        """
+        Adds a callable that is run after the transaction has been
+        committed.
+        """
+        self.steps.append(SchemaStep(description, action=action))
+
+    def create_table(self, table):
+        """
+        Creates the table with an id column if it does not exist.
+        :param table: Name of the table.
+        :type table: str
+        """
+        if self.catalog.has_table(table):
+            LOGGER.debug('%s table already exists.', table)
+
+            return
+
+        id_table = Table(table, MetaData(),
+                         Column('id', Integer, primary_key=True))
+        sql = unicode(CreateTable(id_table).compile(dialect=self.dialect))
+
+        self.add_statement(u'Create {0} table'.format(table), sql.strip())
+        self.catalog.create_table(table)
+
+    def drop_table(self, table):
+        """
+        Drops the table and the objects that depend on it.
+        :param table: Name of the table.
+        :type table: str
+        """
+        self.add_statement(
+            u'Drop {0} table'.format(table),
+            u'DROP TABLE IF EXISTS {0} CASCADE'.format(table)
+        )
+        self.catalog.drop_table(table)
+
+    def drop_view(self, view):
+        """
+        Drops the view and the objects that depend on it.
+        :param view: Name of the view.
+        :type view: str
+        """
+        self.add_statement(
+            u'Drop {0} view'.format(view),
+            u'DROP VIEW IF EXISTS {0} CASCADE'.format(view)
+        )
+
+    def alter_table(self, table):
+        """
+        :param table: Name of the table.
+        :type table: str
+        :return: Returns a new alteration of the table whose statements are
+        added to the plan by :func:`add_alteration`.
+        :rtype: TableAlteration
+        """
+        return TableAlteration(table, self)
+
+    def add_alteration(self, alteration):
+        """
+        Adds the ALTER TABLE statement and the index statements of the
+        alteration to the plan.
+        :param alteration: Changes of a table.
+        :type alteration: TableAlteration
+        """
+        sql = alteration.statement()
+        if not sql is None:
+            self.add_statement(
+                u'Alter {0} table'.format(alteration.table), sql
+            )
+
+        for name, idx_sql in alteration.index_statements():
+            self.add_statement(u'Create {0} index'.format(name), idx_sql)
+
+    @contextmanager
+    def alteration(self, table):
+        """
+        Context manager which attaches an alteration to the SQLAlchemy
+        table so that the column updaters add their changes to it instead
+        of executing them. The alteration is added to the plan on exit.
+        :param table: SQLAlchemy table object.
+        :type table: Table
+        """
+        alteration = self.alter_table(table.name)
+        table.info[_ALTERATION_KEY] = alteration
+
+        try:
+            yield alteration
+
+        finally:
+            del table.info[_ALTERATION_KEY]
+
+        self.add_alteration(alteration)
+
+    def preview(self):
+        """
+        :return: Returns the text of the steps without executing them.
+        :rtype: list
+        """
+        return [s.preview() for s in self.steps]
+
+    def execute(self, engine, step_started=None):
+        """
+        Executes the statements in a single transaction and then runs the
+        deferred steps.
+        :param engine: SQLAlchemy engine.
+        :type engine: Engine
+        :param step_started: Callable which is passed each step before it
+        is run.
+        :type step_started: callable
+        """
+        statements = [s for s in self.steps if not s.deferred]
+        deferred = [s for s in self.steps if s.deferred]
+
+        connection = engine.connect()
+
+        try:
+            trans = connection.begin()
+
+            try:
+                for s in statements:
+                    if not step_started is None:
+                        step_started(s)
+
+                    s.run(connection)
+
+                trans.commit()
+
+            except:
+                trans.rollback()
+
+                raise
+
+        finally:
+            connection.close()
+
+        for s in deferred:
+            if not step_started is None:
+                step_started(s)
+
+            s.run(None)
+
+    def timings(self):
+        """
+        :return: Returns the description and duration in seconds of the
+        steps that have been run.
+        :rtype: list
+        """
+        return [(s.description, s.seconds) for s in self.steps
+                if not s.seconds is None]
+
+    def timings_text(self):
+        """
+        :return: Returns the durations of the steps as lines of text.
+        :rtype: str
+        """
+        timings = self.timings()
+        total = sum([t[1] for t in timings])
+
+        lines = [u'{0:.3f}s {1}'.format(seconds, desc)
+                 for desc, seconds in timings]
+        lines.append(u'{0:.3f}s in total'.format(total))
+
+        return u'\n'.join(lines)
@@ -1,7 +1,6 @@
 from geoodk_reader import (
     GeoODKReader
 )
-from mb_tiles import convert_to_mbtiles
 from xform_model import EntityFormatter
 from geoodk_writer import GeoodkWriter, XFORMDocument
 
@@ -18,7 +18,9 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import csv
 import os
+from collections import OrderedDict
 
 from PyQt4.QtXml import (
     QDomDocument,
@@ -50,6 +52,7 @@ XFOFMDEFAULTS = ['start', 'end', 'deviceid', 'today']
 BINDPARAMS = "jr:preloadParams"
 CUSTOMBINDPARAMS = "jr:preload"
 DOCUMENT = 'supporting_document'
+MEDIASUFFIX = '-media'
 
 
 HOME = QDir.home().path()
@@ -180,10 +183,14 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
     """
     """
 
-    def __init__(self, entities, str_supported):
+    def __init__(self, entities, str_supported, itemset_threshold=0):
         """
         It reads current profile entities and attributes and writes
         the data into an Xml file supported in GeoODK application
+        :param itemset_threshold: Number of lookup values above which the
+        choices are written to an external CSV file in the form media
+        folder. A value of 0 writes all choices in the form.
+        :type itemset_threshold: int
         :return:file
         :rtype:QFile
         """
@@ -191,6 +198,11 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         self.entity_read = None
         self.profile_entity = None
         self.supports_str = str_supported
+        self.itemset_threshold = itemset_threshold
+        self._primary_instance = None
+        #Lookup choices and external choice files keyed by value list name
+        self._lookup_items = {}
+        self._external_lists = OrderedDict()
         self.prep_document_generators()
 
     def initialize_entity_reader(self, entity):
@@ -271,7 +283,8 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         :return:
         """
         doc_model = self.create_node("model")
-        doc_model.appendChild(self._create_model_props())
+        self._primary_instance = self._create_model_props()
+        doc_model.appendChild(self._primary_instance)
         self.create_header_intro(doc_model)
         self.create_form_identifier_field(doc_model)
         self.bind_default_parameters(doc_model)
@@ -730,7 +743,6 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         :param parent_node: the group holding the children
         :return:
         """
-        self.entity_read.read_attributes()
         child_node = self.lookup_formatter(self.entity_read.default_entity(),col)
         parent_node.appendChild(child_node)
 
@@ -741,7 +753,6 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         :param col: Lookup column
         :return:
         """
-        self.entity_read.column_lookup_mapping()
         select_opt = "select1"
         if self.entity_read.column_info_multiselect(col):
             select_opt = "select"
@@ -759,7 +770,6 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         lk_node.appendChild(lk_node_label)
 
         # create lookup element on the form
-        self.entity_read.get_user_selected_entity()
         col_obj = self.entity_read.entity_object().columns[col]
 
         lk_name_values = None
@@ -768,11 +778,123 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
             lk_name_values = self.yes_no_list()
         else:
             #Read lookup from configuration
-            lk_name_values = self.entity_read.format_lookup_items(col)
+            self.lookup_choices(lk_node, col_obj.value_list)
+            return lk_node
         if lk_name_values:
             self.lookup_value_list(lk_node, lk_name_values)
         return lk_node
 
+    def value_list_items(self, value_list):
+        """
+        Read the lookup values of the value list. The values are only read
+        once for all the columns and entities referencing the value list.
+        :param value_list: Value list of the lookup column
+        :type value_list: ValueList
+        :return: lookup values and codes
+        :rtype: OrderedDict
+        """
+        name = unicode(value_list.name)
+        items = self._lookup_items.get(name, None)
+        if items is None:
+            items = OrderedDict()
+            for val in value_list.values.values():
+                items[unicode(val.value)] = unicode(val.code)
+            self._lookup_items[name] = items
+        return items
+
+    def lookup_choices(self, lookupnode, value_list):
+        """
+        Add the lookup choices to the form field. Large value lists are
+        written to an external choice file that is referenced by an itemset
+        instead of being written as items in the form.
+        :param lookupnode: select node
+        :type lookupnode: QDomElement
+        :param value_list: Value list of the lookup column
+        :type value_list: ValueList
+        :return: node
+        """
+        items = self.value_list_items(value_list)
+        if 0 < self.itemset_threshold < len(items):
+            instance_id = self.external_choice_file(value_list.name, items)
+            return self.lookup_itemset(lookupnode, instance_id)
+        return self.lookup_value_list(lookupnode, items)
+
+    def media_path(self):
+        """
+        Folder of the form media files that are copied to the device
+        together with the form
+        :return: path
+        :rtype: str
+        """
+        form_base_name = os.path.splitext(self.form_name())[0]
+        return os.path.join(FORM_HOME, form_base_name + MEDIASUFFIX)
+
+    def external_choice_file(self, name, items):
+        """
+        Write the lookup values to a CSV choice file in the form media
+        folder. The file is only written once per value list.
+        :param name: Value list name, also used as the instance id
+        :type name: str
+        :param items: lookup values and codes
+        :type items: dict
+        :return: instance id
+        :rtype: str
+        """
+        instance_id = unicode(name)
+        if instance_id in self._external_lists:
+            return instance_id
+        media_dir = self.media_path()
+        if not os.path.isdir(media_dir):
+            os.makedirs(media_dir)
+        csv_name = instance_id + '.csv'
+        with open(os.path.join(media_dir, csv_name), 'wb') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['name', 'label'])
+            for key, val in items.iteritems():
+                if val == "":
+                    val = key
+                writer.writerow([val.encode('utf_8'), key.encode('utf_8')])
+        self._external_lists[instance_id] = csv_name
+        return instance_id
+
+    def lookup_itemset(self, lookupnode, instance_id):
+        """
+        Reference the choices in an external choice file
+        :param lookupnode: select node
+        :type lookupnode: QDomElement
+        :param instance_id: id of the secondary instance of the choices
+        :type instance_id: str
+        :return: node
+        """
+        itemset = self.create_node("itemset")
+        itemset.setAttribute(
+            "nodeset", "instance('{0}')/root/item".format(instance_id))
+        value_node = self.create_node("value")
+        value_node.setAttribute("ref", "name")
+        label_node = self.create_node("label")
+        label_node.setAttribute("ref", "label")
+        itemset.appendChild(value_node)
+        itemset.appendChild(label_node)
+        lookupnode.appendChild(itemset)
+        return lookupnode
+
+    def external_instances(self):
+        """
+        Add a secondary instance in the model for each external choice file
+        written for the form
+        :return:
+        """
+        if self._primary_instance is None:
+            return
+        doc_model = self._primary_instance.parentNode()
+        ref_node = self._primary_instance
+        for instance_id, csv_name in self._external_lists.iteritems():
+            instance = self.create_node("instance")
+            instance.setAttribute("id", instance_id)
+            instance.setAttribute("src", "jr://file-csv/{0}".format(csv_name))
+            doc_model.insertAfter(instance, ref_node)
+            ref_node = instance
+
     def lookup_value_list(self, lookupnode, value_list):
         """
         Add lookup value list in the form as choices in teh form field
@@ -814,8 +936,8 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         lk_node_label.appendChild(lk_node_label_txt)
         lk_node.appendChild(lk_node_label)
 
-        str_lookup_attributes = self.entity_read.social_tenure_lkup_from_col(key)
-        self.lookup_value_list(lk_node, str_lookup_attributes)
+        value_list = self.entity_read.social_tenure().columns[key].value_list
+        self.lookup_choices(lk_node, value_list)
         parent.appendChild(lk_node)
         return lk_node
 
@@ -829,5 +951,6 @@ class GeoodkWriter(EntityFormatter, XFORMDocument):
         root_node = self.create_xform_root_node()
         root_node.appendChild(self.header_fragment_data())
         root_node.appendChild(self._body_section())
+        self.external_instances()
         self.doc.appendChild(root_node)
         self.write_to_form()
@@ -3,3 +3,4 @@ from uuid_extractor import InstanceUUIDExtractor
 from geometry_provider import GeometryProvider
 from geometry_provider import STDMGeometry
 from import_log import ImportLogger
+from batch_importer import BatchImportSession, ImportCache
@@ -0,0 +1,179 @@
+"""
+/***************************************************************************
+Name                 : BatchImportSession
+Description          : Caches entity models and lookup values for a GeoODK
+                       import run and writes each instance in its own
+                       transaction, committing instances in groups.
+
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import exc
+
+from stdm.data.configuration import entity_model
+from stdm.data.database import STDMDb
+
+#Number of instances written before the transaction is committed
+DEFAULT_COMMIT_SIZE = 100
+
+
+class ImportCache(object):
+    """
+    Holds the models of the entities and the lookup maps used while
+    importing instances so that they are only built once per run.
+    """
+    def __init__(self):
+        self._models = {}
+        self._attr_maps = {}
+
+    def entity_model(self, entity, with_supporting_document=False):
+        """
+        :param entity: Entity whose model is required.
+        :type entity: Entity
+        :param with_supporting_document: True to also return the supporting
+        document model.
+        :type with_supporting_document: bool
+        :return: Returns the model class of the entity, or a tuple of the
+        model class and supporting document model if
+        'with_supporting_document' is True.
+        """
+        key = (entity.name, with_supporting_document)
+        model = self._models.get(key, None)
+
+        if model is None:
+            model = entity_model(
+                entity,
+                with_supporting_document=with_supporting_document
+            )
+            self._models[key] = model
+
+        return model
+
+    def _attr_map(self, entity, attr):
+        key = (entity.name, attr)
+        attr_map = self._attr_maps.get(key, None)
+
+        if attr_map is None:
+            model = self.entity_model(entity)
+            session = STDMDb.instance().session
+            attr_map = {}
+
+            for rec_id, value in session.query(model.id,
+                                               getattr(model, attr)):
+                attr_map.setdefault(value, rec_id)
+
+            self._attr_maps[key] = attr_map
+
+        return attr_map
+
+    def attr_to_id(self, entity, attr, value):
+        """
+        Cached equivalent of 'entity_attr_to_id'. The values of the column
+        are read in one query the first time.
+        :return: The id of the record whose column value matches the given
+        value, or the value itself if there is no match.
+        """
+        return self._attr_map(entity, attr).get(value, value)
+
+    def attr_to_model_id(self, entity, attr, value):
+        """
+        Cached equivalent of 'entity_attr_to_model(...).id'.
+        :return: The id of the record whose column value matches the given
+        value, or None if there is no match.
+        :rtype: int
+        """
+        return self._attr_map(entity, attr).get(value, None)
+
+
+class BatchImportSession(object):
+    """
+    Import run in which each instance (parents, children, social tenure
+    relationship and supporting documents) is written within a savepoint
+    and the instances are committed in groups. The caller commits a group
+    once 'commit_due' is True so that a failed commit can be reported for
+    the whole group.
+    """
+    def __init__(self, commit_size=None):
+        if commit_size is None:
+            commit_size = DEFAULT_COMMIT_SIZE
+
+        self._session = STDMDb.instance().session
+        self._commit_size = max(1, commit_size)
+        self._pending = 0
+        self.cache = ImportCache()
+
+    @contextmanager
+    def instance(self):
+        """
+        Context manager for writing an instance. If an error occurs, only
+        the rows of the instance are rolled back and the error is raised.
+        The instance is not committed.
+        """
+        savepoint = self._session.begin_nested()
+
+        try:
+            yield self
+
+            self._session.flush()
+            savepoint.commit()
+
+        except Exception:
+            savepoint.rollback()
+            raise
+
+        self._pending += 1
+
+    def commit_due(self):
+        """
+        :return: True if the number of instances written since the last
+        commit has reached the commit size.
+        :rtype: bool
+        """
+        return self._pending >= self._commit_size
+
+    def add(self, model):
+        """
+        Adds the model object to the session and flushes it so that its id
+        is available to the dependent entities in the instance.
+        :param model: Entity model object.
+        :type model: object
+        """
+        self._session.add(model)
+        self._session.flush()
+
+    def commit(self):
+        """
+        Commits the instances that have been written. If the commit fails,
+        all the instances written since the last commit are rolled back and
+        the error is raised.
+        """
+        try:
+            self._session.commit()
+
+        except exc.SQLAlchemyError as db_error:
+            self._session.rollback()
+            self._pending = 0
+            raise db_error
+
+        self._pending = 0
+
+    def rollback(self):
+        """
+        Discards the instances that have not been committed.
+        """
+        self._session.rollback()
+        self._pending = 0
@@ -19,12 +19,12 @@ email                : stdm@unhabitat.org
  ***************************************************************************/
 """
 import os
-from PyQt4.QtXml import QDomDocument
-from PyQt4.QtCore import QFile, QIODevice
+from PyQt4.QtCore import QFile
 from stdm.settings import current_profile
 from stdm.utils.util import entity_attr_to_id, entity_attr_to_model
 from stdm.data.configuration import entity_model
 from stdm.geoodk.importer.geometry_provider import STDMGeometry
+from stdm.geoodk.importer.instance_reader import read_instance
 from stdm.data.configuration.columns import GeometryColumn
 from stdm.ui.sourcedocument import SourceDocumentManager
 from PyQt4.QtCore import \
@@ -46,23 +46,29 @@ class EntityImporter():
     """
     class constructor
     """
-    def __init__(self, instance):
+    def __init__(self, instance, batch=None, record=None):
         """
         Initialize variables
+        :param batch: Batch import session whose cached models and lookups
+        are used. The entities are committed by the batch session instead
+        of individually.
+        :type batch: BatchImportSession
+        :param record: Instance already parsed by the instance reader.
+        :type record: dict
         """
         self.instance = instance
-        self.instance_doc = QDomDocument()
-        self.set_instance_document(self.instance)
+        self.batch = batch
+        self.instance_doc = record
+        if self.instance_doc is None:
+            self.set_instance_document(self.instance)
         self.key_watch = 0
 
     def set_instance_document(self, file_p):
         """
-
+        Read the entity groups in the instance file
         :return:
         """
-        file_path = QFile(file_p)
-        if file_path.open(QIODevice.ReadOnly):
-            self.instance_doc.setContent(file_path)
+        self.instance_doc = read_instance(file_p)
 
     def geomsetter(self, val):
         """
@@ -90,14 +96,7 @@ class EntityImporter():
         return: table column name and column data
         :rtype: dictionary
         """
-        attributes = {}
-        nodes = self.instance_doc.elementsByTagName(entity)
-        entity_nodes = nodes.item(0).childNodes()
-        if entity_nodes:
-            for j in range(entity_nodes.count()):
-                node_val = entity_nodes.item(j).toElement()
-                attributes[node_val.nodeName()] = node_val.text().rstrip()
-        return attributes
+        return dict(self.instance_doc['entities'].get(entity, {}))
 
     def instance_group_id(self):
         """
@@ -109,14 +108,11 @@ class EntityImporter():
         :rtype: string
         """
         global GROUPCODE
-        gp_code = self.instance_doc.elementsByTagName('identity')
-        if gp_code:
-            user_code = gp_code.at(0).toElement().text()
-            if user_code != '' or user_code is not None:
-                GROUPCODE = user_code
-                return user_code
-            else:
-                return None
+        user_code = self.instance_doc['identity']
+        if user_code is None:
+            user_code = ''
+        GROUPCODE = user_code
+        return user_code
 
     def process_import_to_db(self, entity,ids):
         """
@@ -127,7 +123,7 @@ class EntityImporter():
         success = False
         if self.instance_doc is not None:
             attributes = self.entity_attributes_from_instance(entity)
-            entity_add = Save2DB(entity, attributes,ids)
+            entity_add = Save2DB(entity, attributes, ids, self.batch)
             entity_add.objects_from_supporting_doc(self.instance)
             child_id = entity_add.save_to_db()
             entity_add.get_srid(GEOMPARAM)
@@ -146,7 +142,7 @@ class EntityImporter():
         success = False
         if self.instance_doc is not None:
             attributes = self.entity_attributes_from_instance(entity)
-            entity_add = Save2DB(entity, attributes)
+            entity_add = Save2DB(entity, attributes, batch=self.batch)
             entity_add.objects_from_supporting_doc(self.instance)
             entity_add.get_srid(GEOMPARAM)
             ref_id = entity_add.save_parent_to_db()
@@ -179,7 +175,8 @@ class EntityImporter():
         if self.social_tenure_definition_captured():
             attributes = self.entity_attributes_from_instance('social_tenure')
             if attributes:
-                entity_add = Save2DB('social_tenure', attributes, ids)
+                entity_add = Save2DB('social_tenure', attributes, ids,
+                                     self.batch)
                 entity_add.objects_from_supporting_doc(self.instance)
                 entity_add.save_to_db()
         else:
@@ -189,7 +186,7 @@ class Save2DB:
     """
     Class to insert entity data into db
     """
-    def __init__(self, entity, attributes, ids=None):
+    def __init__(self, entity, attributes, ids=None, batch=None):
         """
         Initialize class and class variable
         """
@@ -197,8 +194,10 @@ class Save2DB:
         self.form_entity = entity
         self.doc_model = None
         self._doc_manager =None
+        self.batch = batch
         self.entity = self.object_from_entity_name(self.form_entity)
         self.model = self.dbmodel_from_entity()
+        self._column_types = self.column_info()
         self.key = 0
         self.parents_ids = ids
         self.geom = 4326
@@ -235,7 +234,9 @@ class Save2DB:
         :return:
         """
         if self.entity_has_supporting_docs():
-            entity_object, self.doc_model = entity_model(self.entity, with_supporting_document=True)
+            entity_object, self.doc_model = self._entity_model(
+                self.entity, with_supporting_document=True
+            )
             entity_object_model = entity_object()
             if hasattr(entity_object_model, 'documents'):
                 if self.entity.TYPE_INFO == 'SOCIAL_TENURE':
@@ -247,10 +248,50 @@ class Save2DB:
                         obj_doc_col, self.doc_model
                     )
         else:
-            entity_object = entity_model(self.entity)
+            entity_object = self._entity_model(self.entity)
             entity_object_model = entity_object()
         return entity_object_model
 
+    def _entity_model(self, entity, with_supporting_document=False):
+        """
+        Returns the entity model from the batch cache where applicable.
+        """
+        if self.batch is not None:
+            return self.batch.cache.entity_model(
+                entity, with_supporting_document
+            )
+        return entity_model(
+            entity, with_supporting_document=with_supporting_document
+        )
+
+    def _attr_to_id(self, entity, attr, value):
+        """
+        Returns the id of the record matching the attribute value, using
+        the batch lookup cache where applicable.
+        """
+        if self.batch is not None:
+            return self.batch.cache.attr_to_id(entity, attr, value)
+        return entity_attr_to_id(entity, attr, value)
+
+    def _attr_to_model_id(self, entity, attr, value):
+        """
+        Returns the id of the model matching the attribute value, using
+        the batch lookup cache where applicable.
+        """
+        if self.batch is not None:
+            return self.batch.cache.attr_to_model_id(entity, attr, value)
+        return entity_attr_to_model(entity, attr, value).id
+
+    def _save_model(self):
+        """
+        Saves the model. In a batch import, the model is flushed and
+        committed later by the batch session.
+        """
+        if self.batch is not None:
+            self.batch.add(self.model)
+        else:
+            self.model.save()
+
     def objects_from_supporting_doc(self, instance_file = None):
         """
         Create supporting doc path  instances based on the collected documents
@@ -276,7 +317,7 @@ class Save2DB:
         # Create document container
         doc_container = QVBoxLayout()
         supporting_doc_entity = self.entity.supporting_doc.document_type_entity
-        document_type_id = entity_attr_to_id(supporting_doc_entity, 'value', doc, lower=False)
+        document_type_id = self._attr_to_id(supporting_doc_entity, 'value', doc)
         # Register container
         self._doc_manager.registerContainer(
             doc_container,
@@ -327,13 +368,13 @@ class Save2DB:
             pass
         for k, v in self.attributes.iteritems():
             if hasattr(self.model, k):
-                col_type = self.column_info().get(k)
+                col_type = self._column_types.get(k)
                 col_prop = self.entity.columns[k]
                 var = self.attribute_formatter(col_type, col_prop, v)
                 setattr(self.model, k, var)
         if self.entity_has_supporting_docs():
             self.model.documents = self._doc_manager.model_objects()
-        self.model.save()
+        self._save_model()
         return self.model.id
         #self.cleanup()
 
@@ -345,13 +386,13 @@ class Save2DB:
         """
         for k, v in self.attributes.iteritems():
             if hasattr(self.model, k):
-                col_type = self.column_info().get(k)
+                col_type = self._column_types.get(k)
                 col_prop = self.entity.columns[k]
                 var = self.attribute_formatter(col_type, col_prop, v)
                 setattr(self.model, k, var)
         if self.entity_has_supporting_docs():
             self.model.documents = self._doc_manager.model_objects()
-        self.model.save()
+        self._save_model()
         self.key = self.model.id
         return self.key
 
@@ -394,40 +435,34 @@ class Save2DB:
             if var == '' or var is None:
                 return None
             if var == 'Yes' or var =='No':
-                return entity_attr_to_model(col_prop.parent, 'value', var).id
-            if not len(var) > 3 and var != 'Yes' and var != 'No':
-                lk_code = entity_attr_to_id(col_prop.parent, "code", var)
+                return self._attr_to_model_id(col_prop.parent, 'value', var)
+            lk_code = self._attr_to_id(col_prop.parent, "code", var)
+            if not len(var) > 3:
                 if not str(lk_code).isdigit():
                     return None
                 else:
                     return lk_code
-            if len(var) > 3:
-                if not str(entity_attr_to_id(col_prop.parent, 'code', var)).isdigit():
-                    return entity_attr_to_model(col_prop.parent, 'value', var).id
-                else:
-                    lk_code = entity_attr_to_id(col_prop.parent, "code", var)
-                    if not str(lk_code).isdigit():
-                        return None
-                    else:
-                        return lk_code
+            if not str(lk_code).isdigit():
+                return self._attr_to_model_id(col_prop.parent, 'value', var)
             else:
-                return None
+                return lk_code
         elif col_type == 'ADMIN_SPATIAL_UNIT':
             if not len(var) > 3:
-                return entity_attr_to_id(col_prop.parent, "code", var)
+                return self._attr_to_id(col_prop.parent, "code", var)
             else:
-                return entity_attr_to_id(col_prop.parent, "name", var)
+                return self._attr_to_id(col_prop.parent, "name", var)
 
         elif col_type == 'MULTIPLE_SELECT':
             if var == '' or var is None:
                 return None
+            first_parent = col_prop.association.first_parent
+            lk_code = self._attr_to_id(first_parent, "code", var)
             if not len(var) > 3:
-                return entity_attr_to_id(col_prop.association.first_parent, "code", var)
-            elif len(var) > 3:
-                if not str(entity_attr_to_id(col_prop.association.first_parent, "code", var)).isdigit():
-                    return entity_attr_to_model(col_prop.association.first_parent,'value', var).id
-                else:
-                    return entity_attr_to_id(col_prop.association.first_parent, "code", var)
+                return lk_code
+            elif not str(lk_code).isdigit():
+                return self._attr_to_model_id(first_parent, 'value', var)
+            else:
+                return lk_code
 
         elif col_type == 'GEOMETRY':
             defualt_srid = 0
@@ -438,10 +473,8 @@ class Save2DB:
                 geom_provider.set_user_srid(defualt_srid)
             else:
                 geom_provider.set_user_srid(GEOMPARAM)
-            if col_prop.geometry_type() == 'POINT':
-                return geom_provider.point_to_Wkt()
-            if col_prop.geometry_type() == 'POLYGON':
-                return geom_provider.polygon_to_Wkt()
+            if col_prop.geometry_type() in ('POINT', 'LINESTRING', 'POLYGON'):
+                return geom_provider.to_wkb(col_prop.geometry_type())
         elif col_type == 'FOREIGN_KEY':
             if self.parents_ids is None or len(self.parents_ids) < 0:
                 return
@@ -19,6 +19,13 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import struct
+
+import numpy as np
+
+from osgeo import osr
+
+from geoalchemy2 import WKBElement
 
 from qgis.core import (
     QgsGeometry,
@@ -27,6 +34,134 @@ from qgis.core import (
     QgsCoordinateTransform
 )
 
+DEFAULT_SRID = 4326
+
+#WKB geometry type codes
+WKB_POINT = 1
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+
+#Transformations from WGS84 keyed by the destination srid
+_transforms = {}
+
+
+def decode_coordinates(geom_str):
+    """
+    Parses an ODK geopoint, geotrace or geoshape string into an array of
+    coordinates in one pass. Each vertex is in the form
+    'latitude longitude altitude accuracy' and vertices are separated by
+    a semi-colon. Altitude and accuracy are dropped.
+    :param geom_str: ODK geometry string.
+    :type geom_str: str
+    :return: Returns an (n, 2) array of longitude (x) and latitude (y)
+    rounded to 6 decimal places.
+    :rtype: ndarray
+    """
+    vertices = [v for v in geom_str.split(';') if v.strip() != '']
+    num_vertices = len(vertices)
+    if num_vertices == 0:
+        return np.empty((0, 2))
+
+    values = np.fromstring(geom_str.replace(';', ' '), sep=' ')
+    num_cols = len(vertices[0].split())
+
+    if num_cols < 2 or values.size != num_vertices * num_cols:
+        #Vertices have a differing number of values
+        values = np.array([[float(c) for c in v.split()[:2]] for v in vertices])
+        num_cols = 2
+
+    coords = values.reshape(num_vertices, num_cols)[:, 1::-1]
+
+    return np.round(coords, 6)
+
+
+def _wgs84_transform(srid):
+    transform = _transforms.get(srid, None)
+
+    if transform is None:
+        source = osr.SpatialReference()
+        source.ImportFromEPSG(DEFAULT_SRID)
+        dest = osr.SpatialReference()
+        if dest.ImportFromEPSG(srid) != 0:
+            return None
+
+        #Keep longitude, latitude order with GDAL 3
+        if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+            source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            dest.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+        transform = osr.CoordinateTransformation(source, dest)
+        _transforms[srid] = transform
+
+    return transform
+
+
+def _qgs_transform(coords, srid):
+    #Fallback for coordinate systems that are not in the EPSG database
+    crs_transform = QgsCoordinateTransform(
+        QgsCoordinateReferenceSystem(
+            DEFAULT_SRID, QgsCoordinateReferenceSystem.EpsgCrsId
+        ),
+        QgsCoordinateReferenceSystem(
+            srid, QgsCoordinateReferenceSystem.PostgisCrsId
+        )
+    )
+    geom = QgsGeometry.fromMultiPoint(
+        [QgsPoint(x, y) for x, y in coords]
+    )
+    geom.transform(crs_transform)
+
+    return np.array([[p.x(), p.y()] for p in geom.asMultiPoint()])
+
+
+def transform_coordinates(coords, srid):
+    """
+    Reprojects WGS84 coordinates to the coordinate system with the given
+    srid. All the coordinates are transformed in a single call.
+    :param coords: (n, 2) array of longitude and latitude values.
+    :type coords: ndarray
+    :param srid: Destination srid.
+    :type srid: int
+    :return: Returns an (n, 2) array of the transformed coordinates.
+    :rtype: ndarray
+    """
+    if srid == DEFAULT_SRID or len(coords) == 0:
+        return coords
+
+    transform = _wgs84_transform(srid)
+    if transform is None:
+        return _qgs_transform(coords, srid)
+
+    points = transform.TransformPoints(coords.tolist())
+
+    return np.array(points)[:, :2]
+
+
+def coordinates_to_wkb(coords, geom_type):
+    """
+    Writes the coordinates as little endian WKB.
+    :param coords: (n, 2) array of coordinates.
+    :type coords: ndarray
+    :param geom_type: One of 'POINT', 'LINESTRING' or 'POLYGON'.
+    :type geom_type: str
+    :return: Returns the WKB of the geometry.
+    :rtype: str
+    """
+    coord_bytes = np.ascontiguousarray(coords, dtype='<f8').tostring()
+
+    if geom_type == 'POINT':
+        return struct.pack('<BI', 1, WKB_POINT) + coord_bytes[:16]
+
+    if geom_type == 'LINESTRING':
+        return struct.pack('<BII', 1, WKB_LINESTRING, len(coords)) + \
+               coord_bytes
+
+    if geom_type == 'POLYGON':
+        return struct.pack('<BIII', 1, WKB_POLYGON, 1, len(coords)) + \
+               coord_bytes
+
+    raise ValueError('Unsupported geometry type: {0}'.format(geom_type))
+
 class GeometryProvider:
     """
     Class constructor
@@ -40,6 +175,7 @@ class GeometryProvider:
         """
         self.point_list = string_list
         self._local_list = []
+        self._coords = None
         self._X = 0
         self._Y = 0
         self.srid = 4326
@@ -76,19 +212,29 @@ class GeometryProvider:
         else:
             return self._local_list[0]
 
+    def coordinates(self):
+        """
+        :return: Returns the x and y coordinates of the vertices, the string
+        is only parsed once.
+        :rtype: ndarray
+        """
+        if self._coords is None:
+            self._coords = decode_coordinates(self.point_list)
+        return self._coords
+
     def x(self):
         """
 
         :return:
         """
-        return self.point().split()[1]
+        return self.coordinates()[0][0]
 
     def y(self):
         """
 
         :return:
         """
-        return self.point().split()[0]
+        return self.coordinates()[0][1]
 
     def set_point(self,x):
         """
@@ -120,14 +266,8 @@ class GeometryProvider:
 
         :return:
         """
-        self.point_to_list()
-        line_array = []
-        for point in self._local_list:
-            if point != '':
-                var = point.replace('0.0 0.0', '').strip().split(' ')
-                line_array.append(QgsPoint(self.set_point(var[1]),
-                                           self.set_point(var[0])))
-        return QgsGeometry.fromPolyline([line_array])
+        line_array = [QgsPoint(x, y) for x, y in self.coordinates()]
+        return QgsGeometry.fromPolyline(line_array)
 
     def create_point(self):
         """
@@ -143,13 +283,7 @@ class GeometryProvider:
 
         :return:
         """
-        self.point_to_list()
-        line_array = []
-        for point in self._local_list:
-            if point != '':
-                var = point.replace('0.0 0.0', '').strip().split(' ')
-                line_array.append(QgsPoint(self.set_point(var[1]),
-                                           self.set_point(var[0])))
+        line_array = [QgsPoint(x, y) for x, y in self.coordinates()]
 
         geom_poly = QgsGeometry.fromPolygon([line_array])
 
@@ -222,6 +356,29 @@ class STDMGeometry(GeometryProvider):
         point_wkt = point.exportToWkt()
         return 'SRID={};{}'.format(self.srid, point_wkt)
 
+    def to_wkb(self, geom_type):
+        """
+        Creates the geometry directly from the coordinate array, transformed
+        to the user selected coordinate system.
+        :param geom_type: One of 'POINT', 'LINESTRING' or 'POLYGON'.
+        :type geom_type: str
+        :return: Returns the geometry as WKB ready to import into the DB.
+        :rtype: WKBElement
+        """
+        srid = int(self.user_srid())
+        coords = self.coordinates()
+        if len(coords) == 0:
+            return None
+
+        if geom_type == 'POLYGON' and not np.array_equal(coords[0], coords[-1]):
+            #Close the ring
+            coords = np.vstack((coords, coords[:1]))
+
+        coords = transform_coordinates(coords, srid)
+        wkb = coordinates_to_wkb(coords, geom_type)
+
+        return WKBElement(buffer(wkb), srid=srid)
+
 
 
 
@@ -0,0 +1,247 @@
+"""
+/***************************************************************************
+Name                 : InstanceReader
+Description          : Streams GeoODK instance files and extracts the entity
+                       groups, identity code and supporting document
+                       references in a single pass.
+
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import os
+from collections import OrderedDict
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+LOGGER = logging.getLogger('stdm')
+
+IDENTITY = 'identity'
+META = 'meta'
+DOCUMENT_SUFFIX = 'supporting_document'
+
+#Maximum number of parsed instances retained in the cache
+MAX_CACHED_INSTANCES = 2000
+
+#Parse results keyed by path, least recently used first:
+#(modified time, record)
+_INSTANCE_CACHE = OrderedDict()
+
+
+def _local_name(tag):
+    #Strip the namespace from the tag
+    if '}' in tag:
+        return tag.split('}', 1)[1]
+
+    return tag
+
+
+def _element_text(element):
+    return u''.join([unicode(t) for t in element.itertext()])
+
+
+def _read_group(element, record):
+    """
+    Adds the element and its descendants that contain child elements as
+    entity groups in the record. As with the DOM lookup by tag name, only
+    the first occurrence of a group is used.
+    """
+    for el in element.iter():
+        children = list(el)
+        if len(children) == 0:
+            continue
+
+        tag = _local_name(el.tag)
+        if tag in record['entities']:
+            continue
+
+        attributes = {}
+        for child in children:
+            attributes[_local_name(child.tag)] = _element_text(child).rstrip()
+
+        record['entities'][tag] = attributes
+
+        if tag == META and record['uuid'] is None:
+            record['uuid'] = _element_text(children[0])
+
+        documents = dict([
+            (k, v) for k, v in attributes.iteritems()
+            if k.endswith(DOCUMENT_SUFFIX) and v != ''
+        ])
+        if len(documents) > 0:
+            record['documents'][tag] = documents
+
+    if record['identity'] is None:
+        #The element itself is checked first then its descendants
+        for el in element.iter():
+            if _local_name(el.tag) == IDENTITY:
+                record['identity'] = _element_text(el)
+                break
+
+
+def parse_instance(path):
+    """
+    Reads the instance file in one pass. Each top level group is released
+    once it has been read so that large instance files are not held in
+    memory.
+    :param path: Absolute path of the instance file.
+    :type path: str
+    :return: Returns a dictionary containing the name of the root element
+    ('root'), names of its child elements ('groups'), attributes of each
+    entity group ('entities'), the identity code ('identity'), the instance
+    uuid ('uuid') and supporting document file names by entity group
+    ('documents').
+    :rtype: dict
+    """
+    record = {
+        'path': path,
+        'root': None,
+        'groups': [],
+        'entities': {},
+        'identity': None,
+        'uuid': None,
+        'documents': {}
+    }
+    root = None
+    depth = 0
+
+    for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            if depth == 0:
+                root = element
+                record['root'] = _local_name(element.tag)
+            elif depth == 1:
+                record['groups'].append(_local_name(element.tag))
+            depth += 1
+
+            continue
+
+        depth -= 1
+        if depth == 1:
+            _read_group(element, record)
+            root.remove(element)
+
+    return record
+
+
+def _try_parse(path):
+    #Errors are returned to the caller
+    try:
+        return path, parse_instance(path), None
+
+    except Exception as ex:
+        return path, None, unicode(ex)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+
+    except OSError:
+        return None
+
+
+def _cached(path):
+    path = os.path.abspath(path)
+    cached = _INSTANCE_CACHE.pop(path, None)
+    if cached is None:
+        return None
+
+    mtime, record = cached
+    if mtime != _mtime(path):
+        return None
+
+    #Mark as recently used
+    _INSTANCE_CACHE[path] = cached
+
+    return record
+
+
+def _cache(path, record):
+    path = os.path.abspath(path)
+    mtime = _mtime(path)
+    if mtime is None:
+        return
+
+    _INSTANCE_CACHE.pop(path, None)
+    _INSTANCE_CACHE[path] = (mtime, record)
+
+    while len(_INSTANCE_CACHE) > MAX_CACHED_INSTANCES:
+        _INSTANCE_CACHE.popitem(last=False)
+
+
+def rename_cached(old_path, new_path):
+    """
+    Moves the parsed instance to the new path of a renamed file so that it
+    is not read again.
+    """
+    cached = _INSTANCE_CACHE.pop(os.path.abspath(old_path), None)
+    if cached is None:
+        return
+
+    mtime, record = cached
+    record['path'] = new_path
+    _INSTANCE_CACHE[os.path.abspath(new_path)] = (mtime, record)
+
+
+def read_instance(path):
+    """
+    :param path: Absolute path of the instance file.
+    :type path: str
+    :return: Returns the parsed instance, which is only read again if the
+    file has been modified.
+    :rtype: dict
+    """
+    record = _cached(path)
+    if record is None:
+        record = parse_instance(path)
+        _cache(path, record)
+
+    return record
+
+
+def read_instances(paths):
+    """
+    Reads the instance files that have not been cached or have been
+    modified. The files are read in the current process since a process
+    pool cannot be forked from QGIS desktop.
+    :param paths: Absolute paths of the instance files.
+    :type paths: list
+    :return: Yields a tuple of the path and parsed instance in the same
+    order as the paths. The parsed instance is None if the file could not
+    be read.
+    :rtype: tuple
+    """
+    for path in paths:
+        record = _cached(path)
+        if record is None:
+            path, record, error = _try_parse(path)
+            if record is None:
+                LOGGER.debug(u'Could not read instance {0}. {1}'.format(
+                    path, error))
+            else:
+                _cache(path, record)
+
+        yield path, record
+
+
+def clear_cache():
+    """
+    Removes all the parsed instances from the cache.
+    """
+    _INSTANCE_CACHE.clear()
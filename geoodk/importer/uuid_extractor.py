@@ -20,12 +20,13 @@ email                : stdm@unhabitat.org
 """
 
 import os
-from PyQt4.QtCore import QFile, QIODevice
-from PyQt4.QtXml import (
-    QDomDocument,
-    QDomNode
-)
+from PyQt4.QtCore import QFile
+from PyQt4.QtXml import QDomNode
 from stdm.geoodk import GeoODKReader
+from stdm.geoodk.importer.instance_reader import (
+    read_instance,
+    rename_cached
+)
 UUID = "uuid"
 
 class InstanceUUIDExtractor():
@@ -39,8 +40,8 @@ class InstanceUUIDExtractor():
         self.file_path = path
         self.file = None
         self.new_list = []
-        self.doc = QDomDocument()
         self.node = QDomNode()
+        self.record = None
 
     def set_file_path(self, path):
         """
@@ -52,12 +53,12 @@ class InstanceUUIDExtractor():
 
     def set_document(self):
         """
-
+        Read the instance file, the file is only parsed again if it has
+        been modified since it was last read.
         :return:
         """
         self.file = QFile(self.file_path)
-        if self.file.open(QIODevice.ReadOnly):
-            self.doc.setContent(self.file)
+        self.record = read_instance(self.file_path)
 
     def on_file_passed(self):
         """
@@ -67,8 +68,6 @@ class InstanceUUIDExtractor():
         try:
             self.set_document()
             self.read_uuid_element()
-            self.doc.clear()
-            self.file.close()
             self.rename_file()
         except:
             pass
@@ -77,10 +76,9 @@ class InstanceUUIDExtractor():
         """
         get the uuid element and text from the xml document from the mobile divice
         """
-        node = self.doc.elementsByTagName("meta")
-        for i in range(node.count()):
-            node = node.item(i).firstChild().toElement()
-            self.node = node.text()
+        uuid = self.record['uuid']
+        if uuid is not None:
+            self.node = uuid
         return self.node
 
     def document_entities(self, profile):
@@ -89,14 +87,9 @@ class InstanceUUIDExtractor():
         :return:
         """
         self.set_document()
-        node_list = []
-        nodes = self.doc.elementsByTagName(profile)
-        node = nodes.item(0).childNodes()
-        if node:
-            for j in range(node.count()):
-                node_val = node.item(j)
-                node_list.append(node_val.nodeName())
-        return node_list
+        if self.record['root'] == profile:
+            return list(self.record['groups'])
+        return self.record['entities'].get(profile, {}).keys()
 
 
     def str_definition(self):
@@ -104,14 +97,9 @@ class InstanceUUIDExtractor():
         Check if the instance file has entry social tenure
         :return:
         """
-        attributes = {}
-        nodes = self.doc.elementsByTagName('social_tenure')
-        entity_nodes = nodes.item(0).childNodes()
-        if entity_nodes:
-            for j in range(entity_nodes.count()):
-                node_val = entity_nodes.item(j).toElement()
-                attributes[node_val.nodeName()] = node_val.text().rstrip()
-        return attributes
+        if self.record is None:
+            return {}
+        return dict(self.record['entities'].get('social_tenure', {}))
 
     def has_str_captured_in_instance(self):
         """
@@ -153,6 +141,8 @@ class InstanceUUIDExtractor():
                 new_file_name = self.uuid_element()+".xml"
                 isrenamed = self.file.setFileName(new_file_name)
                 os.rename(file_n, new_file_name)
+                rename_cached(self.file_path,
+                              os.path.join(dir_n, new_file_name))
                 self.new_list.append(new_file_name)
                 return isrenamed
             else:
@@ -17,14 +17,661 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import numpy as np
+
 from osgeo import osr,gdal
 
+from PyQt4.QtCore import (
+    pyqtSignal,
+    QObject,
+    QProcess
+)
+
+from stdm.utils.process_pool import process_pool_supported
+
+LOGGER = logging.getLogger('stdm')
+
+TILE_SIZE = 256
+
+#Half the width of the Web Mercator world in metres
+MERCATOR_ORIGIN = 20037508.342789244
+MERCATOR_SRS = 'EPSG:3857'
+
+#Number of tiles written to the MBTiles file per insert batch
+INSERT_BATCH_SIZE = 500
+
+#Number of tiles sent to a pool process at a time
+TILE_CHUNK_SIZE = 16
+
+#Prefixes of the lines written by the worker to the standard output
+WORKER_PROGRESS = 'PROGRESS'
+WORKER_DONE = 'DONE'
+WORKER_FAIL = 'FAIL'
+
+TILE_FORMATS = {
+    'png': 'PNG',
+    'jpg': 'JPEG'
+}
+
+#Warped raster opened once in each pool process
+_worker_ds = None
+_worker_format = None
+
+
+def tile_span(zoom):
+    """
+    :return: Returns the width of a tile in metres at the zoom level.
+    :rtype: float
+    """
+    return 2 * MERCATOR_ORIGIN / (2 ** zoom)
+
+
+def tile_range(bounds, zoom):
+    """
+    :param bounds: Extent in Web Mercator as (minx, miny, maxx, maxy).
+    :type bounds: tuple
+    :return: Returns the range of XYZ tile columns and rows covering the
+    extent as (min column, min row, max column, max row).
+    :rtype: tuple
+    """
+    span = tile_span(zoom)
+    last = 2 ** zoom - 1
+    minx, miny, maxx, maxy = bounds
+
+    min_col = int(math.floor((minx + MERCATOR_ORIGIN) / span))
+    max_col = int(math.ceil((maxx + MERCATOR_ORIGIN) / span)) - 1
+    min_row = int(math.floor((MERCATOR_ORIGIN - maxy) / span))
+    max_row = int(math.ceil((MERCATOR_ORIGIN - miny) / span)) - 1
+
+    return (
+        max(0, min_col), max(0, min_row),
+        min(last, max_col), min(last, max_row)
+    )
+
+
+def _dataset_bounds(ds):
+    gt = ds.GetGeoTransform()
+    minx = gt[0]
+    maxy = gt[3]
+    maxx = minx + gt[1] * ds.RasterXSize
+    miny = maxy + gt[5] * ds.RasterYSize
+
+    return minx, miny, maxx, maxy
+
+
+def _read_vsimem(path):
+    vsi_file = gdal.VSIFOpenL(path, 'rb')
+    gdal.VSIFSeekL(vsi_file, 0, 2)
+    size = gdal.VSIFTellL(vsi_file)
+    gdal.VSIFSeekL(vsi_file, 0, 0)
+    data = gdal.VSIFReadL(1, size, vsi_file)
+    gdal.VSIFCloseL(vsi_file)
+    gdal.Unlink(path)
+
+    return data
+
+
+def _init_worker(warped_path, tile_format):
+    global _worker_ds, _worker_format
+
+    _worker_ds = None
+    if warped_path is not None:
+        _worker_ds = gdal.Open(warped_path)
+    _worker_format = tile_format
+
+
+def _encode_tile(rgba, tile_format):
+    if tile_format == 'jpg':
+        bands = rgba[:3]
+    else:
+        bands = rgba
+
+    mem_ds = gdal.GetDriverByName('MEM').Create(
+        '', TILE_SIZE, TILE_SIZE, len(bands), gdal.GDT_Byte
+    )
+    for i, band_data in enumerate(bands):
+        mem_ds.GetRasterBand(i + 1).WriteArray(band_data)
+
+    vsi_path = '/vsimem/stdm_tile_{0}.{1}'.format(os.getpid(), tile_format)
+    gdal.GetDriverByName(TILE_FORMATS[tile_format]).CreateCopy(
+        vsi_path, mem_ds
+    )
+    mem_ds = None
+
+    return _read_vsimem(vsi_path)
+
+
+def render_tile(tile):
+    """
+    Renders a tile from the warped raster opened in the current process.
+    :param tile: Zoom level, XYZ column and row of the tile.
+    :type tile: tuple
+    :return: Returns the tile together with the hash and encoded image of
+    the tile. The hash and image are None if the tile is empty.
+    :rtype: tuple
+    """
+    zoom, col, row = tile
+    ds = _worker_ds
+    gt = ds.GetGeoTransform()
+    span = tile_span(zoom)
+
+    #Window of the tile in raster pixels
+    rx = (col * span - MERCATOR_ORIGIN - gt[0]) / gt[1]
+    ry = (gt[3] - (MERCATOR_ORIGIN - row * span)) / -gt[5]
+    rsize_x = span / gt[1]
+    rsize_y = span / -gt[5]
+
+    x0 = max(0.0, rx)
+    y0 = max(0.0, ry)
+    x1 = min(float(ds.RasterXSize), rx + rsize_x)
+    y1 = min(float(ds.RasterYSize), ry + rsize_y)
+    if x1 <= x0 or y1 <= y0:
+        return tile, None, None
+
+    #Part of the tile covered by the window
+    tx0 = int(round((x0 - rx) / rsize_x * TILE_SIZE))
+    ty0 = int(round((y0 - ry) / rsize_y * TILE_SIZE))
+    tx1 = int(round((x1 - rx) / rsize_x * TILE_SIZE))
+    ty1 = int(round((y1 - ry) / rsize_y * TILE_SIZE))
+    if tx1 <= tx0 or ty1 <= ty0:
+        return tile, None, None
+
+    xoff = int(math.floor(x0))
+    yoff = int(math.floor(y0))
+    xsize = max(1, int(math.ceil(x1)) - xoff)
+    ysize = max(1, int(math.ceil(y1)) - yoff)
+
+    data = ds.ReadAsArray(
+        xoff, yoff, xsize, ysize,
+        buf_xsize=tx1 - tx0, buf_ysize=ty1 - ty0,
+        resample_alg=gdal.GRIORA_Average
+    )
+    if data.ndim == 2:
+        data = data[np.newaxis, :, :]
+
+    #The warped raster always has an alpha band
+    alpha = data[-1]
+    if not alpha.any():
+        return tile, None, None
+
+    colour = data[:-1]
+    if len(colour) < 3:
+        colour = np.repeat(colour[:1], 3, axis=0)
+
+    rgba = np.zeros((4, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    rgba[:3, ty0:ty1, tx0:tx1] = colour[:3]
+    rgba[3, ty0:ty1, tx0:tx1] = alpha
+
+    tile_data = _encode_tile(rgba, _worker_format)
+
+    return tile, hashlib.sha1(tile_data).hexdigest(), tile_data
+
+
+def _render_worker(tile):
+    #Runs in the pool processes, errors are returned to the caller
+    try:
+        return render_tile(tile) + (None,)
+
+    except Exception as ex:
+        return tile, None, None, unicode(ex)
+
+
+class MBTilesBuilder(object):
+    """
+    Builds an MBTiles tile pyramid from a raster. The raster is warped to
+    Web Mercator once and the tiles of each zoom level are rendered in a
+    process pool, or in the current process where a pool cannot be used
+    such as in QGIS desktop. Use MBTilesProcess to render the tiles in a
+    pool from QGIS desktop. Empty tiles are skipped and identical tiles,
+    such as areas of a single colour, are only stored once.
+    """
+    def __init__(self, input_file, output_file, min_zoom=None,
+                 max_zoom=None, tile_format='png', processes=None):
+        """
+        :param input_file: Path of the source raster.
+        :type input_file: str
+        :param output_file: Path of the MBTiles file to be created.
+        :type output_file: str
+        :param min_zoom: Lowest zoom level, defaults to the level at which
+        the raster fits in a single tile.
+        :type min_zoom: int
+        :param max_zoom: Highest zoom level, defaults to the level closest
+        to the resolution of the raster.
+        :type max_zoom: int
+        :param tile_format: 'png' or 'jpg'. JPEG tiles are smaller but have
+        no transparency.
+        :type tile_format: str
+        :param processes: Number of pool processes, defaults to the number
+        of CPUs.
+        :type processes: int
+        """
+        if not tile_format in TILE_FORMATS:
+            raise ValueError('Unsupported tile format: {0}'.format(
+                tile_format))
+
+        self.input_file = input_file
+        self.output_file = output_file
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.tile_format = tile_format
+        self.processes = processes
+        self._tmp_dir = None
+
+    def _prepare_source(self, src_ds):
+        #Expand palettes and scale non-byte rasters to 8 bits
+        band = src_ds.GetRasterBand(1)
+        options = {}
+        if band.GetColorTable() is not None:
+            options['rgbExpand'] = 'rgba'
+        if band.DataType != gdal.GDT_Byte:
+            options['outputType'] = gdal.GDT_Byte
+            options['scaleParams'] = [[]]
+
+        if len(options) == 0:
+            return src_ds
+
+        vrt_path = os.path.join(self._tmp_dir, 'source.vrt')
 
-def convert_to_mbtiles(input_file, outputfile):
+        return gdal.Translate(vrt_path, src_ds, format='VRT', **options)
+
+    def warp(self):
+        """
+        Warps the source raster to Web Mercator and builds overviews so
+        that the tiles of low zoom levels are read from the overviews.
+        :return: Returns the path of the warped raster.
+        :rtype: str
+        """
+        src_ds = gdal.Open(self.input_file)
+        if src_ds is None:
+            raise IOError('Unable to open {0}'.format(self.input_file))
+
+        src_ds = self._prepare_source(src_ds)
+        has_alpha = src_ds.GetRasterBand(
+            src_ds.RasterCount
+        ).GetColorInterpretation() == gdal.GCI_AlphaBand
+
+        warped_path = os.path.join(self._tmp_dir, 'warped.tif')
+        warped_ds = gdal.Warp(
+            warped_path,
+            src_ds,
+            dstSRS=MERCATOR_SRS,
+            dstAlpha=not has_alpha,
+            resampleAlg='bilinear',
+            multithread=True,
+            creationOptions=['TILED=YES', 'BIGTIFF=IF_SAFER']
+        )
+        if warped_ds is None:
+            raise IOError('Unable to warp {0}'.format(self.input_file))
+
+        levels = []
+        size = max(warped_ds.RasterXSize, warped_ds.RasterYSize)
+        factor = 2
+        while size / factor >= TILE_SIZE:
+            levels.append(factor)
+            factor *= 2
+        if len(levels) > 0:
+            warped_ds.BuildOverviews('AVERAGE', levels)
+
+        warped_ds = None
+
+        return warped_path
+
+    def zoom_levels(self, ds):
+        """
+        :return: Returns the minimum and maximum zoom levels for the warped
+        raster.
+        :rtype: tuple
+        """
+        gt = ds.GetGeoTransform()
+        resolution = min(gt[1], -gt[5])
+        max_zoom = self.max_zoom
+        if max_zoom is None:
+            max_zoom = int(round(math.log(
+                2 * MERCATOR_ORIGIN / (TILE_SIZE * resolution), 2
+            )))
+
+        min_zoom = self.min_zoom
+        if min_zoom is None:
+            minx, miny, maxx, maxy = _dataset_bounds(ds)
+            extent = max(maxx - minx, maxy - miny)
+            min_zoom = int(math.floor(math.log(
+                2 * MERCATOR_ORIGIN / extent, 2
+            )))
+
+        min_zoom = max(0, min(min_zoom, max_zoom))
+
+        return min_zoom, max(0, max_zoom)
+
+    def _tiles(self, bounds, min_zoom, max_zoom):
+        for zoom in range(min_zoom, max_zoom + 1):
+            min_col, min_row, max_col, max_row = tile_range(bounds, zoom)
+            for col in range(min_col, max_col + 1):
+                for row in range(min_row, max_row + 1):
+                    yield zoom, col, row
+
+    def _tile_count(self, bounds, min_zoom, max_zoom):
+        count = 0
+        for zoom in range(min_zoom, max_zoom + 1):
+            min_col, min_row, max_col, max_row = tile_range(bounds, zoom)
+            count += (max_col - min_col + 1) * (max_row - min_row + 1)
+
+        return count
+
+    def _create_mbtiles(self, bounds, min_zoom, max_zoom):
+        if os.path.exists(self.output_file):
+            os.remove(self.output_file)
+
+        conn = sqlite3.connect(self.output_file)
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA journal_mode=MEMORY')
+        cursor.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE map (
+                zoom_level INTEGER,
+                tile_column INTEGER,
+                tile_row INTEGER,
+                tile_id TEXT
+            );
+            CREATE TABLE images (tile_id TEXT, tile_data BLOB);
+            CREATE UNIQUE INDEX map_index ON map (
+                zoom_level, tile_column, tile_row
+            );
+            CREATE UNIQUE INDEX images_id ON images (tile_id);
+            CREATE VIEW tiles AS
+                SELECT map.zoom_level AS zoom_level,
+                    map.tile_column AS tile_column,
+                    map.tile_row AS tile_row,
+                    images.tile_data AS tile_data
+                FROM map JOIN images ON images.tile_id = map.tile_id;
+        """)
+
+        #Bounds in geographic coordinates
+        mercator = osr.SpatialReference()
+        mercator.ImportFromEPSG(3857)
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+            mercator.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        transform = osr.CoordinateTransformation(mercator, wgs84)
+        west, south = transform.TransformPoint(bounds[0], bounds[1])[:2]
+        east, north = transform.TransformPoint(bounds[2], bounds[3])[:2]
+
+        name = os.path.splitext(os.path.basename(self.input_file))[0]
+        metadata = [
+            ('name', name),
+            ('type', 'baselayer'),
+            ('version', '1.1'),
+            ('description', name),
+            ('format', self.tile_format),
+            ('bounds', '{0},{1},{2},{3}'.format(west, south, east, north)),
+            ('minzoom', str(min_zoom)),
+            ('maxzoom', str(max_zoom))
+        ]
+        cursor.executemany(
+            'INSERT INTO metadata (name, value) VALUES (?, ?)', metadata
+        )
+
+        return conn
+
+    def _write_batch(self, cursor, images, tiles):
+        cursor.executemany(
+            'INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)',
+            images
+        )
+        cursor.executemany(
+            'INSERT OR REPLACE INTO map (zoom_level, tile_column, tile_row, '
+            'tile_id) VALUES (?, ?, ?, ?)',
+            tiles
+        )
+
+    def build(self, progress=None, use_pool=None):
+        """
+        Creates the MBTiles file.
+        :param progress: Callable that is passed the number of tiles that
+        have been processed and the total number of tiles.
+        :type progress: function
+        :param use_pool: True to render the tiles in a process pool,
+        defaults to whether a pool can be used by the current process.
+        :type use_pool: bool
+        :return: Returns the number of tiles written, excluding empty tiles.
+        :rtype: int
+        """
+        if use_pool is None:
+            use_pool = process_pool_supported()
+
+        self._tmp_dir = tempfile.mkdtemp(prefix='stdm_mbtiles_')
+        pool = None
+
+        try:
+            warped_path = self.warp()
+            warped_ds = gdal.Open(warped_path)
+            bounds = _dataset_bounds(warped_ds)
+            min_zoom, max_zoom = self.zoom_levels(warped_ds)
+            warped_ds = None
+
+            total = self._tile_count(bounds, min_zoom, max_zoom)
+            tiles = self._tiles(bounds, min_zoom, max_zoom)
+
+            if use_pool:
+                pool = multiprocessing.Pool(
+                    self.processes,
+                    _init_worker,
+                    (warped_path, self.tile_format)
+                )
+                results = pool.imap_unordered(
+                    _render_worker, tiles, TILE_CHUNK_SIZE
+                )
+            else:
+                _init_worker(warped_path, self.tile_format)
+                results = (_render_worker(t) for t in tiles)
+
+            conn = self._create_mbtiles(bounds, min_zoom, max_zoom)
+            cursor = conn.cursor()
+            seen = set()
+            images = []
+            map_rows = []
+            done = 0
+            written = 0
+
+            for tile, tile_id, tile_data, error in results:
+                done += 1
+                if error is not None:
+                    LOGGER.debug('Could not render tile {0}. {1}'.format(
+                        tile, error))
+
+                if tile_id is not None:
+                    zoom, col, row = tile
+                    #MBTiles rows are numbered from the bottom
+                    map_rows.append((zoom, col, 2 ** zoom - 1 - row, tile_id))
+                    if not tile_id in seen:
+                        seen.add(tile_id)
+                        images.append((tile_id, sqlite3.Binary(tile_data)))
+                    written += 1
+
+                if len(map_rows) >= INSERT_BATCH_SIZE:
+                    self._write_batch(cursor, images, map_rows)
+                    images = []
+                    map_rows = []
+
+                if not progress is None:
+                    progress(done, total)
+
+            self._write_batch(cursor, images, map_rows)
+            conn.commit()
+            cursor.execute('ANALYZE')
+            conn.close()
+
+            return written
+
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+            #Release the warped raster before it is removed
+            _init_worker(None, None)
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+def convert_to_mbtiles(input_file, outputfile, min_zoom=None, max_zoom=None,
+                       tile_format='png', progress=None):
     """
     method to convert gdal file(TIFF) to MBTiles
-    :param self:
+    :param input_file: Path of the source raster
+    :param outputfile: Path of the MBTiles file to be created
+    :param progress: Callable passed the tiles processed and total tiles
     :return:file
     """
-    return gdal.Translate(input_file, outputfile)
+    builder = MBTilesBuilder(
+        input_file,
+        outputfile,
+        min_zoom=min_zoom,
+        max_zoom=max_zoom,
+        tile_format=tile_format
+    )
+    builder.build(progress)
+
+    return outputfile
+
+
+class MBTilesProcess(QObject):
+    """
+    Builds an MBTiles file in a separate Python process, using
+    mbtiles_worker.py, so that the tiles are rendered in a process pool
+    and QGIS desktop remains responsive.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(bool, unicode)
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self._process = None
+        self._output_file = None
+        self._message = u''
+        self._written = 0
+
+    @property
+    def written(self):
+        """
+        :return: Returns the number of tiles written by the last build.
+        :rtype: int
+        """
+        return self._written
+
+    def is_running(self):
+        """
+        :return: True if the worker process is running.
+        :rtype: bool
+        """
+        return not self._process is None and \
+               self._process.state() != QProcess.NotRunning
+
+    def start(self, input_file, output_file, min_zoom=None, max_zoom=None,
+              tile_format='png', processes=None):
+        """
+        Starts building the MBTiles file. The arguments are the same as
+        those of MBTilesBuilder. The 'finished' signal is emitted with the
+        status and error message of the build.
+        :raises RuntimeError: If the Python interpreter used to run the
+        worker could not be found.
+        """
+        #Avoids loading the composer package for in-process builds
+        from stdm.composer.render_farm import python_executable
+
+        python_exec = python_executable()
+        if not python_exec:
+            raise RuntimeError(
+                'The Python interpreter used to build the MBTiles file '
+                'could not be found.'
+            )
+
+        args = [
+            os.path.join(os.path.dirname(__file__), 'mbtiles_worker.py'),
+            input_file,
+            output_file,
+            '--format',
+            tile_format
+        ]
+        if not min_zoom is None:
+            args.extend(['--min-zoom', str(min_zoom)])
+        if not max_zoom is None:
+            args.extend(['--max-zoom', str(max_zoom)])
+        if not processes is None:
+            args.extend(['--processes', str(processes)])
+
+        self._output_file = output_file
+        self._message = u''
+        self._written = 0
+
+        self._process = QProcess(self)
+        self._process.readyReadStandardOutput.connect(self._on_output)
+        self._process.error.connect(self._on_error)
+        self._process.finished.connect(self._on_finished)
+        self._process.start(python_exec, args)
+
+    def cancel(self):
+        """
+        Stops the worker process. The incomplete MBTiles file is removed.
+        """
+        if self.is_running():
+            self._message = u'Cancelled'
+            self._process.kill()
+
+    def _on_output(self):
+        while self._process.canReadLine():
+            line = unicode(self._process.readLine()).strip()
+            self._parse_worker_line(line)
+
+    def _parse_worker_line(self, line):
+        parts = line.split('\t')
+        try:
+            if parts[0] == WORKER_PROGRESS and len(parts) == 3:
+                self.progress.emit(int(parts[1]), int(parts[2]))
+
+            elif parts[0] == WORKER_DONE and len(parts) == 2:
+                self._written = int(parts[1])
+
+            elif parts[0] == WORKER_FAIL and len(parts) > 1:
+                self._message = u'\t'.join(parts[1:])
+
+            elif line:
+                LOGGER.debug(u'MBTiles worker: {0}'.format(line))
+
+        except ValueError:
+            LOGGER.debug(u'Invalid MBTiles worker output: {0}'.format(line))
+
+    def _on_error(self, error):
+        msg = unicode(self._process.errorString())
+        LOGGER.debug(u'MBTiles worker error: {0}'.format(msg))
+
+        #A worker that could not be started does not emit 'finished'
+        if error == QProcess.FailedToStart:
+            self._message = msg
+            self.finished.emit(False, msg)
+
+    def _on_finished(self, exit_code, exit_status):
+        #Pick any lines that were not read before the process exited
+        self._on_output()
+
+        success = exit_status == QProcess.NormalExit and exit_code == 0 \
+                  and not self._message
+        if not success and not self._message:
+            self._message = unicode(
+                self._process.readAllStandardError()
+            ).strip()
+
+        if not success and os.path.isfile(self._output_file):
+            os.remove(self._output_file)
 
+        self.finished.emit(success, self._message)
@@ -0,0 +1,100 @@
+"""
+/***************************************************************************
+Name                 : MBTiles Worker
+Description          : Python process that builds an MBTiles file, with the
+                       tiles rendered in a process pool, on behalf of
+                       MBTilesProcess.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import argparse
+import os
+import sys
+
+#The plugins directory needs to be in the path for the stdm package imports
+_PLUGINS_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+)
+if not _PLUGINS_DIR in sys.path:
+    sys.path.insert(0, _PLUGINS_DIR)
+
+#Number of tiles processed between progress lines
+PROGRESS_STEP = 100
+
+
+def _write_line(*parts):
+    line = u'\t'.join([unicode(p).replace(u'\n', u' ') for p in parts])
+    sys.stdout.write(u'{0}\n'.format(line).encode('utf-8'))
+    sys.stdout.flush()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='mbtiles_worker.py',
+        description='Builds an MBTiles file from a raster.'
+    )
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--min-zoom', type=int, default=None)
+    parser.add_argument('--max-zoom', type=int, default=None)
+    parser.add_argument('--format', default='png')
+    parser.add_argument('--processes', type=int, default=None)
+
+    return parser.parse_args(argv[1:])
+
+
+def main(argv):
+    from stdm.geoodk.mb_tiles import (
+        MBTilesBuilder,
+        WORKER_DONE,
+        WORKER_FAIL,
+        WORKER_PROGRESS
+    )
+
+    args = _parse_args(argv)
+
+    def progress(done, total):
+        if done % PROGRESS_STEP == 0 or done == total:
+            _write_line(WORKER_PROGRESS, done, total)
+
+    try:
+        builder = MBTilesBuilder(
+            args.input_file,
+            args.output_file,
+            min_zoom=args.min_zoom,
+            max_zoom=args.max_zoom,
+            tile_format=args.format,
+            processes=args.processes
+        )
+
+        #The worker is not a GUI application hence the pool can be used
+        written = builder.build(progress, use_pool=True)
+
+    except Exception as ex:
+        if os.path.isfile(args.output_file):
+            os.remove(args.output_file)
+
+        _write_line(WORKER_FAIL, ex)
+
+        return 1
+
+    _write_line(WORKER_DONE, written)
+
+    return 0
+
+
+#The pool processes import this module on Windows
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
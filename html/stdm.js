@@ -2,6 +2,7 @@
  * STDM OpenLayers spatial unit overlay.
 */
 var map, osm, gsat, spatialUnitFeature, spatialUnitLayer, spUnitStyleMap;
+var spatialUnitExtent;
 
 var BaseLayerCode = { "GMAPS_SATELLITE": 2010, "OSM": 2011 }
 
@@ -121,20 +122,49 @@ function drawSpatialUnit(geometry, label) {
         spatialUnitFeature = spatialUnitFeature[0];
     }
 
+    spatialUnitExtent = spatialUnitFeature.geometry.getBounds();
+
 	zoomToSpatialUnitExtent(true);
 	
 	return map.getZoom();
     
 }
 
+/*
+* Draw the point/line/polygon overlays of several spatial units.
+* 'featureCollection' - GeoJSON feature collection object of the spatial
+* units, the properties of each feature contain the optional label.
+*/
+function drawSpatialUnits(featureCollection) {
+
+    clearOverlays();
+
+    var geojson_format = new OpenLayers.Format.GeoJSON();
+
+    var features = geojson_format.read(featureCollection);
+
+    if (features.length == 0) {
+        return map.getZoom();
+    }
+
+    spatialUnitLayer.addFeatures(features);
+
+    spatialUnitFeature = features[0];
+    spatialUnitExtent = spatialUnitLayer.getDataExtent();
+
+	zoomToSpatialUnitExtent(true);
+
+	return map.getZoom();
+
+}
+
 /*
  * Zooms to the extents of the last loaded spatial unit.
 */
 function zoomToSpatialUnitExtent(doNotReturnLevel){
-    if (spatialUnitFeature) {
+    if (spatialUnitExtent) {
 
-        var bounds = spatialUnitFeature.geometry.getBounds();
-        bounds = bounds.scale(1.2);
+        var bounds = spatialUnitExtent.scale(1.2);
         map.zoomToExtent(bounds);
 
         if (typeof(doNotReturnLevel) === 'undefined') {
@@ -152,6 +182,8 @@ function clearOverlays() {
     if (spatialUnitLayer != null){
         spatialUnitLayer.removeAllFeatures();
     }
+    spatialUnitFeature = null;
+    spatialUnitExtent = null;
 }
 
 /*
@@ -16,10 +16,14 @@ email                : gkahiu@gmail.com
  *                                                                         *
  ***************************************************************************/
 """
+from collections import OrderedDict
+
 from PyQt4.QtGui import QApplication
 from PyQt4.QtCore import pyqtSignal,QObject
 
 from sqlalchemy import Table
+from sqlalchemy import exc
+from sqlalchemy.sql.expression import text
 
 from stdm.data.database import (
     Content,
@@ -129,30 +133,62 @@ class ContentGroup(QObject,HashableMixin):
         """
         pg_account = "postgres"   
         
-        if self._username == pg_account:
-            for c in self.contentItems():
-                if isinstance(c,Content):
-                    cnt = Content()
-                    qo = cnt.queryObject()
-                    cn = qo.filter(Content.code == c.code).first()
-                    
-                    #If content not found then add
-                    if cn is None:
-                        #Check if the 'postgres' role is defined, if not then create one
-                        rl = Role()
-                        rolequery = rl.queryObject()
-                        role = rolequery.filter(Role.name == pg_account).first()
-                        
-                        if role is None:
-                            rl.name = pg_account
-                            rl.contents = [c]
-                            rl.save()                     
-                        else:
-                            existingContents = role.contents
-                            #Append new content to existing 
-                            existingContents.append(c)
-                            role.contents = existingContents
-                            role.update()
+        if self._username != pg_account:
+            return
+
+        #Unique content items by code
+        contents = OrderedDict()
+        for c in self.contentItems():
+            if isinstance(c, Content) and not c.code in contents:
+                contents[c.code] = c
+
+        if len(contents) == 0:
+            return
+
+        '''
+        Insert the content items that do not exist and link them to the
+        'postgres' role, which is created if it is not defined, in one
+        transaction.
+        '''
+        params = {'role': pg_account}
+        values = []
+        for i, c in enumerate(contents.values()):
+            values.append('(:name{0}, :code{0})'.format(i))
+            params['name{0}'.format(i)] = c.name
+            params['code{0}'.format(i)] = c.code
+
+        role_sql = text(
+            "INSERT INTO role (name, description) "
+            "SELECT :role, '' WHERE NOT EXISTS "
+            "(SELECT 1 FROM role WHERE name = :role)"
+        )
+        content_sql = text(
+            "WITH new_content AS ("
+            "INSERT INTO content_base (name, code) "
+            "SELECT c.name, c.code FROM (VALUES {0}) AS c (name, code) "
+            "WHERE NOT EXISTS (SELECT 1 FROM content_base cb "
+            "WHERE cb.code = c.code OR cb.name = c.name) "
+            "RETURNING id) "
+            "INSERT INTO content_roles (content_base_id, role_id) "
+            "SELECT new_content.id, role.id FROM new_content, role "
+            "WHERE role.name = :role "
+            "RETURNING content_base_id".format(', '.join(values))
+        )
+
+        session = STDMDb.instance().session
+        try:
+            session.execute(role_sql, {'role': pg_account})
+            registered = session.execute(content_sql, params).fetchall()
+            session.commit()
+
+        except exc.SQLAlchemyError:
+            session.rollback()
+            raise
+
+        #Permissions are read again with the new content
+        if len(registered) > 0:
+            from stdm.security.authorization import clear_permissions
+            clear_permissions(self._username)
 
             
 class TableContentGroup(ContentGroup):
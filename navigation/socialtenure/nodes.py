@@ -40,7 +40,14 @@ from PyQt4.QtCore import (
 from qgis.core import *
 
 from stdm.utils import *
-from stdm.ui.sourcedocument import source_document_location
+from stdm.ui.sourcedocument import (
+    network_document_path,
+    source_document_location
+)
+from stdm.network import (
+    is_content_hash,
+    NetworkFileManager
+)
 from stdm.settings import current_profile
 
 from stdm.utils.util import (
@@ -668,7 +675,19 @@ class STRNode(EntityNode):
         :return: None
         :rtype: NoneType
         """
+        #Only removed if not referenced by other records, documents with
+        #the same content are deleted together.
+        content_docs = [m for m in model_obj_list
+                        if is_content_hash(m.document_identifier)]
+        if len(content_docs) > 0:
+            NetworkFileManager(
+                network_document_path()
+            ).delete_content_documents(content_docs)
+
         for model in model_obj_list:
+            if is_content_hash(model.document_identifier):
+                continue
+
             extension = model.filename[model.filename.rfind('.'):]
             # print 'Generating thumbnail'
             curr_profile = current_profile()
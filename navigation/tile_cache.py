@@ -0,0 +1,663 @@
+"""
+/***************************************************************************
+Name                 : Web Tile Cache
+Description          : Disk cache of base layer tiles for the web spatial
+                       preview, served to the embedded page through a
+                       custom network access manager.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import math
+import os
+import re
+
+from PyQt4.QtCore import (
+    pyqtSignal,
+    QByteArray,
+    QDir,
+    QIODevice,
+    QObject,
+    QTimer,
+    QUrl
+)
+from PyQt4.QtNetwork import (
+    QNetworkAccessManager,
+    QNetworkReply,
+    QNetworkRequest
+)
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from stdm.data.database import STDMDb
+from stdm.settings import current_profile
+from stdm.settings.registryconfig import registry_value
+from stdm.settings.tools_network import getProxy
+
+LOGGER = logging.getLogger('stdm')
+
+TILE_CACHE_DIR = QDir.home().path() + '/.stdm/cache/tiles'
+
+#Registry keys for the tile cache settings
+WEB_TILE_CACHE_SIZE = 'WebTileCacheSize'
+WEB_TILE_OFFLINE = 'WebTileCacheOffline'
+
+#Maximum size of the cache in megabytes
+DEFAULT_CACHE_SIZE = 200
+
+#Proportion of the maximum size retained when the cache is full
+EVICTION_RATIO = 0.9
+
+OSM_LAYER = 'osm'
+OSM_TILE_URL = 'https://{0}.tile.openstreetmap.org/{1}/{2}/{3}.png'
+OSM_SUBDOMAINS = ['a', 'b', 'c']
+_OSM_TILE_PATTERN = re.compile(
+    r'^https?://[abc]\.tile\.openstreetmap\.org/(\d+)/(\d+)/(\d+)\.png$'
+)
+
+#Maximum number of tiles downloaded when seeding the cache. The OSM tile
+#usage policy does not allow bulk downloads at zoom levels 17 and above.
+MAX_SEED_TILES = 10000
+MAX_SEED_ZOOM = 16
+
+USER_AGENT = 'STDM QGIS plugin tile cache'
+
+#Headers of tiles served from the cache. Tile servers allow cross-origin
+#requests which are required by layers using 'crossOriginKeyword'.
+CACHED_TILE_HEADERS = [
+    ('Content-Type', 'image/png'),
+    ('Access-Control-Allow-Origin', '*')
+]
+
+#Headers of downloaded tiles that no longer apply to the decoded data
+_SKIPPED_HEADERS = ['content-length', 'content-encoding', 'transfer-encoding']
+
+#Web Mercator latitude limit
+MAX_LATITUDE = 85.0511287798
+
+
+def web_tile_cache_size():
+    """
+    :return: Returns the maximum size of the tile cache in bytes.
+    :rtype: int
+    """
+    size = registry_value(WEB_TILE_CACHE_SIZE)
+
+    try:
+        size = int(size)
+
+    except (TypeError, ValueError):
+        size = DEFAULT_CACHE_SIZE
+
+    if size <= 0:
+        size = DEFAULT_CACHE_SIZE
+
+    return size * 1024 * 1024
+
+
+def web_tiles_offline():
+    """
+    :return: Returns True if base layer tiles should only be read from the
+    tile cache, else False.
+    :rtype: bool
+    """
+    offline = registry_value(WEB_TILE_OFFLINE)
+    if offline is None:
+        return False
+
+    return unicode(offline).lower() in ('1', 'true', 'yes')
+
+
+def tile_key(url):
+    """
+    :param url: URL of a tile request.
+    :type url: str
+    :return: Returns the layer name, zoom, column and row of the tile or
+    None if the URL is not for a cached base layer.
+    :rtype: tuple
+    """
+    match = _OSM_TILE_PATTERN.match(unicode(url))
+    if match is None:
+        return None
+
+    zoom, col, row = [int(v) for v in match.groups()]
+
+    return OSM_LAYER, zoom, col, row
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    """
+    :return: Returns the column and row of the tile containing the
+    geographic coordinate at the zoom level.
+    :rtype: tuple
+    """
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    n = 2 ** zoom
+    col = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    row = int(
+        (1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi)
+        / 2.0 * n
+    )
+
+    return min(n - 1, max(0, col)), min(n - 1, max(0, row))
+
+
+def extent_tiles(extent, zoom):
+    """
+    :param extent: Geographic extent as (min lon, min lat, max lon, max lat).
+    :type extent: tuple
+    :return: Returns the range of tile columns and rows covering the extent
+    as (min column, min row, max column, max row).
+    :rtype: tuple
+    """
+    min_col, max_row = lonlat_to_tile(extent[0], extent[1], zoom)
+    max_col, min_row = lonlat_to_tile(extent[2], extent[3], zoom)
+
+    return min_col, min_row, max_col, max_row
+
+
+def extent_tile_count(extent, zoom):
+    min_col, min_row, max_col, max_row = extent_tiles(extent, zoom)
+
+    return (max_col - min_col + 1) * (max_row - min_row + 1)
+
+
+def profile_spatial_unit_extent(profile=None):
+    """
+    :param profile: Profile whose spatial units are used, defaults to the
+    current profile.
+    :type profile: Profile
+    :return: Returns the geographic extent of the spatial units in the
+    profile as (min lon, min lat, max lon, max lat) or None if there are no
+    spatial units. Geometry columns whose extent cannot be transformed,
+    such as those without a coordinate reference system, are skipped.
+    :rtype: tuple
+    """
+    if profile is None:
+        profile = current_profile()
+    if profile is None:
+        return None
+
+    session = STDMDb.instance().session
+    extent = None
+
+    for sp_unit in profile.social_tenure.spatial_units:
+        for geom_col in sp_unit.geometry_columns():
+            sql = text(
+                'SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e) '
+                'FROM (SELECT ST_Extent(ST_Transform({0}, 4326)) AS e '
+                'FROM {1}) AS sp_extent'.format(geom_col.name, sp_unit.name)
+            )
+            try:
+                row = session.execute(sql).fetchone()
+
+            except SQLAlchemyError as ex:
+                session.rollback()
+                LOGGER.debug(u'Could not read the extent of {0}.{1}. '
+                             u'{2}'.format(sp_unit.name, geom_col.name,
+                                           unicode(ex)))
+
+                continue
+
+            if row is None or row[0] is None:
+                continue
+
+            if extent is None:
+                extent = tuple(row)
+            else:
+                extent = (
+                    min(extent[0], row[0]), min(extent[1], row[1]),
+                    max(extent[2], row[2]), max(extent[3], row[3])
+                )
+
+    return extent
+
+
+class TileCache(object):
+    """
+    Stores tiles in a z/x/y directory structure for each base layer. When
+    the size of the cache exceeds the maximum, the least recently used
+    tiles are removed.
+    """
+    def __init__(self, cache_dir=TILE_CACHE_DIR, max_size=None):
+        self._cache_dir = cache_dir
+        if max_size is None:
+            max_size = web_tile_cache_size()
+        self._max_size = max_size
+        #Computed when the first tile is added
+        self._size = None
+
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    def path(self, layer, zoom, col, row):
+        """
+        :return: Returns the absolute path of the tile image.
+        :rtype: str
+        """
+        return u'{0}/{1}/{2}/{3}/{4}.png'.format(
+            self._cache_dir, layer, zoom, col, row
+        )
+
+    def contains(self, layer, zoom, col, row):
+        """
+        :return: Returns True if the tile is in the cache, else False.
+        :rtype: bool
+        """
+        return os.path.isfile(self.path(layer, zoom, col, row))
+
+    def get(self, layer, zoom, col, row):
+        """
+        :return: Returns the image data of the tile or None if the tile is
+        not in the cache.
+        :rtype: str
+        """
+        tile_path = self.path(layer, zoom, col, row)
+
+        try:
+            with open(tile_path, 'rb') as f:
+                data = f.read()
+
+            #Mark as recently used
+            os.utime(tile_path, None)
+
+        except (IOError, OSError):
+            return None
+
+        return data
+
+    def put(self, layer, zoom, col, row, data):
+        """
+        Adds the tile image to the cache.
+        :param data: Image data of the tile.
+        :type data: str
+        """
+        tile_path = self.path(layer, zoom, col, row)
+        tile_dir = os.path.dirname(tile_path)
+        tmp_path = tile_path + '.tmp'
+
+        try:
+            if not os.path.isdir(tile_dir):
+                os.makedirs(tile_dir)
+
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+
+            if os.path.exists(tile_path):
+                os.remove(tile_path)
+            os.rename(tmp_path, tile_path)
+
+        except (IOError, OSError) as ex:
+            LOGGER.debug('Could not write tile to cache. {}'.format(ex))
+
+            return
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(data)
+
+        if self._size > self._max_size:
+            self._evict()
+
+    def clear(self):
+        """
+        Removes all tiles from the cache.
+        """
+        for tile_path, size, mtime in self._tiles():
+            self._remove(tile_path)
+
+        self._size = 0
+
+    def _tiles(self):
+        for root, dirs, files in os.walk(self._cache_dir):
+            for f in files:
+                tile_path = os.path.join(root, f)
+                try:
+                    stat = os.stat(tile_path)
+
+                except OSError:
+                    continue
+
+                yield tile_path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self):
+        return sum([size for tile_path, size, mtime in self._tiles()])
+
+    def _evict(self):
+        tiles = sorted(self._tiles(), key=lambda t: t[2])
+        size = sum([t[1] for t in tiles])
+        target = self._max_size * EVICTION_RATIO
+
+        for tile_path, tile_size, mtime in tiles:
+            if size <= target:
+                break
+
+            if self._remove(tile_path):
+                size -= tile_size
+
+        self._size = size
+
+    def _remove(self, tile_path):
+        try:
+            os.remove(tile_path)
+
+            return True
+
+        except OSError as ex:
+            LOGGER.debug('Could not remove cached tile. {}'.format(ex))
+
+            return False
+
+
+class TileReply(QNetworkReply):
+    """
+    Reply for a tile request that is served from the tile cache. The reply
+    is either created with the tile data or, if the tile has to be
+    downloaded, the data is set once the download has finished.
+    """
+    def __init__(self, request, data=None, parent=None):
+        QNetworkReply.__init__(self, parent)
+        self._data = ''
+        self._offset = 0
+        self._upstream = None
+
+        self.setRequest(request)
+        self.setUrl(request.url())
+        self.setOperation(QNetworkAccessManager.GetOperation)
+        self.open(QIODevice.ReadOnly | QIODevice.Unbuffered)
+
+        if not data is None:
+            QTimer.singleShot(0, lambda: self.set_data(data))
+
+    def set_upstream(self, upstream):
+        """
+        Sets the network reply downloading the tile.
+        :type upstream: QNetworkReply
+        """
+        self._upstream = upstream
+
+    def set_data(self, data, status=200, headers=None):
+        """
+        Sets the tile data and notifies the page that it can be read.
+        :param status: HTTP status code of the reply.
+        :type status: int
+        :param headers: Names and values of the reply headers, defaults to
+        the headers of a tile served from the cache.
+        :type headers: list
+        """
+        if headers is None:
+            headers = CACHED_TILE_HEADERS
+
+        self._data = data
+        self._offset = 0
+
+        for name, value in headers:
+            self.setRawHeader(name, value)
+
+        if not self.hasRawHeader('Content-Type'):
+            self.setHeader(QNetworkRequest.ContentTypeHeader, 'image/png')
+
+        self.setHeader(QNetworkRequest.ContentLengthHeader, len(data))
+        self.setAttribute(QNetworkRequest.HttpStatusCodeAttribute, status)
+        self.metaDataChanged.emit()
+        self.downloadProgress.emit(len(data), len(data))
+        self.readyRead.emit()
+        self.finished.emit()
+
+    def set_not_found(self, msg):
+        """
+        Finishes the reply without data.
+        """
+        self.setError(QNetworkReply.ContentNotFoundError, msg)
+        self.setAttribute(QNetworkRequest.HttpStatusCodeAttribute, 404)
+        self.metaDataChanged.emit()
+        self.finished.emit()
+
+    def abort(self):
+        if not self._upstream is None:
+            self._upstream.abort()
+
+    def bytesAvailable(self):
+        return len(self._data) - self._offset + \
+               QNetworkReply.bytesAvailable(self)
+
+    def isSequential(self):
+        return True
+
+    def readData(self, max_size):
+        chunk = self._data[self._offset:self._offset + max_size]
+        self._offset += len(chunk)
+
+        return chunk
+
+
+class TileCacheNetworkManager(QNetworkAccessManager):
+    """
+    Network access manager that serves base layer tiles from the tile
+    cache and adds downloaded tiles to the cache. In offline mode, tiles
+    that are not in the cache are not downloaded.
+    """
+    def __init__(self, cache=None, offline=None, parent=None):
+        QNetworkAccessManager.__init__(self, parent)
+        if cache is None:
+            cache = TileCache()
+        if offline is None:
+            offline = web_tiles_offline()
+
+        self._cache = cache
+        self._offline = offline
+
+    def cache(self):
+        """
+        :return: Returns the tile cache.
+        :rtype: TileCache
+        """
+        return self._cache
+
+    def set_offline(self, offline):
+        """
+        :param offline: True to only read tiles from the cache.
+        :type offline: bool
+        """
+        self._offline = offline
+
+    def createRequest(self, op, request, outgoing_data=None):
+        key = None
+        if op == QNetworkAccessManager.GetOperation:
+            key = tile_key(request.url().toString())
+
+        if key is None:
+            return QNetworkAccessManager.createRequest(
+                self, op, request, outgoing_data
+            )
+
+        data = self._cache.get(*key)
+        if not data is None:
+            return TileReply(request, data, self)
+
+        reply = TileReply(request, parent=self)
+        if self._offline:
+            QTimer.singleShot(
+                0,
+                lambda: reply.set_not_found('Tile is not in the cache.')
+            )
+
+            return reply
+
+        upstream = QNetworkAccessManager.createRequest(
+            self, op, request, outgoing_data
+        )
+        reply.set_upstream(upstream)
+        upstream.finished.connect(
+            lambda: self._on_tile_downloaded(upstream, reply, key)
+        )
+
+        return reply
+
+    def _on_tile_downloaded(self, upstream, reply, key):
+        if upstream.error() == QNetworkReply.NoError:
+            data = str(upstream.readAll())
+            status = upstream.attribute(
+                QNetworkRequest.HttpStatusCodeAttribute
+            )
+            headers = [
+                (name, value) for name, value in upstream.rawHeaderPairs()
+                if not str(name).lower() in _SKIPPED_HEADERS
+            ]
+
+            #Error pages, redirects, etc. are passed on but not cached
+            if status == 200:
+                self._cache.put(*(key + (data,)))
+
+            reply.set_data(data, status or 200, headers)
+
+        else:
+            reply.set_not_found(upstream.errorString())
+
+        upstream.deleteLater()
+
+
+class TileSeeder(QObject):
+    """
+    Downloads the base layer tiles covering an extent into the tile cache
+    so that the area can be viewed offline. Tiles already in the cache are
+    skipped.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int)
+
+    def __init__(self, cache=None, concurrency=2, parent=None):
+        QObject.__init__(self, parent)
+        if cache is None:
+            cache = TileCache()
+
+        self._cache = cache
+        self._concurrency = concurrency
+        self._manager = QNetworkAccessManager(self)
+        proxy = getProxy()
+        if not proxy is None:
+            self._manager.setProxy(proxy)
+
+        self._tiles = iter([])
+        self._total = 0
+        self._done = 0
+        self._downloaded = 0
+        self._active = 0
+        self._cancelled = False
+
+    @staticmethod
+    def zoom_levels(extent, min_zoom=2, max_tiles=MAX_SEED_TILES):
+        """
+        :return: Returns the range of zoom levels, starting from the
+        minimum, whose total number of tiles does not exceed the maximum.
+        :rtype: tuple
+        """
+        total = 0
+        max_zoom = min_zoom
+        for zoom in range(min_zoom, MAX_SEED_ZOOM + 1):
+            total += extent_tile_count(extent, zoom)
+            if total > max_tiles:
+                break
+            max_zoom = zoom
+
+        return min_zoom, max_zoom
+
+    def _extent_tiles(self, extent, min_zoom, max_zoom):
+        for zoom in range(min_zoom, max_zoom + 1):
+            min_col, min_row, max_col, max_row = extent_tiles(extent, zoom)
+            for col in range(min_col, max_col + 1):
+                for row in range(min_row, max_row + 1):
+                    yield zoom, col, row
+
+    def seed(self, extent, min_zoom, max_zoom):
+        """
+        Starts downloading the tiles.
+        :param extent: Geographic extent as (min lon, min lat, max lon,
+        max lat).
+        :type extent: tuple
+        :param max_zoom: Maximum zoom level, limited to MAX_SEED_ZOOM.
+        :type max_zoom: int
+        """
+        max_zoom = min(max_zoom, MAX_SEED_ZOOM)
+        self._total = sum([
+            extent_tile_count(extent, z) for z in range(min_zoom, max_zoom + 1)
+        ])
+        self._tiles = self._extent_tiles(extent, min_zoom, max_zoom)
+        self._done = 0
+        self._downloaded = 0
+        self._active = 0
+        self._cancelled = False
+
+        for i in range(self._concurrency):
+            self._next_tile()
+
+        if self._active == 0:
+            self.finished.emit(self._downloaded)
+
+    def cancel(self):
+        """
+        Stops downloading further tiles.
+        """
+        self._cancelled = True
+
+    def _next_tile(self):
+        while not self._cancelled:
+            try:
+                zoom, col, row = next(self._tiles)
+
+            except StopIteration:
+                return
+
+            if self._cache.contains(OSM_LAYER, zoom, col, row):
+                self._done += 1
+                self.progress.emit(self._done, self._total)
+
+                continue
+
+            subdomain = OSM_SUBDOMAINS[(col + row) % len(OSM_SUBDOMAINS)]
+            request = QNetworkRequest(
+                QUrl(OSM_TILE_URL.format(subdomain, zoom, col, row))
+            )
+            request.setRawHeader('User-Agent', USER_AGENT)
+            reply = self._manager.get(request)
+            reply.finished.connect(
+                lambda r=reply, t=(zoom, col, row): self._on_finished(r, t)
+            )
+            self._active += 1
+
+            return
+
+    def _on_finished(self, reply, tile):
+        self._active -= 1
+        self._done += 1
+
+        status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+        if reply.error() == QNetworkReply.NoError and status == 200:
+            self._cache.put(OSM_LAYER, tile[0], tile[1], tile[2],
+                            str(reply.readAll()))
+            self._downloaded += 1
+        else:
+            LOGGER.debug('Could not download tile {0}. {1} {2}'.format(
+                tile, status, reply.errorString()))
+
+        reply.deleteLater()
+        self.progress.emit(self._done, self._total)
+
+        self._next_tile()
+        if self._active == 0:
+            self.finished.emit(self._downloaded)
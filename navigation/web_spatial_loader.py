@@ -19,6 +19,7 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import json
 import os.path
 
 from PyQt4.QtCore import *
@@ -31,13 +32,55 @@ from qgis.core import *
 from stdm.settings.tools_network import getProxy
 from stdm.utils.util import PLUGIN_DIR
 from stdm.data.database import STDMDb
+from stdm.navigation.tile_cache import TileCacheNetworkManager
 
-from geoalchemy2 import WKBElement 
+from sqlalchemy import text
 
 #Layer type enumeration
 GMAP_SATELLITE = 2010
 OSM = 2011
 
+#Web mercator resolution (metres per pixel) at zoom level 0
+WORLD_RESOLUTION = 156543.03392804097
+MAX_ZOOM_LEVEL = 22
+#Simplification tolerance and coordinate precision in pixels
+SIMPLIFY_TOLERANCE_PX = 0.5
+COORDINATE_PRECISION_PX = 0.1
+#Factor by which the overlay extent is enlarged when zooming to it
+OVERLAY_EXTENT_SCALE = 1.2
+
+'''
+Reprojects, simplifies and encodes the spatial units in one query. The zoom
+level is either specified or is the one at which the extent of the spatial
+units fits in the view, and determines the simplification tolerance and the
+number of decimal digits of the coordinates.
+'''
+_OVERLAY_SQL = """
+WITH sp AS (
+    SELECT {label} AS label, ST_Transform({geom}, 3857) AS geom
+    FROM {table}
+    WHERE id = ANY(:ids) AND {geom} IS NOT NULL
+),
+fit AS (
+    SELECT COALESCE(CAST(:zoom AS integer), LEAST(:max_zoom, GREATEST(0,
+        CAST(FLOOR(LOG(2.0, CAST(:world_res / GREATEST(
+            (ST_XMax(e) - ST_XMin(e)) * :scale / :width,
+            (ST_YMax(e) - ST_YMin(e)) * :scale / :height,
+            :min_res
+        ) AS numeric))) AS integer)
+    ))) AS zoom
+    FROM (SELECT ST_Extent(geom) AS e FROM sp) AS sp_extent
+),
+res AS (
+    SELECT zoom, :world_res / POWER(2, zoom) AS resolution FROM fit
+)
+SELECT ST_AsGeoJSON(
+    ST_SimplifyPreserveTopology(sp.geom, res.resolution * :tolerance),
+    GREATEST(0, CAST(CEIL(-LOG(res.resolution * :precision)) AS integer))
+), sp.label, res.zoom
+FROM sp, res
+"""
+
 class OLStyle(object):
     """
     Wrapper for defining the style to be used for
@@ -276,31 +319,92 @@ class WebSpatialLoader(QObject):
         """
         if sp_unit is None:
             return
-        
-        #Set the name of the field to use for labeling        
-        #self._style.setLabelField(labelfield)
-        
+
+        self.add_overlays([sp_unit], geometry_col, labelfield)
+
+    def add_overlays(self, sp_units, geometry_col, labelfield="", zoom=None):
+        """
+        Overlay the geometries of several spatial units of the same entity
+        onto the base layer. The geometries are reprojected, simplified for
+        the zoom level and encoded in a single query and drawn as one
+        GeoJSON feature collection.
+        :param sp_units: Models of the spatial units.
+        :type sp_units: list
+        :param geometry_col: Name of the geometry column.
+        :type geometry_col: str
+        :param labelfield: Name of the column whose value is set as the
+        label of each feature.
+        :type labelfield: str
+        :param zoom: Zoom level used to simplify the geometries. Defaults to
+        the level at which all the spatial units fit in the view.
+        :type zoom: int
+        """
+        sp_units = [sp for sp in sp_units if not sp is None]
+        if len(sp_units) == 0:
+            return
+
+        feature_collection = self._feature_collection(
+            sp_units, geometry_col, labelfield, zoom
+        )
+
         #Update the style of the property on each overlay operation
         self._updateLayerStyle()
-        
-        #Set label object
-        label_js_object = "null"
-        if hasattr(sp_unit, labelfield):
-            lbl_val = getattr(sp_unit, labelfield)
-            label_js_object = "{'%s':'%s'}" % (labelfield, str(lbl_val))
-        
-        #Reproject to web mercator
-        geom = getattr(sp_unit, geometry_col)
-        sp_unit_wkb = self.dbSession.scalar(geom.ST_Transform(900913))
 
-        web_geom = WKBElement(sp_unit_wkb)
-        sp_unit_geo_json = self.dbSession.scalar(web_geom.ST_AsGeoJSON())
-        
-        overlay_js = "drawSpatialUnit('%s',%s);" % (sp_unit_geo_json, label_js_object)
+        overlay_js = "drawSpatialUnits(%s);" % (feature_collection,)
         zoom_level = self._setJS(overlay_js)
-        
+
         #Raise map zoom changed event
         self.onZoomLevelChanged(zoom_level)
+
+    def _feature_collection(self, sp_units, geometry_col, labelfield, zoom):
+        """
+        :return: Returns the GeoJSON feature collection of the spatial units.
+        :rtype: str
+        """
+        sp_table = sp_units[0].__table__
+        label = 'NULL'
+        if labelfield and labelfield in sp_table.columns:
+            label = 'CAST({0} AS text)'.format(labelfield)
+
+        sql = text(_OVERLAY_SQL.format(
+            label=label,
+            geom=geometry_col,
+            table=sp_table.name
+        ))
+
+        #Fit the spatial units in the view
+        width = max(1, self.webview.width())
+        height = max(1, self.webview.height())
+
+        results = self.dbSession.execute(sql, {
+            'ids': [sp.id for sp in sp_units],
+            'zoom': zoom,
+            'max_zoom': MAX_ZOOM_LEVEL,
+            'world_res': WORLD_RESOLUTION,
+            'scale': OVERLAY_EXTENT_SCALE,
+            'width': width,
+            'height': height,
+            'min_res': WORLD_RESOLUTION / 2 ** MAX_ZOOM_LEVEL,
+            'tolerance': SIMPLIFY_TOLERANCE_PX,
+            'precision': COORDINATE_PRECISION_PX
+        })
+
+        #The encoded geometries are embedded as is
+        features = []
+        for geo_json, lbl_val, sp_zoom in results:
+            properties = 'null'
+            if not lbl_val is None:
+                properties = json.dumps({labelfield: lbl_val})
+
+            features.append(
+                '{{"type":"Feature","geometry":{0},"properties":{1}}}'.format(
+                    geo_json, properties
+                )
+            )
+
+        return '{{"type":"FeatureCollection","features":[{0}]}}'.format(
+            ','.join(features)
+        )
     
     def removeOverlay(self):
         """
@@ -340,18 +444,19 @@ class ProxyWebPage(QWebPage):
     """
     Custom web page implementation since we need to use
     the QGIS proxy settings if a proxy has been specified.
+    Base layer tiles are read from the local tile cache.
     """
     def __init__(self, parent=None):
         QWebPage.__init__(self, parent)
-        self._manager = None
+        self._manager = TileCacheNetworkManager(parent=self)
         
         #Set proxy in webpage
         proxy = getProxy()
 
         if not proxy is None:
-            self._manager = QNetworkAccessManager()
             self._manager.setProxy(proxy)
-            self.setNetworkAccessManager(self._manager)
+
+        self.setNetworkAccessManager(self._manager)
             
     def javaScriptConsoleMessage(self, message, lineNumber, sourceID):
         #For debugging purposes
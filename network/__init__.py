@@ -1,4 +1,9 @@
 '''
 Package for network file operations.
 '''
-from filemanager import NetworkFileManager,DocumentTransferWorker
\ No newline at end of file
+from filemanager import NetworkFileManager,DocumentTransferWorker
+from filemanager import (
+    content_document_path,
+    content_extension,
+    is_content_hash
+)
\ No newline at end of file
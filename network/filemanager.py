@@ -18,12 +18,22 @@ email                : gkahiu@gmail.com
  *                                                                         *
  ***************************************************************************/
 """
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from uuid import uuid4
 
 from PyQt4.QtCore import (
     QObject,
+    QRunnable,
     QThread,
+    QThreadPool,
     SIGNAL,
+    Qt,
     pyqtSignal,
     QFile,
     pyqtSlot,
@@ -32,10 +42,177 @@ from PyQt4.QtCore import (
 
 from qgis.core import *
 
+from sqlalchemy import text
+
+from stdm.data.database import STDMDb
+from stdm.data.pg_utils import pg_tables
 from stdm.utils.util import (
     guess_extension
 )
 from stdm.settings import current_profile
+from stdm.settings.registryconfig import content_addressed_documents
+
+LOGGER = logging.getLogger('stdm')
+
+#Size of the blocks read and written when copying documents
+COPY_BUFFER_SIZE = 1024 * 1024
+
+#Minimum interval, in seconds, between progress notifications
+PROGRESS_INTERVAL = 0.2
+
+#Maximum number of documents transferred concurrently
+MAX_CONCURRENT_TRANSFERS = 4
+
+_TRANSFER_POOL = None
+
+'''
+Content addressed uploads that have not been saved, by content hash. Each
+entry holds the number of unsaved uploads and whether one of them added the
+file to the repository.
+'''
+_PENDING_UPLOADS = {}
+_PENDING_LOCK = threading.Lock()
+
+#Directory in the network repository containing content addressed documents
+CONTENT_STORE_DIR = '_content'
+
+'''
+Number of hexadecimal characters of the SHA-256 digest used as the document
+identifier, the identifier column is limited to 50 characters.
+'''
+CONTENT_HASH_LENGTH = 48
+
+_CONTENT_HASH_PATTERN = re.compile(
+    r'^[0-9a-f]{{{0}}}$'.format(CONTENT_HASH_LENGTH)
+)
+
+
+def is_content_hash(identifier):
+    """
+    :param identifier: Document identifier.
+    :type identifier: str
+    :return: Returns True if the identifier is the hash of the document
+    content rather than a UUID, else False.
+    :rtype: bool
+    """
+    if identifier is None:
+        return False
+
+    return _CONTENT_HASH_PATTERN.match(unicode(identifier)) is not None
+
+
+def content_extension(file_name):
+    """
+    :return: Returns the extension with which a content addressed document
+    with the given file name is stored.
+    :rtype: str
+    """
+    return guess_extension(unicode(file_name))[1].lower()
+
+
+def content_document_path(network_path, content_hash, extension):
+    """
+    :param network_path: Root directory of the network repository.
+    :type network_path: str
+    :param content_hash: Hash of the document content.
+    :type content_hash: str
+    :param extension: File extension including the leading dot.
+    :type extension: str
+    :return: Returns the absolute path of a content addressed document. The
+    documents are sharded into sub-directories using the first characters
+    of the hash.
+    :rtype: str
+    """
+    return u'{0}/{1}/{2}/{3}/{4}{5}'.format(
+        network_path,
+        CONTENT_STORE_DIR,
+        content_hash[:2],
+        content_hash[2:4],
+        content_hash,
+        extension.lower()
+    )
+
+
+def file_content_hash(path, block_size=COPY_BUFFER_SIZE):
+    """
+    :param path: Absolute path of the file.
+    :type path: str
+    :return: Returns the truncated SHA-256 hash of the file contents.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        block = f.read(block_size)
+        while block:
+            digest.update(block)
+            block = f.read(block_size)
+
+    return digest.hexdigest()[:CONTENT_HASH_LENGTH]
+
+
+def add_pending_upload(content_hash, created):
+    """
+    Registers an unsaved upload of a content addressed document.
+    :param content_hash: Hash of the document content.
+    :type content_hash: str
+    :param created: True if the upload added the file to the repository.
+    :type created: bool
+    """
+    with _PENDING_LOCK:
+        pending = _PENDING_UPLOADS.setdefault(content_hash, [0, False])
+        pending[0] += 1
+        pending[1] = pending[1] or created
+
+
+def release_pending_upload(content_hash):
+    """
+    Unregisters an unsaved upload of a content addressed document.
+    :param content_hash: Hash of the document content.
+    :type content_hash: str
+    :return: Returns the number of remaining unsaved uploads of the
+    document and whether one of the uploads added the file.
+    :rtype: tuple
+    """
+    with _PENDING_LOCK:
+        pending = _PENDING_UPLOADS.get(content_hash, None)
+        if pending is None:
+            return 0, False
+
+        pending[0] -= 1
+        if pending[0] <= 0:
+            del _PENDING_UPLOADS[content_hash]
+
+            return 0, pending[1]
+
+        return pending[0], pending[1]
+
+
+def pending_upload_count(content_hash):
+    """
+    :return: Returns the number of unsaved uploads of the document.
+    :rtype: int
+    """
+    with _PENDING_LOCK:
+        pending = _PENDING_UPLOADS.get(content_hash, None)
+
+        return 0 if pending is None else pending[0]
+
+
+def transfer_pool():
+    """
+    :return: Returns the thread pool in which documents are transferred.
+    The number of concurrent transfers is limited so that many uploads
+    share the network link instead of competing for it.
+    :rtype: QThreadPool
+    """
+    global _TRANSFER_POOL
+
+    if _TRANSFER_POOL is None:
+        _TRANSFER_POOL = QThreadPool()
+        _TRANSFER_POOL.setMaxThreadCount(MAX_CONCURRENT_TRANSFERS)
+
+    return _TRANSFER_POOL
 
 class NetworkFileManager(QObject):
     """
@@ -51,6 +228,11 @@ class NetworkFileManager(QObject):
         self.curr_profile = current_profile()
         self._entity_source = ''
         self._doc_type = ''
+        self._content_addressed = content_addressed_documents()
+        #True if the last upload added the file to the repository
+        self._created = False
+        #True if the last upload is registered as an unsaved upload
+        self._pending = False
         
     def uploadDocument(self, entity_source, doc_type, fileinfo):
         """
@@ -58,8 +240,12 @@ class NetworkFileManager(QObject):
         """
         self._entity_source = entity_source
         self._doc_type = doc_type
-        self.fileID = self.generateFileID()
         self.sourcePath = unicode(fileinfo.filePath())
+
+        if self._content_addressed:
+            return self._upload_content(fileinfo)
+
+        self.fileID = self.generateFileID()
         profile_name = self.curr_profile.name
         root_dir = QDir(self.networkPath)
         doc_dir = QDir(u'{}/{}/{}/{}'.format(
@@ -93,26 +279,171 @@ class NetworkFileManager(QObject):
             fileinfo.completeSuffix()
         )
 
-        srcFile = open(self.sourcePath,'rb')
-        destinationFile = open(self.destinationPath,'wb')
-        
-        #srcLen = self.sourceFile.bytesAvailable()
-        totalRead = 0
-        while True:
-            inbytes = srcFile.read(4096)
-            if not inbytes:
-                break   
-            destinationFile.write(inbytes)
-            totalRead += len(inbytes)
-            #Raise signal on each block written
-            self.emit(SIGNAL("blockWritten(int)"),totalRead)
+        self._copy_file(self.sourcePath, self.destinationPath)
+        self._created = True
 
         self.emit(SIGNAL("completed(QString)"),self.fileID)
-            
-        srcFile.close()
-        destinationFile.close()
         
         return self.fileID
+
+    def _upload_content(self, fileinfo):
+        """
+        Uploads the document to the content store. The document is hashed
+        before it is copied and is only copied if the store does not
+        already contain a document with the same content.
+        """
+        self.fileID = file_content_hash(self.sourcePath)
+        self.destinationPath = content_document_path(
+            self.networkPath,
+            self.fileID,
+            content_extension(fileinfo.fileName())
+        )
+        self._created = False
+
+        if QFile.exists(self.destinationPath):
+            self.emit(SIGNAL("blockWritten(int)"), fileinfo.size())
+
+        else:
+            QDir(self.networkPath).mkpath(
+                os.path.dirname(self.destinationPath)
+            )
+
+            #Copy to a temporary file so that partial copies are not used
+            tmp_path = u'{0}.{1}.part'.format(
+                self.destinationPath,
+                self.generateFileID()
+            )
+            try:
+                self._copy_file(self.sourcePath, tmp_path, self.fileID)
+
+                #Not renamed if added by another user in the meantime
+                if not QFile.exists(self.destinationPath) and \
+                        QFile.rename(tmp_path, self.destinationPath):
+                    self._created = True
+
+            finally:
+                #Left behind by a failed or a redundant copy
+                if QFile.exists(tmp_path):
+                    QFile.remove(tmp_path)
+
+        add_pending_upload(self.fileID, self._created)
+        self._pending = True
+
+        self.emit(SIGNAL("completed(QString)"), self.fileID)
+
+        return self.fileID
+
+    def _copy_file(self, source_path, destination_path, expected_hash=None):
+        """
+        Copies the file in large blocks. The progress is emitted at most
+        every PROGRESS_INTERVAL seconds. The size of the copy is compared
+        with that of the source file and, if 'expected_hash' is specified,
+        the hash of the copied contents with 'expected_hash'. A copy that
+        does not match is removed and an IOError raised.
+        :param expected_hash: Content hash of the source file, as returned
+        by file_content_hash.
+        :type expected_hash: str
+        """
+        totalRead = 0
+        last_emit = time.time()
+        digest = hashlib.sha256()
+
+        try:
+            source_size = os.path.getsize(source_path)
+
+            with open(source_path, 'rb') as srcFile:
+                with open(destination_path, 'wb') as destinationFile:
+                    while True:
+                        inbytes = srcFile.read(COPY_BUFFER_SIZE)
+                        if not inbytes:
+                            break
+                        destinationFile.write(inbytes)
+                        digest.update(inbytes)
+                        totalRead += len(inbytes)
+
+                        now = time.time()
+                        if now - last_emit >= PROGRESS_INTERVAL:
+                            self.emit(SIGNAL("blockWritten(int)"), totalRead)
+                            last_emit = now
+
+            if totalRead != source_size or \
+                    os.path.getsize(destination_path) != source_size:
+                raise IOError(
+                    u'The copy of {0} is incomplete.'.format(source_path)
+                )
+
+            #The source could have changed after it was hashed
+            copy_hash = digest.hexdigest()[:CONTENT_HASH_LENGTH]
+            if not expected_hash is None and copy_hash != expected_hash:
+                raise IOError(
+                    u'The copy of {0} does not match its content '
+                    u'hash.'.format(source_path)
+                )
+
+        except (IOError, OSError):
+            if os.path.isfile(destination_path):
+                os.remove(destination_path)
+
+            raise
+
+        self.emit(SIGNAL("blockWritten(int)"), totalRead)
+
+    def _supporting_document_tables(self):
+        # The content store is shared by all profiles
+        from stdm.data.configuration.stdm_configuration import (
+            StdmConfiguration
+        )
+
+        db_tables = pg_tables()
+        doc_tables = []
+
+        for p in StdmConfiguration.instance().profiles.values():
+            doc_table = p.supporting_document.name
+            if doc_table in db_tables and not doc_table in doc_tables:
+                doc_tables.append(doc_table)
+
+        return doc_tables
+
+    def reference_count(self, content_hash, extension, exclude_ids=None):
+        """
+        :param content_hash: Hash of the document content.
+        :type content_hash: str
+        :param extension: File extension of the document.
+        :type extension: str
+        :param exclude_ids: Ids of supporting document records, in the
+        current profile, that are not counted.
+        :type exclude_ids: list
+        :return: Returns the number of supporting document records, in all
+        profiles, that reference the content addressed document.
+        :rtype: int
+        """
+        curr_table = self.curr_profile.supporting_document.name
+        params = {
+            'content_hash': content_hash,
+            'file_pattern': u'%{0}'.format(extension.lower())
+        }
+        if exclude_ids:
+            params['exclude_ids'] = list(exclude_ids)
+
+        counts = []
+        for doc_table in self._supporting_document_tables():
+            sql = u'SELECT COUNT(*) AS refs FROM {0} ' \
+                  u'WHERE document_identifier = :content_hash ' \
+                  u'AND lower(filename) LIKE :file_pattern'.format(doc_table)
+            if exclude_ids and doc_table == curr_table:
+                sql += u' AND NOT (id = ANY(:exclude_ids))'
+
+            counts.append(sql)
+
+        if len(counts) == 0:
+            return 0
+
+        sql = u'SELECT COALESCE(SUM(refs), 0) FROM ({0}) AS doc_refs'.format(
+            u' UNION ALL '.join(counts)
+        )
+        session = STDMDb.instance().session
+
+        return session.execute(text(sql), params).scalar()
             
     def downloadDocument(self,documentid):
         """
@@ -125,6 +456,9 @@ class NetworkFileManager(QObject):
         Delete the source document from the central repository.
         """
         if not docmodel is None:
+            if is_content_hash(docmodel.document_identifier):
+                return self.delete_content_documents([docmodel])
+
             #Build the path from the model variable values.
             fileName, fileExt = guess_extension(docmodel.filename)
             profile_name = self.curr_profile.name
@@ -140,8 +474,74 @@ class NetworkFileManager(QObject):
 
             return QFile.remove(absPath)
         
+        elif is_content_hash(self.fileID):
+            if not self._pending:
+                return True
+
+            self._pending = False
+            remaining, created = release_pending_upload(self.fileID)
+
+            #Only remove a file that was added by an upload and is not used
+            #by other unsaved uploads
+            if remaining > 0 or not created:
+                return True
+
+            return self._delete_content(
+                self.fileID,
+                content_extension(self.sourcePath)
+            )
+
         else:
             return QFile.remove(self.destinationPath)
+
+    def delete_content_documents(self, doc_models):
+        """
+        Removes the files of content addressed documents whose records are
+        being deleted. Records of the same document are excluded together
+        so that the file is removed when all of them are deleted.
+        :param doc_models: Supporting document model objects.
+        :type doc_models: list
+        :return: True if the files were removed or are still referenced,
+        else False.
+        :rtype: bool
+        """
+        documents = OrderedDict()
+        for doc_model in doc_models:
+            key = (
+                doc_model.document_identifier,
+                content_extension(doc_model.filename)
+            )
+            doc_ids = documents.setdefault(key, [])
+
+            doc_id = getattr(doc_model, 'id', None)
+            if not doc_id is None:
+                doc_ids.append(doc_id)
+
+        status = True
+        for (content_hash, extension), doc_ids in documents.iteritems():
+            if not self._delete_content(content_hash, extension, doc_ids):
+                status = False
+
+        return status
+
+    def _delete_content(self, content_hash, extension, exclude_ids=None):
+        """
+        Removes a content addressed document if it is not referenced by
+        other supporting document records or unsaved uploads.
+        """
+        if pending_upload_count(content_hash) > 0:
+            return True
+
+        if self.reference_count(content_hash, extension, exclude_ids) > 0:
+            return True
+
+        abs_path = content_document_path(
+            self.networkPath, content_hash, extension
+        )
+        if not QFile.exists(abs_path):
+            return True
+
+        return QFile.remove(abs_path)
     
     def generateFileID(self):
         """
@@ -149,12 +549,25 @@ class NetworkFileManager(QObject):
         """
         return str(uuid4())
         
+class DocumentTransferTask(QRunnable):
+    """
+    Runs a document transfer in the transfer thread pool.
+    """
+    def __init__(self, worker):
+        QRunnable.__init__(self)
+        self._worker = worker
+
+    def run(self):
+        self._worker.transfer()
+
+
 class DocumentTransferWorker(QObject):
     """
     Worker thread for copying source documents to central repository.
     """
     blockWrite = pyqtSignal("int")
     complete = pyqtSignal("QString")
+    failed = pyqtSignal("QString")
     
     def __init__(
             self, file_manager, file_info, entity_source='', doc_type='', parent=None):
@@ -164,18 +577,51 @@ class DocumentTransferWorker(QObject):
         self._entity_source = entity_source
         self._doc_type = doc_type
         self.file_uuid = None
+        self._done = threading.Event()
+
+    def start(self):
+        """
+        Queues the document transfer in the transfer thread pool. The
+        signals are delivered to receivers in the thread they live in.
+        """
+        task = DocumentTransferTask(self)
+        transfer_pool().start(task)
 
     @pyqtSlot()
     def transfer(self):
         """
         Initiate document transfer
         """
-        self.connect(self._file_manager, SIGNAL("blockWritten(int)"),self.onBlockWritten)
-        self.connect(self._file_manager, SIGNAL("completed(QString)"),self.onWriteComplete)
-        self._file_manager.uploadDocument(
-            self._entity_source, self._doc_type, self._file_info
-        )
-        self.file_uuid = self._file_manager.fileID
+        #Propagate directly from the thread running the transfer
+        self.connect(self._file_manager, SIGNAL("blockWritten(int)"),
+                     self.onBlockWritten, Qt.DirectConnection)
+        self.connect(self._file_manager, SIGNAL("completed(QString)"),
+                     self.onWriteComplete, Qt.DirectConnection)
+
+        try:
+            self._file_manager.uploadDocument(
+                self._entity_source, self._doc_type, self._file_info
+            )
+            self.file_uuid = self._file_manager.fileID
+
+        except (IOError, OSError) as ex:
+            LOGGER.debug(u'Document transfer failed. {0}'.format(ex))
+            self.failed.emit(unicode(ex))
+
+        finally:
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the transfer has finished.
+        :param timeout: Maximum time to wait in seconds.
+        :type timeout: float
+        :return: Returns True if the transfer has finished, else False.
+        :rtype: bool
+        """
+        self._done.wait(timeout)
+
+        return self._done.is_set()
 
     def onBlockWritten(self,size):
         """
@@ -18,10 +18,12 @@ email                : stdm@unhabitat.org
  ***************************************************************************/
 """
 import glob
+import importlib
 import logging
 import os.path
 import platform
 import shutil
+import sys
 from collections import OrderedDict
 
 from PyQt4.QtCore import *
@@ -41,17 +43,12 @@ from stdm.settings.config_file_updater import ConfigurationFileUpdater
 from stdm.data.configuration.config_updater import ConfigurationSchemaUpdater
 
 from stdm.ui.change_pwd_dlg import changePwdDlg
-from stdm.ui.doc_generator_dlg import (
-    DocumentGeneratorDialogWrapper,
-    EntityConfig
-)
 
 from stdm.ui.login_dlg import loginDlg
 from stdm.ui.manage_accounts_dlg import manageAccountsDlg
 from stdm.ui.content_auth_dlg import contentAuthDlg
 from stdm.ui.options_base import OptionsDialog
 
-from stdm.ui.view_str import ViewSTRWidget
 from stdm.ui.admin_unit_selector import AdminUnitSelector
 from stdm.ui.entity_browser import (
     EntityBrowserWithEditor
@@ -59,11 +56,6 @@ from stdm.ui.entity_browser import (
 from stdm.ui.about import AboutSTDMDialog
 from stdm.ui.stdmdialog import DeclareMapping
 
-from stdm.ui.wizard.wizard import ConfigWizard
-
-from stdm.ui.import_data import ImportData
-from stdm.ui.export_data import ExportData
-
 from stdm.ui.spatial_unit_manager import SpatialUnitManagerDockWidget
 
 import data
@@ -86,9 +78,16 @@ from stdm.settings.registryconfig import (
     STDM_VERSION,
     CONFIG_UPDATED,
     HOST,
-    composer_template_path
+    composer_template_path,
+    login_profiling,
+    module_warm_up
 )
 from stdm.ui.license_agreement import LicenseAgreement
+from stdm.utils.profiler import StartupProfiler
+from stdm.utils.resources import (
+    register_resources,
+    unregister_resources
+)
 
 from navigation import (
     STDMAction,
@@ -110,16 +109,28 @@ from stdm.utils.util import (
 )
 from mapping.utils import pg_layerNamesIDMapping
 
-from composer import ComposerWrapper
 from stdm.ui.progress_dialog import STDMProgressDialog
 from stdm.ui.feature_details import DetailsTreeView
-from stdm.ui.social_tenure.str_editor import STREditor
-
-from stdm.ui.geoodk_converter_dialog import GeoODKConverter
-from stdm.ui.geoodk_profile_importer import ProfileInstanceRecords
 
 LOGGER = logging.getLogger('stdm')
 
+#Modules of the tools that are only imported when the tool is first opened
+#since they pull in the composer, charting and GeoODK dependencies.
+DEFERRED_MODULES = (
+    'stdm.ui.wizard.wizard',
+    'stdm.composer',
+    'stdm.ui.doc_generator_dlg',
+    'stdm.ui.import_data',
+    'stdm.ui.export_data',
+    'stdm.ui.social_tenure.str_editor',
+    'stdm.ui.view_str',
+    'stdm.ui.geoodk_converter_dialog',
+    'stdm.ui.geoodk_profile_importer'
+)
+
+#Interval in milliseconds between importing the deferred modules after login
+WARM_UP_INTERVAL = 250
+
 
 class STDMQGISLoader(object):
 
@@ -154,6 +165,10 @@ class STDMQGISLoader(object):
 
         self._user_logged_in = False
         self.current_profile = None
+        #Records the duration of the login phases if profiling is enabled
+        self._profiler = StartupProfiler('login', False)
+        #Deferred modules yet to be imported by the warm-up
+        self._warm_up_queue = []
         # Profile status label showing the current profile
         self.profile_status_label = None
         LOGGER.debug('STDM plugin has been initialized.')
@@ -168,6 +183,7 @@ class STDMQGISLoader(object):
 
     def initGui(self):
         # Initial actions on starting up the application
+        register_resources()
         self._menu_items()
         self.loginAct = STDMAction(QIcon(":/plugins/stdm/images/icons/login.png"),
                                    QApplication.translate("LoginToolbarAction",
@@ -264,19 +280,34 @@ class STDMQGISLoader(object):
         del self.stdmInitToolbar
         # Remove connection info
         self.logoutCleanUp()
+        unregister_resources()
 
     def login(self):
         '''
-        Show login dialog
+        Show login dialog and load the modules. The login phases are
+        reported in the log panel if login profiling is enabled.
         '''
+        self._profiler = StartupProfiler('login', login_profiling())
+
+        try:
+            self._login()
+
+        finally:
+            self._profiler.finish()
+            self._profiler = StartupProfiler('login', False)
+
+    def _login(self):
         frmLogin = loginDlg(self.iface.mainWindow())
         retstatus = frmLogin.exec_()
 
         if retstatus == QDialog.Accepted:
             #Assign the connection object
             data.app_dbconn = frmLogin.dbConn
+            self._profiler.set_info('user', frmLogin.dbConn.User.UserName)
+            self._profiler.set_info('database', frmLogin.dbConn.Database)
 
             #Initialize the whole STDM database
+            self._profiler.begin('database connection')
 
             db = STDMDb.instance()
 
@@ -303,12 +334,17 @@ class STDMQGISLoader(object):
 
                     return
 
+            self._profiler.end()
+
             # Checks if the license is accepted and stops loading
             # modules if the terms and conditions are never accepted.
+            self._profiler.begin('license agreement')
             license_status = self.load_license_agreement()
             if not license_status:
                 return
 
+            self._profiler.end()
+
             #Load logout and change password actions
             self.stdmInitToolbar.insertAction(self.loginAct,
                                               self.logoutAct)
@@ -321,12 +357,14 @@ class STDMQGISLoader(object):
             self.loginAct.setEnabled(False)
 
             #Fetch STDM tables
-            self.stdmTables = spatial_tables()
+            with self._profiler.span('spatial tables'):
+                self.stdmTables = spatial_tables()
 
             #Load the configuration from file
-            config_load_status = self.load_configuration_from_file(
-                self.iface.mainWindow()
-            )
+            with self._profiler.span('configuration'):
+                config_load_status = self.load_configuration_from_file(
+                    self.iface.mainWindow()
+                )
 
             #Exit if the load failed
             if not config_load_status:
@@ -341,10 +379,22 @@ class STDMQGISLoader(object):
                     result = self.default_profile()
                     if not result:
                         return
-                self.loadModules()
-                self.default_profile()
-                self.run_wizard()
-                self.copy_designer_template()
+
+                if not self.current_profile is None:
+                    self._profiler.set_info(
+                        'profile', self.current_profile.name
+                    )
+
+                with self._profiler.span('modules'):
+                    self.loadModules()
+
+                with self._profiler.span('profile and wizard'):
+                    self.default_profile()
+                    self.run_wizard()
+                    self.copy_designer_template()
+
+                if module_warm_up():
+                    self.warm_up_modules()
 
 
             except Exception as pe:
@@ -992,6 +1042,8 @@ class STDMQGISLoader(object):
         mobileFormImportCnt = ContentGroup.contentItemFromQAction(self.mobile_form_import)
         mobileFormImportCnt.code = "1394547d-fb6c-4f6e-80d2-53407cf7b7d4"
 
+        self._profiler.begin('content registration')
+
         username = data.app_dbconn.User.UserName
 
         self.moduleCntGroup = None
@@ -1103,6 +1155,8 @@ class STDMQGISLoader(object):
         self.mobileXFormImportCntGroup.addContentItem(mobileFormImportCnt)
         self.mobileXFormImportCntGroup.register()
 
+        self._profiler.end()
+
         # Group geoodk actions to one menu
         geoodkSettingsCntGroup = []
         geoodkSettingsCntGroup.append(self.mobileXformgenCntGroup)
@@ -1157,15 +1211,17 @@ class STDMQGISLoader(object):
         self.menubarLoader.addContent(self.docGeneratorCntGroup)
 
         #Load all the content in the container
-        self.toolbarLoader.loadContent()
-        self.menubarLoader.loadContent()
+        with self._profiler.span('content permissions'):
+            self.toolbarLoader.loadContent()
+            self.menubarLoader.loadContent()
 
         # Add profiles_combobox in front of the configuration wizard
         self.stdmInitToolbar.insertWidget(
             self.wzdAct, self.profiles_combobox
         )
 
-        self.create_spatial_unit_manager()
+        with self._profiler.span('spatial unit manager'):
+            self.create_spatial_unit_manager()
 
         self.profile_status_message()
 
@@ -1483,9 +1539,39 @@ class STDMQGISLoader(object):
             )
             self.loadModules()
 
+    def warm_up_modules(self):
+        '''
+        Imports the deferred modules, one at a time when the event loop is
+        idle, so that the tools open without delay when first triggered.
+        '''
+        self._warm_up_queue = [
+            m for m in DEFERRED_MODULES if not m in sys.modules
+        ]
+        QTimer.singleShot(WARM_UP_INTERVAL, self._warm_up_next)
+
+    def _warm_up_next(self):
+        #Stop if the user has logged out
+        if not self._user_logged_in or len(self._warm_up_queue) == 0:
+            self._warm_up_queue = []
+
+            return
+
+        module_name = self._warm_up_queue.pop(0)
+        try:
+            importlib.import_module(module_name)
+
+        except Exception as ex:
+            LOGGER.debug(u'Could not import {0}. {1}'.format(
+                module_name, ex))
+
+        if len(self._warm_up_queue) > 0:
+            QTimer.singleShot(WARM_UP_INTERVAL, self._warm_up_next)
+
     def load_config_wizard(self):
         '''
         '''
+        from stdm.ui.wizard.wizard import ConfigWizard
+
         self.wizard = ConfigWizard(
             self.iface.mainWindow()
         )
@@ -1518,6 +1604,7 @@ class STDMQGISLoader(object):
         tenure relationship
         '''
         try:
+            from stdm.ui.social_tenure.str_editor import STREditor
 
             str_editor = STREditor()
             str_editor.open()
@@ -1581,6 +1668,8 @@ class STDMQGISLoader(object):
             title
         )
         #Embed STDM customizations
+        from stdm.composer import ComposerWrapper
+
         composerWrapper = ComposerWrapper(
             documentComposer, self.iface
         )
@@ -1596,6 +1685,9 @@ class STDMQGISLoader(object):
         if len(db_user_tables(self.current_profile)) < 1:
             self.minimum_table_checker()
             return
+
+        from stdm.ui.doc_generator_dlg import DocumentGeneratorDialogWrapper
+
         doc_gen_wrapper = DocumentGeneratorDialogWrapper(
             self.iface,
             self.iface.mainWindow()
@@ -1614,6 +1706,8 @@ class STDMQGISLoader(object):
             self.minimum_table_checker()
             return
         try:
+            from stdm.ui.import_data import ImportData
+
             importData = ImportData(
                 self.iface.mainWindow()
             )
@@ -1639,6 +1733,9 @@ class STDMQGISLoader(object):
         if len(db_user_tables(self.current_profile)) < 1:
             self.minimum_table_checker()
             return
+
+        from stdm.ui.export_data import ExportData
+
         exportData = ExportData(self.iface.mainWindow())
         exportData.exec_()
 
@@ -1664,6 +1761,8 @@ class STDMQGISLoader(object):
 
         if db_status:
             if self.viewSTRWin is None:
+                from stdm.ui.view_str import ViewSTRWidget
+
                 self.viewSTRWin = ViewSTRWidget(self)
                 self.viewSTRWin.show()
             else:
@@ -1831,6 +1930,9 @@ class STDMQGISLoader(object):
             if not self._user_logged_in:
                 return
 
+            from stdm.security.authorization import clear_permissions
+            clear_permissions()
+
             #Remove STDM layers
             self.removeSTDMLayers()
             # Remove Spatial Unit Manager
@@ -1952,6 +2054,8 @@ class STDMQGISLoader(object):
         Load the dialog to generate form for mobile data collection
         :return:
         """
+        from stdm.ui.geoodk_converter_dialog import GeoODKConverter
+
         converter_dlg = GeoODKConverter(self.iface.mainWindow())
         converter_dlg.exec_()
 
@@ -1960,6 +2064,8 @@ class STDMQGISLoader(object):
         Load the dialog to generate form for mobile data collection
         :return:
         """
+        from stdm.ui.geoodk_profile_importer import ProfileInstanceRecords
+
         importer_dialog = ProfileInstanceRecords(self.iface.mainWindow())
         importer_dialog.exec_()
 
@@ -0,0 +1,4 @@
+REM Script for compiling the STDM icons and images into the binary resource file
+REM resources.rcc is committed, run this script after changing resources.qrc
+cd %~dp0
+rcc -binary resources.qrc -o resources.rcc
\ No newline at end of file
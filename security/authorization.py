@@ -19,13 +19,27 @@ email                : gkahiu@gmail.com
 """
 from roleprovider import RoleProvider
 from exception import SecurityException
-from stdm.data.database import Content, STDMDb, Base
+from stdm.data.database import Content, Role, STDMDb, Base
 from stdm.utils.util import *
 from sqlalchemy import Table
 from sqlalchemy.orm import relationship, mapper, clear_mappers
 
 from sqlalchemy.exc import *
 
+#Roles and codes of the permitted content items for each user name
+_PERMISSIONS = {}
+
+def clear_permissions(username=None):
+    '''
+    Removes the cached roles and permitted content of the user, or of all
+    users if no user name is specified, so that they are read again from
+    the database e.g. after the content permissions have been edited.
+    '''
+    if username is None:
+        _PERMISSIONS.clear()
+    else:
+        _PERMISSIONS.pop(username, None)
+
 class RoleMapper(object):
     pass
 
@@ -37,7 +51,13 @@ class Authorizer(object):
     def __init__(self, username):
         self.username = username
         self.userRoles = []
-        self._getUserRoles()        
+
+        cached = _PERMISSIONS.get(self.username, None)
+        if cached is None:
+            self._getUserRoles()
+            _PERMISSIONS[self.username] = {'roles': list(self.userRoles)}
+        else:
+            self.userRoles = list(cached['roles'])
         
     def _getUserRoles(self):
         '''
@@ -54,34 +74,48 @@ class Authorizer(object):
         if self.username == pg_account:
             self.userRoles.append(pg_account)
         
+    def _permittedContent(self):
+        '''
+        Get the codes of all content items that the roles of the user have
+        been granted in a single query.
+        '''
+        if len(self.userRoles) == 0:
+            return set()
+
+        session = STDMDb.instance().session
+        qo = session.query(Content.code).join(Content.roles).filter(
+            Role.name.in_(self.userRoles)
+        ).distinct()
+
+        return set([code for code, in qo])
+
+    def refresh(self):
+        '''
+        Reload the roles of the user and the permitted content items.
+        '''
+        clear_permissions(self.username)
+        self._getUserRoles()
+        _PERMISSIONS[self.username] = {
+            'roles': list(self.userRoles),
+            'content': self._permittedContent()
+        }
+        
     def CheckAccess(self, contentCode):
         '''
         Assert whether the given user has permissions to access a content
         item with the gien code. 
+        The permitted content of the user is loaded once and shared by the
+        authorizers of the user until the permissions are cleared. Errors,
+        such as the current user not having permission to access the
+        content tables, are raised.
         '''        
-        hasPermission = False
-        #Get roles with permission        
-        try:
-            cnt = Content()                       
-            qo = cnt.queryObject()
-            '''            
-            cntRef = qo.filter(Content.code == contentCode).first()            
-            '''
-            cntRef = qo.filter(Content.code == contentCode).first()
-            if cntRef != None:
-                cntRoles =cntRef.roles 
-                for rl in cntRoles:
-                    if getIndex(self.userRoles,rl.name) != -1:
-                        hasPermission = True
-                        break
-        except Exception:
-            '''
-            Current user does not have permission to access the content tables.
-            Catches all errors
-            '''
-            #pass
-            raise
-        return hasPermission
+        cached = _PERMISSIONS.setdefault(
+            self.username, {'roles': list(self.userRoles)}
+        )
+        if not 'content' in cached:
+            cached['content'] = self._permittedContent()
+
+        return contentCode in cached['content']
     
 
         
@@ -48,44 +48,80 @@ class RoleProvider(object):
         By default, this method is executed when an instance of this
         class is created. 
         '''
-        sysRoles = self.GetSysRoles()        
-        stdmRoles = [role.name for role in self.GetAllRoles()]
-                
-        #Add missing sysroles to STDM roles
-        for sysRole in sysRoles:
-            roleIndex = getIndex(stdmRoles,sysRole)                    
-            
-            if roleIndex == -1:                
-                self.AddSTDMRole(sysRole)
-              
-        #Remove obsolete roles from the STDM roles table
-        for stdmRole in stdmRoles:
-            roleIndex = getIndex(sysRoles,stdmRole)
-            
-            if roleIndex == -1:
-                self.DeleteSTDMRole(stdmRole)   
+        sysRoles = set(self.GetSysRoles())
+        stdmRoles = set([role.name for role in self.GetAllRoles()])
+
+        missingRoles = list(sysRoles - stdmRoles)
+        obsoleteRoles = list(stdmRoles - sysRoles)
+
+        if len(missingRoles) == 0 and len(obsoleteRoles) == 0:
+            return
+
+        conn = self._engine.connect()
+        trans = conn.begin()
+        try:
+            #Add missing sysroles to STDM roles
+            if len(missingRoles) > 0:
+                conn.execute(
+                    text("INSERT INTO role (name, description) "
+                         "VALUES (:name, '')"),
+                    [{'name': r} for r in missingRoles]
+                )
+
+            #Remove obsolete roles from the STDM roles table
+            if len(obsoleteRoles) > 0:
+                conn.execute(
+                    text("DELETE FROM content_roles WHERE role_id IN "
+                         "(SELECT id FROM role WHERE name = ANY(:names))"),
+                    names=obsoleteRoles
+                )
+                conn.execute(
+                    text("DELETE FROM role WHERE name = ANY(:names)"),
+                    names=obsoleteRoles
+                )
+
+            trans.commit()
+
+        except Exception:
+            trans.rollback()
+            raise
+
+        finally:
+            conn.close()
                 
     def syncSysRoles(self):
         '''
         Ensure system roles are upto-date with STDM roles (latter as the reference).
         Reverse of 'syncSTDMRoles'.
         '''
-        sysRoles = self.GetSysRoles()        
-        stdmRoles = [role.name for role in self.GetAllRoles()]
-                
-        #Add missing STDMRoles to sysRoles
-        for stdmRole in stdmRoles:
-            roleIndex = getIndex(sysRoles,stdmRole)                    
-            
-            if roleIndex == -1:                
-                self.CreateRole(stdmRole)
-              
-        #Remove obsolete system roles 
-        for sysRole in sysRoles:
-            roleIndex = getIndex(stdmRoles,sysRole)
-            
-            if roleIndex == -1:
-                self.DeleteRole(sysRole) 
+        sysRoles = set(self.GetSysRoles())
+        stdmRoles = set([role.name for role in self.GetAllRoles()])
+
+        #Add missing STDMRoles to sysRoles and remove obsolete system roles
+        sql = []
+        newRoles = stdmRoles - sysRoles
+        if len(newRoles) > 0:
+            sequences = profile_sequences(self._current_profile.prefix)
+            sql = [
+                self._createRoleSql(r, sequences=sequences) for r in newRoles
+            ]
+        sql.extend([self._deleteRoleSql(r) for r in sysRoles - stdmRoles])
+
+        if len(sql) == 0:
+            return
+
+        conn = self._engine.connect()
+        trans = conn.begin()
+        try:
+            conn.execute(text(''.join(sql)))
+            trans.commit()
+
+        except Exception:
+            trans.rollback()
+            raise
+
+        finally:
+            conn.close()
                          
     def GetSysRoles(self):
         '''
@@ -137,6 +173,14 @@ class RoleProvider(object):
         '''
         Create a new role
         '''
+        t = text(self._createRoleSql(roleName, description, grantSchema))
+        self._execute(t)
+
+    def _createRoleSql(self, roleName, description='', grantSchema='public',
+                       sequences=None):
+        '''
+        Statements for creating a role and granting it privileges
+        '''
         sql = []
         sql.append("CREATE ROLE %s CREATEROLE;"%(roleName,))
         if description != "":
@@ -150,13 +194,12 @@ class RoleProvider(object):
         sql.append("GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA %s TO %s;" %
                    (grantSchema,roleName)
                    )
-        sequences = profile_sequences(self._current_profile.prefix)
+        if sequences is None:
+            sequences = profile_sequences(self._current_profile.prefix)
         for profile_sequence in sequences:
             sql.append('GRANT ALL ON SEQUENCE {}.{} TO GROUP {} WITH GRANT OPTION;'.
                        format(grantSchema, profile_sequence, roleName))
-        sqlStr = ''.join(sql)
-        t = text(sqlStr)
-        self._execute(t)
+        return ''.join(sql)
         
     def AddSTDMRole(self,rolename,description = ""):
         '''
@@ -183,8 +226,18 @@ class RoleProvider(object):
         Remove any database objects owned by the given rolename plus the 
         cascading dependencies then delete the role.
         '''
-        t = text("DROP OWNED BY %s CASCADE;DROP ROLE %s;"%(roleName,roleName))
+        t = text(self._deleteRoleSql(roleName))
         self._execute(t)
+
+        #Cached roles of the members are no longer valid
+        from stdm.security.authorization import clear_permissions
+        clear_permissions()
+
+    def _deleteRoleSql(self, roleName):
+        '''
+        Statements for deleting a role and the objects it owns
+        '''
+        return "DROP OWNED BY %s CASCADE;DROP ROLE %s;"%(roleName,roleName)
     
     def RoleExists(self,roleName):
         '''
@@ -233,6 +286,11 @@ class RoleProvider(object):
             '''
             t = text("BEGIN;%s %s %s %s;COMMIT;"%(action,role,refkeyword,usersConcat))            
             result = self._execute(t)                            
+
+        #Roles of the users are read again on the next access check
+        from stdm.security.authorization import clear_permissions
+        for user_name in userNames:
+            clear_permissions(user_name)
     
     def GetUsersInRole(self,roleName):
         '''
@@ -53,6 +53,10 @@ from stdm.data.configuration.columns import (
     ForeignKeyColumn
 )
 
+from stdm.settings.config_snapshot import (
+    read_snapshot,
+    write_snapshot
+)
 from stdm.settings.config_updaters import ConfigurationUpdater
 from stdm.settings.database_updaters import DatabaseUpdater
 from stdm.utils.util import (
@@ -138,12 +142,17 @@ class ConfigurationFileSerializer(QObject):
     def load(self):
         """
         Loads the contents of the configuration file to the corresponding
-        instance object.
+        instance object. The profiles are read from the snapshot of the
+        file if it is up to date, else the file is parsed and the snapshot
+        is created afresh.
         """
         if not QFile.exists(self.path):
             raise IOError(u'{0} does not exist. Configuration file cannot be '
                           u'loaded.'.format(self.path))
 
+        if self._load_snapshot():
+            return
+
         config_file = QFile(self.path)
 
         if not config_file.open(QIODevice.ReadOnly):
@@ -160,6 +169,29 @@ class ConfigurationFileSerializer(QObject):
         #Load configuration items
         self.read_xml(config_doc)
 
+        write_snapshot(self.path, self.config)
+
+    def _load_snapshot(self):
+        """
+        Loads the profiles from the snapshot of the configuration file.
+        :return: Returns True if the profiles were loaded, else False if
+        there is no valid snapshot.
+        :rtype: bool
+        """
+        profiles = read_snapshot(self.path)
+        if profiles is None:
+            return False
+
+        self.config._clear()
+
+        for profile in profiles.values():
+            self.config.add_profile(profile)
+
+        LOGGER.debug(u'Configuration loaded from the snapshot of '
+                     u'{0}'.format(self.path))
+
+        return True
+
     def update(self, document):
         """
         Tries to upgrade the configuration file specified in the DOM document
@@ -428,45 +460,24 @@ class ProfileSerializer(object):
                                          association_elements,
                                          entity_relation_elements)
 
-        deferred_elements = []
+        '''
+        Index the entity elements by short name and read each entity once,
+        after the parents of its foreign key columns.
+        '''
+        entity_elements = ProfileSerializer.entity_elements(element)
 
-        #Process entity elements with no dependency first
-        child_nodes = element.childNodes()
-        for i in range(child_nodes.count()):
-            child_element = child_nodes.item(i).toElement()
-            child_tag_name = child_element.tagName()
-            item_serializer = EntitySerializerCollection.handler_by_tag_name(
-                child_tag_name
-            )
+        parents = OrderedDict()
+        for name, (el, serializer) in entity_elements.iteritems():
+            parents[name] = [
+                p for p in serializer.dependencies(el,
+                                                   entity_relation_elements)
+                if p != name and p in entity_elements
+            ]
 
-            if child_element.tagName() == 'Entity':
-                if not item_serializer is None:
-                    #Check if element has dependency
-                    if not item_serializer.has_dependency(child_element):
-                        item_serializer.read_xml(child_element, profile,
-                                                 association_elements,
-                                                 entity_relation_elements)
-
-                    else:
-                        #Queue the item - tuple containing element and serializer
-                        deferred_elements.append((child_element, item_serializer))
-
-        #Process deferred items
-        for c in deferred_elements:
-            el, serializer = c[0], c[1]
-            '''
+        for name in ProfileSerializer.dependency_order(parents):
+            el, serializer = entity_elements[name]
             serializer.read_xml(el, profile, association_elements,
-                        entity_relation_elements)
-            '''
-
-            #Resolve dependency
-            serializer.resolve_dependency(
-                el,
-                profile,
-                element,
-                association_elements,
-                entity_relation_elements
-            )
+                                entity_relation_elements)
 
         #Set social tenure entities
         str_el = element.firstChildElement('SocialTenure')
@@ -478,34 +489,93 @@ class ProfileSerializer(object):
         return profile
 
     @staticmethod
-    def entity_element(profile_element, entity_name):
+    def entity_elements(profile_element):
         """
-        Searches the profile for an entity with the given short name.
+        Indexes the entity elements in the profile by short name. Only the
+        first element with a given short name is used since the profile
+        ignores entities with an existing name.
         :param profile_element: Profile element to search.
         :type profile_element: QDomElement
-        :param entity_name: Entity short name to search for.
-        :rtype: str
-        :return: Entity element with the corresponding short name, else None
-        if not found.
-        :rtype: QDomElement
+        :return: Tuples of the entity element and its serializer, by entity
+        short name, in the order of the profile element.
+        :rtype: OrderedDict
         """
-        e_element = None
+        entity_elements = OrderedDict()
 
-        entity_el_list = profile_element.elementsByTagName('Entity')
+        item_serializer = EntitySerializerCollection.handler_by_tag_name(
+            EntitySerializer.TAG_NAME
+        )
+        if item_serializer is None:
+            return entity_elements
 
-        for i in range(entity_el_list.count()):
-            entity_element = entity_el_list.item(i).toElement()
-            entity_attribute = entity_element.attribute(
-                EntitySerializer.SHORT_NAME,
-                ''
+        child_nodes = profile_element.childNodes()
+        for i in range(child_nodes.count()):
+            child_element = child_nodes.item(i).toElement()
+            if child_element.tagName() != EntitySerializer.TAG_NAME:
+                continue
+
+            short_name = unicode(child_element.attribute(
+                EntitySerializer.SHORT_NAME, '')
             )
+            if not short_name or short_name in entity_elements:
+                continue
+
+            entity_elements[short_name] = (child_element, item_serializer)
+
+        return entity_elements
+
+    @staticmethod
+    def dependency_order(parents):
+        """
+        Sorts the entities so that each entity comes after its parents.
+        Entities with no parents come first, in their original order.
+        :param parents: Short names of the parents of each entity, by entity
+        short name.
+        :type parents: OrderedDict
+        :return: Short names of the entities in the order they should be
+        read.
+        :rtype: list
+        :raises ConfigurationException: If the entities depend on each other
+        in a cycle.
+        """
+        ordered = [name for name, p in parents.iteritems() if len(p) == 0]
+        visited = set(ordered)
+
+        for name, entity_parents in parents.iteritems():
+            if name in visited:
+                continue
 
-            if entity_attribute == entity_name:
-                e_element = entity_element
+            #Iterative depth-first search of the parents, the path contains
+            #the entities whose parents are being visited.
+            path = [name]
+            stack = [iter(entity_parents)]
 
-                break
+            while len(stack) > 0:
+                parent = next(stack[-1], None)
 
-        return e_element
+                if parent is None:
+                    stack.pop()
+                    entity_name = path.pop()
+                    visited.add(entity_name)
+                    ordered.append(entity_name)
+
+                    continue
+
+                if parent in visited:
+                    continue
+
+                if parent in path:
+                    cycle = path[path.index(parent):] + [parent]
+
+                    raise ConfigurationException(
+                        u'Entities have cyclic foreign key dependencies: '
+                        u'{0}'.format(u' -> '.join(cycle))
+                    )
+
+                path.append(parent)
+                stack.append(iter(parents[parent]))
+
+        return ordered
 
     @staticmethod
     def write_xml(profile, parent_node, document):
@@ -953,6 +1023,20 @@ class EntitySerializerCollection(object):
         """
         return False
 
+    @classmethod
+    def dependencies(cls, element, entity_relation_elements):
+        """
+        :param element: Element containing entity information.
+        :type element: QDomElement
+        :param entity_relation_elements: Collection of QDomElements
+        containing entity relation information.
+        :type entity_relation_elements: dict
+        :return: Returns the short names of the entities that need to be
+        read before this entity. Default is an empty list.
+        :rtype: list
+        """
+        return []
+
     @classmethod
     def group_element(cls, parent_node, document):
         """
@@ -1167,91 +1251,35 @@ class EntitySerializer(EntitySerializerCollection):
         return dep_col_elements
 
     @classmethod
-    def resolve_dependency(
-            cls,
-            element,
-            profile,
-            profile_element,
-            association_elements,
-            entity_relation_elements
-    ):
-        """
-        Performs a depth-first addition of an entity to a profile by
-        recursively cascading all related entities first.
-        :param element: Element representing the entity.
+    def dependencies(cls, element, entity_relation_elements):
+        """
+        :param element: Element containing entity information.
         :type element: QDomElement
-        :param profile: Profile object to be populated with the entity
-        information.
-        :type profile: Profile
+        :param entity_relation_elements: Collection of QDomElements
+        containing entity relation information.
+        :type entity_relation_elements: dict
+        :return: Returns the short names of the parent entities referenced
+        by the foreign key columns of the entity.
+        :rtype: list
         """
-        dep_cols = EntitySerializer._dependency_columns(element)
+        parents = []
 
-        # Add entity directly if there are no dependency columns
-        if len(dep_cols) == 0:
-            EntitySerializer.read_xml(
-                element,
-                profile,
-                association_elements,
-                entity_relation_elements
-            )
+        for c in EntitySerializer._dependency_columns(element):
+            #Get relation element
+            er_element = ForeignKeyColumnSerializer.entity_relation_element(c)
+            relation_name = unicode(er_element.attribute('name', ''))
+            er_element = entity_relation_elements.get(relation_name, None)
 
-            return
+            if er_element is None:
+                continue
 
-        for c in dep_cols:
-            # Get foreign key columns
-            type_info = unicode(c.attribute('TYPE_INFO'))
-
-            if type_info == ForeignKeyColumn.TYPE_INFO:
-                #Get relation element
-                er_element = ForeignKeyColumnSerializer.entity_relation_element(c)
-                relation_name = unicode(er_element.attribute('name', ''))
-                er_element = entity_relation_elements.get(relation_name, None)
-
-                if not er_element is None:
-                    #Get parent
-                    parent = unicode(
-                        er_element.attribute(
-                            EntityRelationSerializer.PARENT,
-                            ''
-                        )
-                    )
-
-                    #Get parent entity element
-                    if parent:
-                        parent_element = ProfileSerializer.entity_element(
-                            profile_element,
-                            parent
-                        )
-
-                        if not parent_element is None:
-                            #Check if parent has dependency
-                            if EntitySerializer.has_dependency(parent_element):
-                                #Resolve dependency
-                                EntitySerializer.resolve_dependency(
-                                    parent_element,
-                                    profile,
-                                    profile_element,
-                                    association_elements,
-                                    entity_relation_elements
-                                )
-
-                            #No more dependencies
-                            else:
-                                EntitySerializer.read_xml(
-                                    parent_element,
-                                    profile,
-                                    association_elements,
-                                    entity_relation_elements
-                                )
-
-        #Now add entity to profile
-        EntitySerializer.read_xml(
-            element,
-            profile,
-            association_elements,
-            entity_relation_elements
-        )
+            parent = unicode(
+                er_element.attribute(EntityRelationSerializer.PARENT, '')
+            )
+            if parent and not parent in parents:
+                parents.append(parent)
 
+        return parents
 
     @staticmethod
     def write_xml(entity, parent_node, document):
@@ -0,0 +1,221 @@
+"""
+/***************************************************************************
+Name                 : Configuration Snapshot
+Description          : Stores the profiles loaded from a configuration file
+                       in a binary snapshot so that subsequent loads of the
+                       unchanged file do not parse the XML.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import copy_reg
+import cPickle
+import hashlib
+import logging
+import os
+
+from PyQt4.QtCore import (
+    QDir,
+    QObject
+)
+
+from stdm.data.configuration.entity import Entity
+from stdm.data.configuration.profile import Profile
+from stdm.data.configuration.stdm_configuration import StdmConfiguration
+from stdm.utils.util import version_from_metadata
+
+LOGGER = logging.getLogger('stdm')
+
+SNAPSHOT_DIR = QDir.home().path() + '/.stdm/cache/configuration'
+
+#Changed when the layout of the snapshot changes
+SNAPSHOT_FORMAT = 2
+
+#Persistent id of the configuration instance which is not in the snapshot
+_CONFIGURATION_ID = 'configuration'
+
+
+def _new_qobject(cls):
+    #Creates the object without running the constructor of the class, its
+    #attributes are then restored from the snapshot.
+    obj = cls.__new__(cls)
+    QObject.__init__(obj)
+
+    return obj
+
+
+def _reduce_qobject(obj):
+    return _new_qobject, (obj.__class__,), obj.__dict__
+
+
+def _subclasses(cls):
+    classes = [cls]
+    for sub_cls in cls.__subclasses__():
+        classes.extend(_subclasses(sub_cls))
+
+    return classes
+
+
+def _register_reducers():
+    #Profiles and entities are QObjects which cannot be pickled by default
+    for cls in [Profile] + _subclasses(Entity):
+        copy_reg.pickle(cls, _reduce_qobject, _new_qobject)
+
+
+def file_hash(path):
+    """
+    :param path: Path of the configuration file.
+    :type path: str
+    :return: Returns the SHA-1 hash of the contents of the file.
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), ''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def snapshot_key(path):
+    """
+    :param path: Path of the configuration file.
+    :type path: str
+    :return: Returns the key that a snapshot must have to be used in place
+    of the configuration file. It changes when the contents of the file,
+    the plugin version or the configuration version change.
+    :rtype: tuple
+    """
+    return (
+        SNAPSHOT_FORMAT,
+        file_hash(path),
+        unicode(version_from_metadata()).strip(),
+        StdmConfiguration.VERSION
+    )
+
+
+def snapshot_path(path):
+    """
+    :param path: Path of the configuration file.
+    :type path: str
+    :return: Returns the path of the snapshot of the configuration file.
+    :rtype: str
+    """
+    name = hashlib.sha1(
+        os.path.abspath(path).encode('utf-8')
+    ).hexdigest()
+
+    return u'{0}/{1}.snapshot'.format(SNAPSHOT_DIR, name)
+
+
+def _persistent_id(obj):
+    if obj is StdmConfiguration.instance():
+        return _CONFIGURATION_ID
+
+    return None
+
+
+def _persistent_load(pid):
+    if pid == _CONFIGURATION_ID:
+        return StdmConfiguration.instance()
+
+    raise cPickle.UnpicklingError(
+        'Unknown object in the configuration snapshot.'
+    )
+
+
+def write_snapshot(path, configuration):
+    """
+    Writes the profiles of the configuration to the snapshot of the
+    configuration file. Errors are logged since the configuration can
+    still be loaded from the file.
+    :param path: Path of the configuration file that has been loaded.
+    :type path: str
+    :param configuration: Configuration loaded from the file.
+    :type configuration: StdmConfiguration
+    :return: Returns True if the snapshot was written, else False.
+    :rtype: bool
+    """
+    snap_path = snapshot_path(path)
+    tmp_path = u'{0}.{1}.part'.format(snap_path, os.getpid())
+
+    try:
+        key = snapshot_key(path)
+
+        if not os.path.isdir(SNAPSHOT_DIR):
+            os.makedirs(SNAPSHOT_DIR)
+
+        _register_reducers()
+
+        with open(tmp_path, 'wb') as f:
+            pickler = cPickle.Pickler(f, cPickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = _persistent_id
+            pickler.dump(key)
+            pickler.dump(configuration.profiles)
+
+        if os.path.exists(snap_path):
+            os.remove(snap_path)
+        os.rename(tmp_path, snap_path)
+
+    except Exception as ex:
+        LOGGER.debug(u'Configuration snapshot could not be written. '
+                     u'{0}'.format(ex))
+        _remove(tmp_path)
+
+        return False
+
+    return True
+
+
+def read_snapshot(path):
+    """
+    Reads the profiles from the snapshot of the configuration file.
+    :param path: Path of the configuration file.
+    :type path: str
+    :return: Returns the profiles by name or None if there is no snapshot
+    or it is out of date.
+    :rtype: OrderedDict
+    """
+    snap_path = snapshot_path(path)
+    if not os.path.isfile(snap_path):
+        return None
+
+    try:
+        key = snapshot_key(path)
+
+        with open(snap_path, 'rb') as f:
+            unpickler = cPickle.Unpickler(f)
+            unpickler.persistent_load = _persistent_load
+
+            if unpickler.load() != key:
+                return None
+
+            return unpickler.load()
+
+    except Exception as ex:
+        LOGGER.debug(u'Configuration snapshot could not be read, it will '
+                     u'be removed. {0}'.format(ex))
+        _remove(snap_path)
+
+        return None
+
+
+def _remove(path):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+
+    except OSError as ex:
+        LOGGER.debug(u'Could not remove {0}. {1}'.format(path, ex))
@@ -40,6 +40,13 @@ HOST = 'Host'
 FIRST_LOGIN = 'FirstLogin'
 STDM_PLUGIN = 'stdm'
 STDM_VERSION = 'STDMVersion'
+RENDER_WORKERS = 'DocumentRenderWorkers'
+GEOODK_ITEMSET_THRESHOLD = 'GeoODKItemsetThreshold'
+GEOODK_IMPORT_COMMIT_SIZE = 'GeoODKImportCommitSize'
+CONTENT_ADDRESSED_DOCS = 'ContentAddressedDocuments'
+LOGIN_PROFILING = 'LoginProfiling'
+MODULE_WARM_UP = 'ModuleWarmUp'
+TRIGRAM_INDEXES = 'TrigramIndexes'
 
 def registry_value(key_name):
     """
@@ -105,6 +112,111 @@ def last_document_path():
     return registry_value(LAST_SUPPORTING_DOC_PATH)
 
 
+def render_worker_count():
+    """
+    :return: Returns the number of worker processes to use when generating
+    documents in the output folder. A value of 1 or less means that the
+    documents are generated in the QGIS process.
+    :rtype: int
+    """
+    workers = registry_value(RENDER_WORKERS)
+    if workers is None:
+        return 1
+
+    try:
+        return int(workers)
+
+    except (TypeError, ValueError):
+        return 1
+
+
+def geoodk_itemset_threshold():
+    """
+    :return: Returns the number of lookup values above which the choices
+    of a lookup are written to an external CSV file instead of the mobile
+    form. A value of 0 means that all choices are written in the form.
+    :rtype: int
+    """
+    threshold = registry_value(GEOODK_ITEMSET_THRESHOLD)
+    if threshold is None:
+        return 0
+
+    try:
+        return max(0, int(threshold))
+
+    except (TypeError, ValueError):
+        return 0
+
+
+def geoodk_import_commit_size():
+    """
+    :return: Returns the number of GeoODK instances that are committed
+    together when importing instances, or None if it has not been set.
+    :rtype: int
+    """
+    commit_size = registry_value(GEOODK_IMPORT_COMMIT_SIZE)
+    if commit_size is None:
+        return None
+
+    try:
+        return max(1, int(commit_size))
+
+    except (TypeError, ValueError):
+        return None
+
+
+def content_addressed_documents():
+    """
+    :return: Returns True if supporting documents are stored once in the
+    network repository under the hash of their content, else False.
+    :rtype: bool
+    """
+    content_addressed = registry_value(CONTENT_ADDRESSED_DOCS)
+    if content_addressed is None:
+        return False
+
+    return unicode(content_addressed).lower() in ('1', 'true', 'yes')
+
+
+def login_profiling():
+    """
+    :return: Returns True if the duration and number of SQL statements of
+    the login phases should be reported, else False.
+    :rtype: bool
+    """
+    profiling = registry_value(LOGIN_PROFILING)
+    if profiling is None:
+        return False
+
+    return unicode(profiling).lower() in ('1', 'true', 'yes')
+
+
+def module_warm_up():
+    """
+    :return: Returns True if the modules of the tools should be imported in
+    the background after login, else False.
+    :rtype: bool
+    """
+    warm_up = registry_value(MODULE_WARM_UP)
+    if warm_up is None:
+        return False
+
+    return unicode(warm_up).lower() in ('1', 'true', 'yes')
+
+
+def trigram_indexes():
+    """
+    :return: Returns True if trigram indexes should be created for the
+    searchable character varying columns, else False.
+    :rtype: bool
+    """
+    trigram = registry_value(TRIGRAM_INDEXES)
+    if trigram is None:
+        return False
+
+    return unicode(trigram).lower() in ('1', 'true', 'yes')
+
+
 def debug_logging():
     """
     :return: Returns whether debug logging has been enabled.
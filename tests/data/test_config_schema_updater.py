@@ -3,10 +3,34 @@ from unittest import (
     TestCase
 )
 
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table
+)
+from sqlalchemy.dialects import postgresql
+
+from stdm.data.configuration.column_updaters import (
+    column_indexes,
+    index_name
+)
 from stdm.data.configuration.config_updater import ConfigurationSchemaUpdater
+from stdm.data.configuration.index_updater import missing_indexes
+from stdm.data.configuration.schema_plan import (
+    SchemaCatalog,
+    SchemaUpdatePlan,
+    table_alteration
+)
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 
 from stdm.tests.data.utils import (
+    add_basic_profile,
+    add_person_entity,
+    add_spatial_unit_entity,
+    append_person_columns,
     create_alchemy_engine,
     populate_configuration
 )
@@ -29,7 +53,134 @@ class TestConfigurationSchemaUpdater(TestCase):
     def _on_complete(self, result):
         self.assertTrue(result)
 
+
+class TestSchemaUpdatePlan(TestCase):
+    def setUp(self):
+        catalog = SchemaCatalog(
+            {
+                'hh_household': {
+                    'id': (u'integer', True),
+                    'name': (u'character varying(50)', False),
+                    'area': (u'numeric(18,6)', False),
+                    'old_code': (u'text', False)
+                }
+            },
+            ['idx_hh_household_name'],
+            {'hh_household_pkey': 'hh_household'}
+        )
+        self.plan = SchemaUpdatePlan(catalog, postgresql.dialect())
+        self.table = Table('hh_household', MetaData(),
+                           Column('id', Integer, primary_key=True))
+
+    def test_merge_column_changes(self):
+        with self.plan.alteration(self.table) as alteration:
+            self.assertIs(table_alteration(self.table), alteration)
+
+            alteration.add_column(Column('code', String(10)),
+                                  'unq_hh_household_code')
+            alteration.alter_column(Column('area', Numeric(18, 6),
+                                           nullable=False))
+            alteration.alter_column(Column('name', String(100)))
+            alteration.drop_column('old_code')
+            alteration.add_index('idx_hh_household_name', 'name')
+            alteration.add_index('idx_hh_household_code', 'code')
+
+        self.assertIsNone(table_alteration(self.table))
+
+        #One ALTER TABLE statement and the new index
+        sql = [s.sql for s in self.plan.steps]
+        self.assertEqual(len(sql), 2)
+        self.assertTrue(sql[0].startswith('ALTER TABLE hh_household'))
+        self.assertIn('ADD COLUMN code VARCHAR(10)', sql[0])
+        self.assertIn('ADD CONSTRAINT unq_hh_household_code UNIQUE', sql[0])
+        self.assertIn('ALTER COLUMN area SET NOT NULL', sql[0])
+        self.assertIn('ALTER COLUMN name TYPE VARCHAR(100)', sql[0])
+        self.assertIn('DROP COLUMN IF EXISTS old_code', sql[0])
+        self.assertNotIn('area TYPE', sql[0])
+        self.assertIn('idx_hh_household_code', sql[1])
+
+        self.assertEqual(self.plan.catalog.column_names('hh_household'),
+                         ['area', 'code', 'id', 'name'])
+
+    def test_unchanged_table(self):
+        with self.plan.alteration(self.table) as alteration:
+            alteration.alter_column(Column('area', Numeric(18, 6)))
+
+        self.assertEqual(len(self.plan), 0)
+
+    def test_create_table_once(self):
+        self.plan.create_table('hh_person')
+        self.plan.create_table('hh_person')
+        self.plan.create_table('hh_household')
+
+        self.assertEqual(len(self.plan), 1)
+        self.assertTrue(self.plan.catalog.has_column('hh_person', 'id'))
+
+    def test_deferred_steps_preview(self):
+        self.plan.drop_table('hh_household')
+        self.plan.add_deferred('Update lookup values', lambda: None)
+
+        preview = self.plan.preview()
+        self.assertEqual(len(preview), 2)
+        self.assertIn('DROP TABLE IF EXISTS hh_household CASCADE', preview[0])
+        self.assertIn('after commit', preview[1])
+        self.assertFalse(self.plan.catalog.has_table('hh_household'))
+
+
+class TestIndexUpdater(TestCase):
+    def setUp(self):
+        self.config = StdmConfiguration.instance()
+        self.profile = add_basic_profile(self.config)
+        self.person = add_person_entity(self.profile)
+        append_person_columns(self.person)
+        self.spatial_unit = add_spatial_unit_entity(self.profile)
+
+    def tearDown(self):
+        self.profile = None
+        self.config = None
+
+    def test_column_indexes(self):
+        gender = self.person.columns['gender']
+        self.assertEqual(column_indexes(gender), [
+            (index_name(self.person.name, 'gender'), 'gender', 'btree')
+        ])
+
+        geom = self.spatial_unit.columns['geom_poly']
+        self.assertEqual(column_indexes(geom)[0][2], 'gist')
+
+        first_name = self.person.columns['first_name']
+        first_name.searchable = True
+        self.assertEqual(column_indexes(first_name), [])
+
+        trgm_indexes = column_indexes(first_name, True)
+        self.assertEqual(len(trgm_indexes), 1)
+        self.assertEqual(trgm_indexes[0][2], 'gin')
+        self.assertIn('gin_trgm_ops', trgm_indexes[0][1])
+
+    def test_missing_indexes(self):
+        catalog = SchemaCatalog(
+            {
+                self.person.name: {
+                    'id': (u'integer', True),
+                    'gender': (u'integer', False),
+                    'first_name': (u'character varying(30)', False)
+                },
+                self.spatial_unit.name: {
+                    'id': (u'integer', True),
+                    'geom_poly': (u'geometry(Polygon,4326)', False)
+                }
+            },
+            [index_name(self.spatial_unit.name, 'geom_poly')]
+        )
+
+        missing = missing_indexes([self.profile], catalog)
+        self.assertEqual([m[0] for m in missing],
+                         [index_name(self.person.name, 'gender')])
+
+
 def suite():
     suite = makeSuite(TestConfigurationSchemaUpdater, 'test')
+    suite.addTests(makeSuite(TestSchemaUpdatePlan, 'test'))
+    suite.addTests(makeSuite(TestIndexUpdater, 'test'))
 
     return suite
\ No newline at end of file
@@ -67,6 +67,37 @@ class TestProfile(TestCase):
 
         self.assertTrue(status, 'Relation was not removed.')
 
+    def test_parent_child_relations(self):
+        rel = self._add_household_person_relation()
+        self.profile.add_entity_relation(rel)
+
+        self.assertIn(rel, self.profile.parent_relations(rel.parent))
+        self.assertIn(rel, self.profile.child_relations(rel.child))
+        self.assertIn(rel, self.profile.child_column_relations(
+            'household_id'))
+
+    def test_entity_by_name(self):
+        person_entity = add_person_entity(self.profile)
+
+        self.assertIs(
+            self.profile.entity_by_name(person_entity.name),
+            person_entity
+        )
+
+    def test_entity_by_name_after_rename(self):
+        person_entity = add_person_entity(self.profile)
+        old_name = person_entity.name
+
+        #Build the lookup then rename
+        self.profile.entity_by_name(old_name)
+        self.profile.rename(PERSON_ENTITY, 'member')
+
+        self.assertIsNone(self.profile.entity_by_name(old_name))
+        self.assertIs(
+            self.profile.entity_by_name(person_entity.name),
+            person_entity
+        )
+
     def test_add_entity(self):
         person_entity = add_person_entity(self.profile)
         person_item = self.profile.entity(PERSON_ENTITY)
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.geoodk.importer import instance_reader
+from stdm.geoodk.importer.instance_reader import (
+    clear_cache,
+    parse_instance,
+    read_instance,
+    read_instances,
+    rename_cached
+)
+
+INSTANCE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Household_Profile xmlns="http://opendatakit.org/xforms" id="hh">
+    <sp_household>
+        <name>Kamau</name>
+        <household_supporting_document>deed.jpg</household_supporting_document>
+        <photo_supporting_document></photo_supporting_document>
+    </sp_household>
+    <sp_person>
+        <first_name>Jane</first_name>
+    </sp_person>
+    <identity>HH-001</identity>
+    <meta>
+        <instanceID>uuid:6f2a</instanceID>
+    </meta>
+</Household_Profile>
+"""
+
+
+class TestInstanceReader(TestCase):
+    def setUp(self):
+        clear_cache()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = self._write_instance('instance.xml')
+
+    def tearDown(self):
+        clear_cache()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write_instance(self, name, content=INSTANCE_XML):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+        return path
+
+    def test_parse_instance(self):
+        record = parse_instance(self.path)
+
+        self.assertEqual(record['root'], 'Household_Profile')
+        self.assertEqual(
+            record['groups'],
+            ['sp_household', 'sp_person', 'identity', 'meta']
+        )
+        self.assertEqual(record['identity'], 'HH-001')
+        self.assertEqual(record['uuid'], 'uuid:6f2a')
+        self.assertEqual(
+            record['entities']['sp_person'],
+            {'first_name': 'Jane'}
+        )
+
+    def test_parse_instance_documents(self):
+        record = parse_instance(self.path)
+
+        #Empty document references are ignored
+        self.assertEqual(
+            record['documents'],
+            {'sp_household': {'household_supporting_document': 'deed.jpg'}}
+        )
+
+    def test_read_instance_cached(self):
+        record = read_instance(self.path)
+
+        self.assertIs(read_instance(self.path), record)
+
+    def test_read_instance_modified(self):
+        record = read_instance(self.path)
+        mtime = os.path.getmtime(self.path)
+        self._write_instance(
+            'instance.xml',
+            INSTANCE_XML.replace('HH-001', 'HH-002')
+        )
+        os.utime(self.path, (mtime + 10, mtime + 10))
+
+        modified = read_instance(self.path)
+
+        self.assertIsNot(modified, record)
+        self.assertEqual(modified['identity'], 'HH-002')
+
+    def test_cache_size(self):
+        max_cached = instance_reader.MAX_CACHED_INSTANCES
+        instance_reader.MAX_CACHED_INSTANCES = 2
+        try:
+            first = read_instance(self.path)
+            second = read_instance(self._write_instance('second.xml'))
+            read_instance(self._write_instance('third.xml'))
+
+            #The least recently used instance is removed
+            self.assertIsNot(read_instance(self.path), first)
+            self.assertEqual(len(instance_reader._INSTANCE_CACHE), 2)
+            self.assertIsNot(
+                read_instance(os.path.join(self.tmp_dir, 'second.xml')),
+                second
+            )
+
+        finally:
+            instance_reader.MAX_CACHED_INSTANCES = max_cached
+
+    def test_rename_cached(self):
+        record = read_instance(self.path)
+        new_path = os.path.join(self.tmp_dir, 'renamed.xml')
+        os.rename(self.path, new_path)
+        rename_cached(self.path, new_path)
+
+        self.assertIs(read_instance(new_path), record)
+        self.assertEqual(record['path'], new_path)
+
+    def test_read_instances(self):
+        invalid_path = self._write_instance('invalid.xml', '<instance>')
+        second_path = self._write_instance('second.xml')
+
+        results = list(read_instances([self.path, invalid_path, second_path]))
+
+        self.assertEqual(
+            [path for path, record in results],
+            [self.path, invalid_path, second_path]
+        )
+        self.assertIsNone(results[1][1])
+        self.assertEqual(results[2][1]['identity'], 'HH-001')
+
+
+def suite():
+    suite = makeSuite(TestInstanceReader, 'test')
+
+    return suite
@@ -1,10 +1,18 @@
+import shutil
+import tempfile
+from collections import OrderedDict
 from unittest import (
     makeSuite,
     TestCase
 )
 
+from stdm.data.configuration.exception import ConfigurationException
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
-from stdm.settings.config_serializer import ConfigurationFileSerializer
+from stdm.settings import config_snapshot
+from stdm.settings.config_serializer import (
+    ConfigurationFileSerializer,
+    ProfileSerializer
+)
 
 from stdm.tests.data.utils import (
     create_alchemy_engine,
@@ -37,6 +45,65 @@ class TestConfigurationSerializer(TestCase):
 
         self.assertTrue(read_result)
 
+    def test_load_snapshot(self):
+        #Write the snapshots to a temporary directory
+        snapshot_dir = config_snapshot.SNAPSHOT_DIR
+        config_snapshot.SNAPSHOT_DIR = tempfile.mkdtemp()
+
+        try:
+            populate_configuration(self.config)
+            self.serializer.save()
+
+            #First load parses the file and writes the snapshot
+            self.serializer.load()
+            xml_profiles = dict([
+                (name, p.entities.keys())
+                for name, p in self.config.profiles.iteritems()
+            ])
+
+            self.assertTrue(self.serializer._load_snapshot())
+
+            snapshot_profiles = dict([
+                (name, p.entities.keys())
+                for name, p in self.config.profiles.iteritems()
+            ])
+
+            self.assertEqual(xml_profiles, snapshot_profiles)
+
+            for p in self.config.profiles.values():
+                self.assertIs(p.configuration, self.config)
+
+        finally:
+            shutil.rmtree(config_snapshot.SNAPSHOT_DIR, True)
+            config_snapshot.SNAPSHOT_DIR = snapshot_dir
+
+    def test_dependency_order(self):
+        parents = OrderedDict([
+            ('household', ['party']),
+            ('spatial_unit', []),
+            ('party', ['spatial_unit']),
+            ('member', ['household', 'party'])
+        ])
+
+        ordered = ProfileSerializer.dependency_order(parents)
+
+        self.assertEqual(
+            ordered,
+            ['spatial_unit', 'party', 'household', 'member']
+        )
+
+    def test_dependency_order_cycle(self):
+        parents = OrderedDict([
+            ('household', ['party']),
+            ('party', ['household'])
+        ])
+
+        self.assertRaises(
+            ConfigurationException,
+            ProfileSerializer.dependency_order,
+            parents
+        )
+
 
 def suite():
     suite = makeSuite(TestConfigurationSerializer, 'test')
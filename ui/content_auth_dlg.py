@@ -24,9 +24,11 @@ from PyQt4.QtGui import *
 from sqlalchemy.orm import clear_mappers
 from sqlalchemy import Table
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
 
 from stdm.security.roleprovider import RoleProvider
+from stdm.security.authorization import clear_permissions
 from stdm.data.database import (
     Content,
     Role,
@@ -168,6 +170,9 @@ class contentAuthDlg(QDialog, Ui_frmContentAuth):
                 self.currentContent.roles.remove(rl)
                 
             self.currentContent.update()
+
+            #Permissions are read again when next checked
+            clear_permissions()
                 
             self.blockSignals(False)
     
@@ -37,13 +37,17 @@ from PyQt4.QtGui import (
 )
 from PyQt4.QtCore import (
     Qt,
+    QEventLoop,
     QFileInfo,
     QTimer
 )
 
+import stdm.data
 from stdm.settings import current_profile
 from stdm.data.configuration import entity_model
 from stdm.composer.document_generator import DocumentGenerator
+from stdm.composer.render_farm import DocumentRenderFarm
+from stdm.composer.sub_report_cache import PREFETCH_BATCH_SIZE
 from stdm.ui.progress_dialog import STDMProgressDialog
 from stdm.utils.util import (
     getIndex,
@@ -54,8 +58,10 @@ from stdm.utils.util import (
 )
 
 from stdm.settings.registryconfig import (
+    composer_output_path,
     RegistryConfig,
-    COMPOSER_OUTPUT
+    COMPOSER_OUTPUT,
+    render_worker_count
 )
 
 from .entity_browser import ForeignKeyBrowser
@@ -609,6 +615,26 @@ class DocumentGeneratorDialog(QDialog, Ui_DocumentGeneratorDialog):
             self._doc_generator.set_attr_value_formatters(config.formatters())
 
         entity_field_name = "id"
+        changed_only = self.chkChangedOnly.isChecked()
+        self._doc_generator.reset_manifest_report()
+
+        #Shard records across worker processes if enabled in the settings
+        num_workers = render_worker_count()
+        if num_workers > 1 and len(records) > 1 and \
+                self.chkUseOutputFolder.checkState() == Qt.Checked and \
+                not self.chk_template_datasource.isChecked():
+            success_status = self._generate_with_render_farm(
+                records,
+                outputMode,
+                entity_field_name,
+                documentNamingAttrs,
+                fileExtension,
+                num_workers,
+                changed_only
+            )
+            self.reset(success_status)
+
+            return
         
         #Iterate through the selected records
         progressDlg = QProgressDialog(self)
@@ -624,12 +650,32 @@ class DocumentGeneratorDialog(QDialog, Ui_DocumentGeneratorDialog):
                     success_status = False
                     break
 
+                if i % PREFETCH_BATCH_SIZE == 0:
+                    self._doc_generator.clear_prefetched_rows()
+                    batch = records[i:i + PREFETCH_BATCH_SIZE]
+
+                    #The rows are fetched per record if the batch cannot
+                    #be fetched
+                    try:
+                        self._doc_generator.prefetch(
+                            self._docTemplatePath,
+                            entity_field_name,
+                            [r.id for r in batch]
+                        )
+
+                    except Exception as ex:
+                        self._doc_generator.clear_prefetched_rows()
+                        LOGGER.debug(
+                            u'Rows could not be prefetched. {0}'.format(ex)
+                        )
+
                 #User-defined location
                 if self.chkUseOutputFolder.checkState() == Qt.Unchecked:
                     status,msg = self._doc_generator.run(self._docTemplatePath, entity_field_name,
                                                   record.id, outputMode,
-                                                  filePath = self._outputFilePath)
-                    self._doc_generator.clear_temporary_layers()
+                                                  filePath = self._outputFilePath,
+                                                  changedOnly = changed_only)
+                    self._doc_generator.clear_temporary_table_layers()
                 #Output folder location using custom naming
                 else:
 
@@ -637,8 +683,9 @@ class DocumentGeneratorDialog(QDialog, Ui_DocumentGeneratorDialog):
                                                     record.id, outputMode,
                                                     dataFields = documentNamingAttrs,
                                                     fileExtension = fileExtension,
-                                                    data_source = self.ds_entity.name)
-                    self._doc_generator.clear_temporary_layers()
+                                                    data_source = self.ds_entity.name,
+                                                    changedOnly = changed_only)
+                    self._doc_generator.clear_temporary_table_layers()
 
                 if not status:
                     result = QMessageBox.warning(self,
@@ -670,11 +717,19 @@ class DocumentGeneratorDialog(QDialog, Ui_DocumentGeneratorDialog):
 
             QApplication.restoreOverrideCursor()
 
+            complete_msg = QApplication.translate("DocumentGeneratorDialog",
+                                    "Document generation has successfully completed.")
+
+            if changed_only:
+                complete_msg = u'{0}\n\n{1}'.format(
+                    complete_msg,
+                    self._doc_generator.manifest_report()
+                )
+
             QMessageBox.information(self,
                 QApplication.translate("DocumentGeneratorDialog",
                                        "Document Generation Complete"),
-                QApplication.translate("DocumentGeneratorDialog",
-                                    "Document generation has successfully completed.")
+                complete_msg
                                     )
 
         except Exception as ex:
@@ -692,9 +747,206 @@ class DocumentGeneratorDialog(QDialog, Ui_DocumentGeneratorDialog):
             )
             success_status = False
 
+        finally:
+            #Remove the pooled layers from the project even on abort or error
+            self._doc_generator.clear_prefetched_rows()
+            self._doc_generator.clear_temporary_layers()
+
+            #Keep the documents generated before an abort or error
+            if changed_only:
+                self._doc_generator.save_manifests()
+
         #Reset UI
         self.reset(success_status)
 
+    def _generate_with_render_farm(self, records, output_mode, entity_field,
+                                   data_fields, file_extension, num_workers,
+                                   changed_only=False):
+        """
+        Generates the documents in the output folder using several worker
+        processes. If a previous run of the same template did not complete,
+        the user is asked whether to resume the run, skipping the records
+        that were already generated, or to restart it.
+        :return: True if all the documents were successfully generated.
+        :rtype: bool
+        """
+        output_dir = composer_output_path()
+        if not output_dir:
+            self._notif_bar.insertErrorNotification(
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "System could not read the location of the output "
+                    "directory in the registry."
+                )
+            )
+
+            return False
+
+        record_ids = [r.id for r in records]
+        resume = False
+        prev_state = DocumentRenderFarm.incomplete_run(
+            output_dir,
+            self._docTemplatePath,
+            record_ids
+        )
+
+        if not prev_state is None:
+            num_done = len(record_ids) - len(prev_state.remaining(record_ids))
+            msg_box = QMessageBox(
+                QMessageBox.Question,
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "Incomplete Document Generation"
+                ),
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "A previous generation of documents using this template "
+                    "did not complete. {0} of {1} document(s) were "
+                    "generated.\n\nResume to generate the remaining "
+                    "documents or restart to generate all the "
+                    "documents.".format(num_done, len(record_ids))
+                ),
+                QMessageBox.Cancel,
+                self
+            )
+            resume_btn = msg_box.addButton(
+                QApplication.translate("DocumentGeneratorDialog", "Resume"),
+                QMessageBox.AcceptRole
+            )
+            restart_btn = msg_box.addButton(
+                QApplication.translate("DocumentGeneratorDialog", "Restart"),
+                QMessageBox.DestructiveRole
+            )
+            msg_box.exec_()
+
+            if msg_box.clickedButton() == resume_btn:
+                resume = True
+
+            elif msg_box.clickedButton() != restart_btn:
+                return False
+
+        farm = DocumentRenderFarm(stdm.data.app_dbconn, self)
+        progress_dlg = QProgressDialog(self)
+        progress_dlg.setMaximum(len(records))
+        progress_dlg.setLabelText(
+            QApplication.translate(
+                "DocumentGeneratorDialog",
+                "Generating documents using {0} processes...".format(
+                    num_workers
+                )
+            )
+        )
+
+        loop = QEventLoop(self)
+        result = {'status': False, 'done': False}
+
+        def on_finished(status):
+            result['status'] = status
+            result['done'] = True
+            loop.quit()
+
+        farm.progress.connect(lambda done, total: progress_dlg.setValue(done))
+        farm.finished.connect(on_finished)
+        progress_dlg.canceled.connect(farm.cancel)
+
+        try:
+            queued = farm.start(
+                self._docTemplatePath,
+                record_ids,
+                output_mode,
+                output_dir,
+                num_workers,
+                resume=resume,
+                entity_field=entity_field,
+                data_fields=data_fields,
+                file_extension=file_extension,
+                data_source=self.ds_entity.name,
+                changed_only=changed_only
+            )
+
+        except RuntimeError as ex:
+            progress_dlg.close()
+            QMessageBox.critical(
+                self,
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "Document Generate Error"
+                ),
+                unicode(ex)
+            )
+
+            return False
+
+        #The run may finish while starting e.g. if no worker can be started
+        if queued > 0 and not result['done']:
+            loop.exec_()
+
+        progress_dlg.close()
+
+        failed = farm.state().failed()
+        errors = farm.errors()
+        if len(errors) > 0:
+            msg = QApplication.translate(
+                "DocumentGeneratorDialog",
+                "{0} document generation process(es) could not be "
+                "started.".format(len(errors))
+            )
+            QMessageBox.warning(
+                self,
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "Document Generate Error"
+                ),
+                u'{0}\n\n{1}'.format(msg, u'\n'.join(errors))
+            )
+
+        elif len(failed) > 0:
+            details = u'\n'.join(
+                [u'{0}: {1}'.format(k, v) for k, v in failed.iteritems()]
+            )
+            if changed_only:
+                details = u'{0}\n\n{1}'.format(
+                    details,
+                    farm.manifest_report()
+                )
+            msg = QApplication.translate(
+                "DocumentGeneratorDialog",
+                "{0} document(s) could not be generated. Run the generation "
+                "again and resume it to retry the failed "
+                "records.".format(len(failed))
+            )
+            QMessageBox.warning(
+                self,
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "Document Generate Error"
+                ),
+                u'{0}\n\n{1}'.format(msg, details)
+            )
+
+        elif result['status'] or queued == 0:
+            complete_msg = QApplication.translate(
+                "DocumentGeneratorDialog",
+                "Document generation has successfully completed."
+            )
+
+            if changed_only:
+                complete_msg = u'{0}\n\n{1}'.format(
+                    complete_msg,
+                    farm.manifest_report()
+                )
+
+            QMessageBox.information(
+                self,
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "Document Generation Complete"
+                ),
+                complete_msg
+            )
+
+        return result['status'] or (queued == 0 and len(failed) == 0)
+
     def _dummy_template_records(self):
         """
         This is applied when records from a template data source are to be
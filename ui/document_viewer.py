@@ -58,6 +58,11 @@ from stdm.utils.util import (
     guess_extension
 )
 from stdm.settings import current_profile
+from stdm.network import (
+    content_document_path,
+    content_extension,
+    is_content_hash
+)
 LOGGER = logging.getLogger('stdm')
 
 class PhotoViewer(QScrollArea):
@@ -607,6 +612,14 @@ class DocumentViewManager(QMainWindow):
         if not file_manager is None:
             network_repository = file_manager.networkPath
             file_id = document_widget.file_identifier()
+
+            if is_content_hash(file_id):
+                return content_document_path(
+                    network_repository,
+                    file_id,
+                    content_extension(document_widget.displayName())
+                )
+
             source_entity = document_widget.doc_source_entity()
             profile_name = current_profile().name
             doc_type = document_widget.doc_type_value().lower().replace(
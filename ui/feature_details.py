@@ -73,7 +73,6 @@ from stdm.utils.util import (
     entity_attr_to_model
 )
 
-from stdm.ui.social_tenure.str_editor import EditSTREditor
 
 from ui_feature_details import Ui_DetailsDock
 
@@ -1601,6 +1600,8 @@ class DetailsTreeView(DetailsDBHandler, DetailsDockWidget):
             node_data = str_model, documents
 
             feature_edit = False
+            from stdm.ui.social_tenure.str_editor import EditSTREditor
+
             edit_str = EditSTREditor(node_data)
             edit_str.exec_()
 
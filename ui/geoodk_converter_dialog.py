@@ -41,6 +41,7 @@ from stdm.data.configuration.db_items import DbItem
 from stdm.ui.wizard.custom_item_model import EntitiesModel
 from stdm.geoodk.geoodk_writer import GeoodkWriter
 from stdm.settings import current_profile
+from stdm.settings.registryconfig import geoodk_itemset_threshold
 #from stdm.geoodk import  FormUploader
 
 
@@ -186,7 +187,11 @@ class GeoODKConverter(QDialog, FORM_CLASS):
                 )
                 return
             if len(selected_entities) > 0:
-                geoodk_writer = GeoodkWriter(selected_entities, self.str_supported)
+                geoodk_writer = GeoodkWriter(
+                    selected_entities,
+                    self.str_supported,
+                    geoodk_itemset_threshold()
+                )
                 geoodk_writer.write_data_to_xform()
                 msg = 'File saved ' \
                       'in: {}'
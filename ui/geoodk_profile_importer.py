@@ -45,6 +45,7 @@ from stdm.data.configuration.stdm_configuration import (
 
 from stdm.ui.notification import NotificationBar
 from stdm.settings import current_profile
+from stdm.settings.registryconfig import geoodk_import_commit_size
 from stdm.utils.util import setComboCurrentIndexWithText
 from stdm.settings.config_serializer import ConfigurationFileSerializer
 from stdm.geoodk.importer.uuid_extractor import InstanceUUIDExtractor
@@ -52,7 +53,10 @@ from stdm.ui.wizard.custom_item_model import EntitiesModel
 from stdm.geoodk.importer import EntityImporter
 from stdm.settings.projectionSelector import ProjectionSelector
 from stdm.geoodk.importer import ImportLogger
-from stdm import resources_rc
+from stdm.geoodk.importer import BatchImportSession
+from stdm.geoodk.importer.instance_reader import read_instances
+from stdm.utils.resources import register_resources
+register_resources()
 #from stdm.geoodk.importer.geoodkserver import JSONEXTRACTOR
 
 
@@ -344,67 +348,138 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
                                                                       .format(self.parent_table_isselected())),
                                        QMessageBox.Ok | QMessageBox.No) == QMessageBox.No:
                 return
+        batch = None
         try:
             parents_info = []
             counter = 0
+            imported = 0
             if len(self.instance_list) > 0:
                 self.pgbar.setRange(counter, len(self.instance_list))
                 self.pgbar.setValue(0)
-                for instance in self.instance_list:
+                #Models and lookup values are cached for the whole run and
+                #each instance is written in its own transaction
+                batch = BatchImportSession(geoodk_import_commit_size())
+                instance_entities = self.instance_entities() or []
+                #Instances written but not yet committed
+                group = []
+                #Instances are parsed in parallel and fed in order
+                for instance, record in read_instances(self.instance_list):
                     import_status = False
                     counter = counter + 1
                     self.parent_ids = {}
-                    entity_importer = EntityImporter(instance)
-                    group_identifier = entity_importer.instance_group_id()
-                    #set the geometry coordinate system
-                    entity_importer.geomsetter(self.on_projection_select())
-                    self.archive_this_import_file(counter, instance)
-                    if has_relations:
-                        #Import parents table first
-                        for parent_table in self.relations.keys():
-                            cu_obj = parent_table
-                            if parent_table in self.instance_entities():
-                                ref_id, import_status = entity_importer.process_parent_entity_import(parent_table)
-                                if group_identifier:
-                                    self.parent_ids[parent_table] = [ref_id, group_identifier]
-                                else:
-                                    self.parent_ids[parent_table] = [ref_id, parent_table]
-                                log_timestamp = '{0} -- parent table import succeeded: {1}'\
-                                    .format(parent_table, str(import_status))
-                                self.log_table_entry(log_timestamp)
-                                parents_info.append(parent_table)
-                                if parent_table[1] in entity_info:
-                                    entity_info.remove(parent_table)
-                    for table in entity_info:
-                        cu_obj = table
-                        if table not in parents_info:
-                            table_id, status = entity_importer.process_import_to_db(table, self.parent_ids)
-                            if table in self.parent_ids:
-                                continue
-                            else:
-                                self.parent_ids[table] = [table_id, group_identifier]
-                            self.log_table_entry(" -- {0} import succeeded: ".format(cu_obj)+str(status))
-                    self.txt_feedback.append(
-                        'saving record "{0}" to database'.format(counter))
-                    if self.uuid_extractor.has_str_captured_in_instance():
-                         if self.parent_ids is not None:
-                            entity_importer.process_social_tenure(self.parent_ids)
-                            self.log_table_entry(" -- saving social tenure relationship")
+                    try:
+                        with batch.instance():
+                            self._import_instance(
+                                instance, record, batch, entity_info,
+                                instance_entities, has_relations, parents_info
+                            )
+                        group.append((counter, instance))
+                        self.txt_feedback.append(
+                            'saving record "{0}" to database'.format(counter))
+                    except Exception as ex:
+                        #Only the failed instance is rolled back
+                        self.archive_this_import_file(counter, instance)
+                        self.log_table_entry(
+                            unicode(ex.message) +
+                            ' -- record {0} import failed'.format(counter))
+                        self.txt_feedback.append(
+                            'record "{0}" could not be saved: {1}'.format(
+                                counter, unicode(ex.message)))
+                    if batch.commit_due():
+                        imported = imported + self._commit_group(batch, group)
+                        group = []
                     self.pgbar.setValue(counter)
 
+                imported = imported + self._commit_group(batch, group)
                 self.txt_feedback.append('Number of record successfully imported:  {}'
-                                                  .format(counter))
+                                                  .format(imported))
             else:
                 self._notif_bar_str.insertErrorNotification("No user selected entities to import")
                 self.pgbar.setValue(0)
                 return
 
         except Exception as ex:
+            if batch is not None:
+                batch.rollback()
             self.log_table_entry(
                 unicode(ex.message)+'-- {0} import succeeded: '.format(cu_obj)+unicode(import_status))
             self.feedback_message(unicode(ex.message))
             return
 
+    def _commit_group(self, batch, group):
+        """
+        Commits the instances written since the last commit. The instance
+        files are only archived once they have been committed.
+        :param batch: Batch import session of the current run
+        :type batch: BatchImportSession
+        :param group: Number and path of the instances in the group
+        :type group: list
+        :return: Number of instances that were committed
+        :rtype: int
+        """
+        if len(group) == 0:
+            return 0
+        first, last = group[0][0], group[-1][0]
+        try:
+            batch.commit()
+        except Exception as ex:
+            #All the instances in the group are rolled back
+            self.log_table_entry(
+                unicode(ex.message) +
+                ' -- records {0} to {1} import failed'.format(first, last))
+            self.txt_feedback.append(
+                'records "{0}" to "{1}" could not be saved: {2}'.format(
+                    first, last, unicode(ex.message)))
+            return 0
+        for counter, instance in group:
+            self.archive_this_import_file(counter, instance)
+        return len(group)
+
+    def _import_instance(self, instance, record, batch, entity_info,
+                         instance_entities, has_relations, parents_info):
+        """
+        Imports the entities in a single instance file.
+        :param instance: Path of the instance file
+        :type instance: str
+        :param record: Parsed instance file, None if it could not be read
+        :type record: dict
+        :param batch: Batch import session of the current run
+        :type batch: BatchImportSession
+        :param instance_entities: Entities captured in the instances
+        :type instance_entities: list
+        """
+        entity_importer = EntityImporter(instance, batch, record)
+        group_identifier = entity_importer.instance_group_id()
+        #set the geometry coordinate system
+        entity_importer.geomsetter(self.on_projection_select())
+        if has_relations:
+            #Import parents table first
+            for parent_table in self.relations.keys():
+                if parent_table in instance_entities:
+                    ref_id, import_status = entity_importer.process_parent_entity_import(parent_table)
+                    if group_identifier:
+                        self.parent_ids[parent_table] = [ref_id, group_identifier]
+                    else:
+                        self.parent_ids[parent_table] = [ref_id, parent_table]
+                    log_timestamp = '{0} -- parent table import succeeded: {1}'\
+                        .format(parent_table, str(import_status))
+                    self.log_table_entry(log_timestamp)
+                    parents_info.append(parent_table)
+                    if parent_table[1] in entity_info:
+                        entity_info.remove(parent_table)
+        for table in entity_info:
+            if table not in parents_info:
+                table_id, status = entity_importer.process_import_to_db(table, self.parent_ids)
+                if table in self.parent_ids:
+                    continue
+                else:
+                    self.parent_ids[table] = [table_id, group_identifier]
+                self.log_table_entry(" -- {0} import succeeded: ".format(table)+str(status))
+        if self.uuid_extractor.has_str_captured_in_instance():
+             if self.parent_ids is not None:
+                entity_importer.process_social_tenure(self.parent_ids)
+                self.log_table_entry(" -- saving social tenure relationship")
+
     def has_foreign_keys_parent(self, select_entities):
         """
         Ensure we check that the table is not parent else
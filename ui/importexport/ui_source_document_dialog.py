@@ -59,4 +59,5 @@ class Ui_SourceDocumentTranslatorDialog(object):
         self.label.setText(QtGui.QApplication.translate("SourceDocumentTranslatorDialog", "Supporting documents folder", None, QtGui.QApplication.UnicodeUTF8))
         self.btn_source_doc_folder.setText(QtGui.QApplication.translate("SourceDocumentTranslatorDialog", "...", None, QtGui.QApplication.UnicodeUTF8))
 
-from stdm import resources_rc
\ No newline at end of file
+from stdm.utils.resources import register_resources
+register_resources()
\ No newline at end of file
@@ -23,6 +23,7 @@ from PyQt4.QtGui import (
     QTabWidget,
     QApplication,
     QMessageBox,
+    QProgressDialog,
     QShowEvent,
     QColor
 )
@@ -47,6 +48,10 @@ from stdm.navigation import (
     GMAP_SATELLITE,
     OSM
 )
+from stdm.navigation.tile_cache import (
+    profile_spatial_unit_extent,
+    TileSeeder
+)
 
 from stdm.data.pg_utils import(
     geometryType,
@@ -81,6 +86,7 @@ class SpatialPreview(QTabWidget, Ui_frmPropertyPreview):
         self._overlay_layer = None
         self.sel_highlight = None
         self.memory_layer = None
+        self._tile_seeder = None
         self._db_session = STDMDb.instance().session
 
         self.set_iface(iface)
@@ -98,6 +104,7 @@ class SpatialPreview(QTabWidget, Ui_frmPropertyPreview):
         self.zoomSlider.sliderReleased.connect(self.on_zoom_changed)
         self.btnResetMap.clicked.connect(self.on_reset_web_map)
         self.btnSync.clicked.connect(self.on_sync_extents)
+        self.btnSeedCache.clicked.connect(self.on_seed_tile_cache)
         QgsMapLayerRegistry.instance().layersWillBeRemoved.connect(self._on_overlay_to_be_removed)
 
     def set_iface(self, iface):
@@ -490,6 +497,66 @@ class SpatialPreview(QTabWidget, Ui_frmPropertyPreview):
             curr_extent = self.map_extents()
             self._web_spatial_loader.zoom_to_map_extents(curr_extent)
 
+    def on_seed_tile_cache(self):
+        """
+        Slot raised to download the base map tiles covering the spatial
+        units in the current profile into the tile cache.
+        """
+        if not self._tile_seeder is None:
+            return
+
+        extent = profile_spatial_unit_extent()
+        if extent is None:
+            msg = QApplication.translate(
+                'SpatialPreview',
+                'There are no spatial units, with a valid coordinate '
+                'reference system, whose base map tiles can be cached.'
+            )
+            self._insert_notification(msg, WARNING)
+
+            return
+
+        min_zoom, max_zoom = TileSeeder.zoom_levels(extent)
+
+        progress_dlg = QProgressDialog(
+            QApplication.translate(
+                'SpatialPreview',
+                'Downloading base map tiles...'
+            ),
+            QApplication.translate('SpatialPreview', 'Cancel'),
+            0,
+            0,
+            self
+        )
+        progress_dlg.setWindowModality(Qt.WindowModal)
+        progress_dlg.setAutoClose(False)
+        progress_dlg.setAutoReset(False)
+
+        self._tile_seeder = TileSeeder(parent=self)
+
+        def on_progress(done, total):
+            progress_dlg.setMaximum(total)
+            progress_dlg.setValue(done)
+
+        def on_finished(downloaded):
+            progress_dlg.close()
+            self._tile_seeder.deleteLater()
+            self._tile_seeder = None
+
+            msg = QApplication.translate(
+                'SpatialPreview',
+                '{0} base map tile(s) downloaded for zoom levels {1} to '
+                '{2}.'.format(downloaded, min_zoom, max_zoom)
+            )
+            self._insert_notification(msg, SUCCESS)
+
+        self._tile_seeder.progress.connect(on_progress)
+        self._tile_seeder.finished.connect(on_finished)
+        progress_dlg.canceled.connect(self._tile_seeder.cancel)
+
+        progress_dlg.show()
+        self._tile_seeder.seed(extent, min_zoom, max_zoom)
+
     def map_extents(self):
         """
         :returns: Current extents of the local map.
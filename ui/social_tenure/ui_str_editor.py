@@ -333,4 +333,5 @@ class Ui_STREditor(object):
         self.label_9.setText(_translate("STREditor", "to", None))
 
 from stdm.ui.property_preview import SpatialPreview
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
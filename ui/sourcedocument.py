@@ -27,11 +27,12 @@ from PyQt4.QtCore import (
     QDir,
     QObject,
     pyqtSignal,
+    pyqtSlot,
     SIGNAL,
     QEvent,
-    QThread,
     QDate,
-    QRect
+    QRect,
+    Qt
 )
 from PyQt4.QtGui import *
 
@@ -40,6 +41,9 @@ import sqlalchemy
 from stdm.utils.filesize import size
 from stdm.utils.util import getIndex
 from stdm.network import (
+    content_document_path,
+    content_extension,
+    is_content_hash,
     NetworkFileManager,
     DocumentTransferWorker
 )
@@ -57,6 +61,7 @@ from stdm.settings import (
 )
 from stdm.data.configuration import entity_model
 from .document_viewer import DocumentViewManager
+from .thumbnail_cache import thumbnail_loader
 from ui_doc_item import Ui_frmDocumentItem
 from stdm.utils.util import (
     get_db_attr,
@@ -138,6 +143,7 @@ class SourceDocumentManager(QObject):
         for cont_id, container in self.containers.iteritems():
             doc_widgets = container.parentWidget().findChildren(DocumentWidget)
             for doc_widget in doc_widgets:
+                doc_widget.disconnect_thumbnail_loader()
                 doc_widget.deleteLater()
                 doc_widget = None
 
@@ -531,6 +537,9 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         self.initGui()
         self.fileInfo = None
         self.fileUUID = None
+        self._transfer_worker = None
+        self._thumbnail_path = None
+        self._thumbnail_connected = False
         self.document_model = document_model
         self.fileManager = fileManager
         self._mode = mode
@@ -617,6 +626,8 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         successfully removed or False if an error was encountered.
         :rtype: bool
         """
+        self.disconnect_thumbnail_loader()
+
         if self._mode == UPLOAD_MODE:
             return self._remove_doc(True)
 
@@ -634,6 +645,8 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         """
 
         if self._mode == UPLOAD_MODE:
+            if not self._transfer_worker is None:
+                self._transfer_worker.wait()
             status = self.fileManager.deleteDocument()
         else:
 
@@ -652,10 +665,20 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
                                      msg)
             return False
 
+        self.disconnect_thumbnail_loader()
+
         if self._mode == DOWNLOAD_MODE:
             #Try to delete document and suppress error if it does not exist
             try:
                 self._srcDoc.delete()
+                # Documents with the same content hash are separate
+                # records, the file is only removed with the last one.
+                if is_content_hash(self._srcDoc.document_identifier):
+                    self.referencesRemoved.emit(self._doc_type_id)
+                    self.deleteLater()
+
+                    return True
+
                 # Remove the same document from supporting
                 # doc table linked to other str record as the file doesn't exist.
                 doc_obj = self.document_model()
@@ -770,6 +793,11 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         Builds the database model for the source document file reference.
         """
         if self._mode == UPLOAD_MODE:
+            #The identifier is only known once the transfer has finished
+            if not self._transfer_worker is None:
+                self._transfer_worker.wait()
+                if not self._transfer_worker.file_uuid is None:
+                    self.fileUUID = str(self._transfer_worker.file_uuid)
 
             entity_doc_obj = self.document_model()
             entity_doc_obj.document_identifier = self.fileUUID
@@ -792,29 +820,66 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         extension = self._displayName[self._displayName.rfind('.'):]
 
         QApplication.processEvents()
-        doc_path = u'{}/{}/{}/{}/{}{}'.format(
-            source_document_location(),
-            unicode(self.curr_profile.name),
-            unicode(self._source_entity),
-            unicode(self.doc_type_value()).replace(' ', '_'),
-            unicode(self.fileUUID),
-            unicode(extension)
-        ).lower()
-
-        ph_image = QImage(doc_path)
-        ph_pixmap = QPixmap.fromImage(ph_image)
-        # If width is larger than height, use height as width and height
-        if ph_pixmap.width() > ph_pixmap.height():
-            rectangle = QRect(0, 0, ph_pixmap.height(), ph_pixmap.height())
-            ph_pixmap = ph_pixmap.copy(rectangle)
-        # If height is larger than width, use width as width and height
-        elif ph_pixmap.height() > ph_pixmap.width():
-            rectangle = QRect(0, 0, ph_pixmap.width(), ph_pixmap.width())
-            ph_pixmap = ph_pixmap.copy(rectangle)
-
-        self.lblThumbnail.setPixmap(ph_pixmap)
+        if is_content_hash(self.fileUUID):
+            doc_path = content_document_path(
+                self.fileManager.networkPath,
+                self.fileUUID,
+                content_extension(self._displayName)
+            )
+        else:
+            doc_path = u'{}/{}/{}/{}/{}{}'.format(
+                source_document_location(),
+                unicode(self.curr_profile.name),
+                unicode(self._source_entity),
+                unicode(self.doc_type_value()).replace(' ', '_'),
+                unicode(self.fileUUID),
+                unicode(extension)
+            ).lower()
+
+        self._thumbnail_path = doc_path
         self.lblThumbnail.setScaledContents(True)
 
+        # The cropped and scaled thumbnail is read in the loader threads
+        loader = thumbnail_loader()
+        ph_image = loader.cached(doc_path)
+        if not ph_image is None:
+            self.disconnect_thumbnail_loader()
+            self.lblThumbnail.setPixmap(QPixmap.fromImage(ph_image))
+
+            return
+
+        self.lblThumbnail.setPixmap(
+            QPixmap(':/plugins/stdm/images/icons/photo_64.png')
+        )
+        if not self._thumbnail_connected:
+            loader.thumbnailLoaded.connect(self._on_thumbnail_loaded)
+            self._thumbnail_connected = True
+        loader.load(self.fileUUID, doc_path)
+
+    def disconnect_thumbnail_loader(self):
+        """
+        Stops receiving the thumbnails read by the shared thumbnail loader.
+        This should be called before the widget is destroyed.
+        """
+        if not self._thumbnail_connected:
+            return
+
+        thumbnail_loader().thumbnailLoaded.disconnect(
+            self._on_thumbnail_loaded
+        )
+        self._thumbnail_connected = False
+
+    @pyqtSlot(unicode, QImage)
+    def _on_thumbnail_loaded(self, doc_path, image):
+        """
+        Slot raised when a thumbnail has been read by the thumbnail loader.
+        """
+        if doc_path != self._thumbnail_path:
+            return
+
+        self.disconnect_thumbnail_loader()
+        self.lblThumbnail.setPixmap(QPixmap.fromImage(image))
+
     def buildDisplay(self):
         """
         Build html text for displaying file information.
@@ -866,10 +931,9 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
             self._docSize = self.fileInfo.size()
             '''
             Create document transfer helper for multi-threading capabilities.
-            Use of queued connections will guarantee that signals and slots are captured
-            in any thread.
+            The transfer runs in the shared transfer thread pool and
+            queued connections deliver its signals in this thread.
             '''
-            workerThread = QThread(self)
             docWorker = DocumentTransferWorker(
                 self.fileManager,
                 self.fileInfo,
@@ -877,17 +941,19 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
                 "%s"%(self._doc_type),
                 self
             )
-            docWorker.moveToThread(workerThread)
 
-            workerThread.started.connect(docWorker.transfer)
-            docWorker.blockWrite.connect(self.onBlockWritten)
-            docWorker.complete.connect(self.onCompleteTransfer)
-            workerThread.finished.connect(docWorker.deleteLater)
-            workerThread.finished.connect(workerThread.deleteLater)
+            docWorker.blockWrite.connect(
+                self.onBlockWritten, Qt.QueuedConnection
+            )
+            docWorker.complete.connect(
+                self.onCompleteTransfer, Qt.QueuedConnection
+            )
+            docWorker.failed.connect(
+                self.onTransferFailed, Qt.QueuedConnection
+            )
+            self._transfer_worker = docWorker
 
-            workerThread.start()
-            # Call transfer() to get fileUUID early
-            #docWorker.transfer()
+            docWorker.start()
             self.fileUUID = docWorker.file_uuid
 
     def onBlockWritten(self,size):
@@ -895,10 +961,12 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         Raised when a block of data is written to the central repository.
         Updates the progress bar with the bytes transferred as a percentage.
         """
-        progress = (size * 100)/self._docSize
+        if self._docSize > 0:
+            progress = (size * 100)/self._docSize
+        else:
+            progress = 100
 
         self.pgBar.setValue(progress)
-        QApplication.processEvents()
 
     def onCompleteTransfer(self, fileid):
         """
@@ -908,6 +976,22 @@ class DocumentWidget(QWidget, Ui_frmDocumentItem):
         self.fileUUID = str(fileid)
         self.fileUploadComplete.emit()
 
+    def onTransferFailed(self, error):
+        """
+        Slot raised when the file could not be transferred.
+        """
+        self.pgBar.setVisible(False)
+        msg = QApplication.translate(
+            "DocumentWidget",
+            "The document could not be copied to the document "
+            "repository.\n{0}"
+        )
+        QMessageBox.critical(
+            self.parent(),
+            QApplication.translate("DocumentWidget", "Upload Document"),
+            msg.format(error)
+        )
+
 def source_document_location(default = "/home"):
     """
     :return: Last used source directory for
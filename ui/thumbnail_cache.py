@@ -0,0 +1,313 @@
+"""
+/***************************************************************************
+Name                 : Document Thumbnail Cache
+Description          : Creates thumbnails of supporting documents in a
+                       thread pool and caches them in memory and on disk.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from PyQt4.QtCore import (
+    pyqtSignal,
+    QDir,
+    QObject,
+    QRect,
+    QRunnable,
+    QSize,
+    QThreadPool
+)
+from PyQt4.QtGui import (
+    QImage,
+    QImageReader
+)
+
+LOGGER = logging.getLogger('stdm')
+
+THUMBNAIL_CACHE_DIR = QDir.home().path() + '/.stdm/cache/thumbnails'
+
+#Width and height of the thumbnails in pixels
+THUMBNAIL_SIZE = 96
+
+#Maximum number of thumbnails retained on disk and in memory
+MAX_CACHE_ENTRIES = 2000
+MAX_MEMORY_ENTRIES = 200
+
+#Maximum number of thumbnails created concurrently
+MAX_LOADER_THREADS = 2
+
+
+def read_thumbnail(path, size=THUMBNAIL_SIZE):
+    """
+    Reads a square thumbnail of the image. The image is cropped to a square
+    at its top left corner and scaled down while it is decoded, so the full
+    resolution image is not loaded into memory.
+    :param path: Absolute path of the image.
+    :type path: str
+    :param size: Width and height of the thumbnail.
+    :type size: int
+    :return: Returns the thumbnail or a null image if the file could not be
+    read.
+    :rtype: QImage
+    """
+    reader = QImageReader(path)
+    img_size = reader.size()
+
+    if img_size.isValid():
+        side = min(img_size.width(), img_size.height())
+        reader.setClipRect(QRect(0, 0, side, side))
+        if side > size:
+            reader.setScaledSize(QSize(size, size))
+
+    return reader.read()
+
+
+class ThumbnailCache(object):
+    """
+    Stores thumbnails in an in-memory LRU and in a directory where the file
+    name is a hash of the document identifier and the modification time of
+    the document.
+    """
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR,
+                 max_entries=MAX_CACHE_ENTRIES,
+                 max_memory_entries=MAX_MEMORY_ENTRIES):
+        self._cache_dir = cache_dir
+        self._max_entries = max_entries
+        self._max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        #The cache is shared by the loader threads
+        self._lock = threading.Lock()
+        self._puts = 0
+
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    @staticmethod
+    def key(identifier, mtime, size=THUMBNAIL_SIZE):
+        """
+        :return: Returns the key of the thumbnail of a document.
+        :rtype: str
+        """
+        digest = hashlib.sha1()
+        digest.update(u'{0}\0{1!r}\0{2}'.format(
+            identifier, mtime, size).encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def path(self, key):
+        """
+        :return: Returns the absolute path of the thumbnail file.
+        :rtype: str
+        """
+        return u'{0}/{1}.png'.format(self._cache_dir, key)
+
+    def memory_image(self, doc_path):
+        """
+        :param doc_path: Absolute path of the document.
+        :type doc_path: str
+        :return: Returns the thumbnail of the document if it is in memory,
+        else None.
+        :rtype: QImage
+        """
+        with self._lock:
+            image = self._memory.pop(doc_path, None)
+            if not image is None:
+                self._memory[doc_path] = image
+
+        return image
+
+    def _remember(self, doc_path, image):
+        with self._lock:
+            self._memory.pop(doc_path, None)
+            self._memory[doc_path] = image
+
+            while len(self._memory) > self._max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def thumbnail(self, identifier, doc_path, size=THUMBNAIL_SIZE):
+        """
+        Returns the thumbnail of the document from memory, from disk or by
+        reading the document.
+        :param identifier: Unique identifier of the document.
+        :type identifier: str
+        :param doc_path: Absolute path of the document.
+        :type doc_path: str
+        :return: Returns the thumbnail or a null image if the document is
+        not an image or could not be read.
+        :rtype: QImage
+        """
+        image = self.memory_image(doc_path)
+        if not image is None:
+            return image
+
+        try:
+            mtime = os.path.getmtime(doc_path)
+
+        except OSError:
+            return QImage()
+
+        thumb_path = self.path(self.key(identifier, mtime, size))
+        image = QImage()
+        if os.path.isfile(thumb_path) and image.load(thumb_path):
+            #Mark as recently used
+            try:
+                os.utime(thumb_path, None)
+
+            except OSError:
+                pass
+
+        else:
+            image = read_thumbnail(doc_path, size)
+            if not image.isNull():
+                self._put(thumb_path, image)
+
+        if not image.isNull():
+            self._remember(doc_path, image)
+
+        return image
+
+    def _put(self, thumb_path, image):
+        if not image.save(thumb_path, 'PNG'):
+            LOGGER.debug(u'Could not write thumbnail {0}'.format(thumb_path))
+
+            return
+
+        #The number of files is only checked periodically
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % 50 == 1
+
+        if evict:
+            self._evict(thumb_path)
+
+    def clear(self):
+        """
+        Removes all thumbnails from memory and disk.
+        """
+        with self._lock:
+            self._memory.clear()
+
+        for thumb_path in glob.glob(u'{0}/*'.format(self._cache_dir)):
+            self._remove(thumb_path)
+
+    def _evict(self, keep_path):
+        thumb_paths = glob.glob(u'{0}/*'.format(self._cache_dir))
+        excess = len(thumb_paths) - self._max_entries
+        if excess <= 0:
+            return
+
+        thumb_paths.sort(key=self._mtime)
+        for thumb_path in thumb_paths:
+            if excess <= 0:
+                break
+
+            if thumb_path == keep_path:
+                continue
+
+            self._remove(thumb_path)
+            excess -= 1
+
+    def _mtime(self, thumb_path):
+        try:
+            return os.path.getmtime(thumb_path)
+
+        except OSError:
+            return time.time()
+
+    def _remove(self, thumb_path):
+        try:
+            os.remove(thumb_path)
+
+        except OSError as ex:
+            LOGGER.debug('Could not remove cached thumbnail. {}'.format(ex))
+
+
+class _ThumbnailTask(QRunnable):
+    def __init__(self, loader, identifier, doc_path):
+        QRunnable.__init__(self)
+        self._loader = loader
+        self._identifier = identifier
+        self._doc_path = doc_path
+
+    def run(self):
+        self._loader._load(self._identifier, self._doc_path)
+
+
+class ThumbnailLoader(QObject):
+    """
+    Creates document thumbnails in a thread pool. The 'thumbnailLoaded'
+    signal is emitted with the document path and thumbnail, it is delivered
+    to receivers in the main thread through a queued connection.
+    """
+    thumbnailLoaded = pyqtSignal(unicode, QImage)
+
+    def __init__(self, cache=None, parent=None):
+        QObject.__init__(self, parent)
+        if cache is None:
+            cache = ThumbnailCache()
+
+        self._cache = cache
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(MAX_LOADER_THREADS)
+
+    def cached(self, doc_path):
+        """
+        :return: Returns the thumbnail of the document if it is in memory,
+        else None.
+        :rtype: QImage
+        """
+        return self._cache.memory_image(doc_path)
+
+    def load(self, identifier, doc_path):
+        """
+        Queues the creation of the thumbnail of the document.
+        :param identifier: Unique identifier of the document.
+        :type identifier: str
+        :param doc_path: Absolute path of the document.
+        :type doc_path: str
+        """
+        self._pool.start(_ThumbnailTask(self, identifier, doc_path))
+
+    def _load(self, identifier, doc_path):
+        try:
+            image = self._cache.thumbnail(identifier, doc_path)
+
+        except Exception as ex:
+            LOGGER.debug(u'Could not create thumbnail. {0}'.format(ex))
+            image = QImage()
+
+        self.thumbnailLoaded.emit(doc_path, image)
+
+
+_THUMBNAIL_LOADER = None
+
+
+def thumbnail_loader():
+    """
+    :return: Returns the thumbnail loader shared by the document widgets.
+    :rtype: ThumbnailLoader
+    """
+    global _THUMBNAIL_LOADER
+
+    if _THUMBNAIL_LOADER is None:
+        _THUMBNAIL_LOADER = ThumbnailLoader()
+
+    return _THUMBNAIL_LOADER
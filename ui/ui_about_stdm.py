@@ -75,4 +75,5 @@ class Ui_frmAbout(object):
         self.btnSTDMHome.setText(_translate("frmAbout", "STDM Home Page", None))
         self.btnContactUs.setText(_translate("frmAbout", "Contact Us", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
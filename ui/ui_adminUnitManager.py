@@ -84,4 +84,5 @@ class Ui_frmAdminUnitManager(object):
         self.label_2.setText(QtGui.QApplication.translate("frmAdminUnitManager", "Code", None, QtGui.QApplication.UnicodeUTF8))
 
 from customcontrols import ValidatingLineEdit
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
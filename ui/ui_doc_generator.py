@@ -107,6 +107,9 @@ class Ui_DocumentGeneratorDialog(object):
         self.chkUseOutputFolder = QtGui.QCheckBox(DocumentGeneratorDialog)
         self.chkUseOutputFolder.setObjectName(_fromUtf8("chkUseOutputFolder"))
         self.horizontalLayout.addWidget(self.chkUseOutputFolder)
+        self.chkChangedOnly = QtGui.QCheckBox(DocumentGeneratorDialog)
+        self.chkChangedOnly.setObjectName(_fromUtf8("chkChangedOnly"))
+        self.horizontalLayout.addWidget(self.chkChangedOnly)
         spacerItem = QtGui.QSpacerItem(150, 20, QtGui.QSizePolicy.Fixed, QtGui.QSizePolicy.Minimum)
         self.horizontalLayout.addItem(spacerItem)
         self.btnShowOutputFolder = QtGui.QPushButton(DocumentGeneratorDialog)
@@ -131,7 +134,10 @@ class Ui_DocumentGeneratorDialog(object):
         self.groupBox.setTitle(_translate("DocumentGeneratorDialog", "Template:", None))
         self.btnSelectTemplate.setText(_translate("DocumentGeneratorDialog", "Select document template", None))
         self.chkUseOutputFolder.setText(_translate("DocumentGeneratorDialog", "Save to output folder", None))
+        self.chkChangedOnly.setToolTip(_translate("DocumentGeneratorDialog", "Skip documents whose template and data have not changed since they were last generated", None))
+        self.chkChangedOnly.setText(_translate("DocumentGeneratorDialog", "Regenerate changed only", None))
         self.btnShowOutputFolder.setText(_translate("DocumentGeneratorDialog", "Open output folder...", None))
 
 from customcontrols import ModelAtrributesView
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -107,4 +107,5 @@ class Ui_frmDocumentItem(object):
         frmDocumentItem.setWindowTitle(_translate("frmDocumentItem", "Form", None))
         self.lblClose.setToolTip(_translate("frmDocumentItem", "Remove Document", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -87,4 +87,5 @@ class Ui_DetailsDock(object):
         self.view_document_btn.setToolTip(_translate("DetailsDock", "View record supporting documents", None))
         self.view_document_btn.setText(_translate("DetailsDock", "...", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -125,4 +125,5 @@ class Ui_ImageExportSettings(object):
         self.btn_color.setText(QtGui.QApplication.translate("ImageExportSettings", "...", None, QtGui.QApplication.UnicodeUTF8))
 
 from qgis.gui import QgsColorButtonV2
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -80,4 +80,5 @@ class Ui_frmLogin(object):
         self.label.setText(_translate("frmLogin", "Username", None))
         self.label_2.setText(_translate("frmLogin", "Password", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -101,4 +101,5 @@ class Ui_frmNotificationItem(object):
         frmNotificationItem.setWindowTitle(_translate("frmNotificationItem", "Form", None))
         self.lblClose.setToolTip(_translate("frmNotificationItem", "Close Message", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
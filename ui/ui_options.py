@@ -218,4 +218,5 @@ class Ui_DlgOptions(object):
         self.upgradeButton.setText(_translate("DlgOptions", "Upgrade", None))
         self.label_9.setText(_translate("DlgOptions", "Upgrade STDM Configuration to 1.4 ", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
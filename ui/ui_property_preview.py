@@ -42,6 +42,9 @@ class Ui_frmPropertyPreview(object):
         self.web.setObjectName(_fromUtf8("web"))
         self.gridLayout_3 = QtGui.QGridLayout(self.web)
         self.gridLayout_3.setObjectName(_fromUtf8("gridLayout_3"))
+        self.btnSeedCache = QtGui.QPushButton(self.web)
+        self.btnSeedCache.setObjectName(_fromUtf8("btnSeedCache"))
+        self.gridLayout_3.addWidget(self.btnSeedCache, 5, 2, 1, 1)
         self.btnSync = QtGui.QPushButton(self.web)
         self.btnSync.setObjectName(_fromUtf8("btnSync"))
         self.gridLayout_3.addWidget(self.btnSync, 4, 2, 1, 1)
@@ -120,6 +123,8 @@ class Ui_frmPropertyPreview(object):
     def retranslateUi(self, frmPropertyPreview):
         frmPropertyPreview.setWindowTitle(_translate("frmPropertyPreview", "Spatial Preview", None))
         frmPropertyPreview.setTabText(frmPropertyPreview.indexOf(self.local), _translate("frmPropertyPreview", "Local", None))
+        self.btnSeedCache.setToolTip(_translate("frmPropertyPreview", "Download base map tiles for the extent of the spatial units", None))
+        self.btnSeedCache.setText(_translate("frmPropertyPreview", "Cache Tiles", None))
         self.btnSync.setToolTip(_translate("frmPropertyPreview", "Sync extents of web view with local view", None))
         self.btnSync.setText(_translate("frmPropertyPreview", "Sync", None))
         self.btnResetMap.setToolTip(_translate("frmPropertyPreview", "Zoom to spatial unit extents", None))
@@ -133,4 +138,5 @@ class Ui_frmPropertyPreview(object):
 
 from PyQt4 import QtWebKit
 from mirror_map import MirrorMap
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
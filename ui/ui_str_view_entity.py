@@ -95,4 +95,5 @@ class Ui_frmSTRViewEntity(object):
         self.lable_3.setText(_translate("frmSTRViewEntity", "to", None))
         self.tbSTRViewEntity.setTabText(self.tbSTRViewEntity.indexOf(self.validity), _translate("frmSTRViewEntity", "Validity Period", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -115,4 +115,5 @@ class Ui_UpgradePaths(object):
         self.btn_output.setToolTip(_translate("UpgradePaths", "Choose output directory", None))
         self.btn_output.setText(_translate("UpgradePaths", "...", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
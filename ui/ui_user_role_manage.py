@@ -125,4 +125,5 @@ class Ui_frmSysManageAccounts(object):
         self.label.setText(_translate("frmSysManageAccounts", "<html><head/><body><p>Click on a role in the table on the left-hand side below then check/uncheck the users in the table on the right-hand side to add/remove them in this role.</p></body></html>", None))
         self.tbUserRole.setTabText(self.tbUserRole.indexOf(self.tab_3), _translate("frmSysManageAccounts", "Mappings", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
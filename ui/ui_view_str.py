@@ -166,4 +166,5 @@ class Ui_frmManageSTR(object):
         self.tb_actions.setWindowTitle(_translate("frmManageSTR", "toolBar", None))
 
 from .property_preview import SpatialPreview
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
@@ -64,7 +64,8 @@ from PyQt4.QtCore import (
     Qt
 )
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
 from stdm.ui.image_export_settings import ImageExportSettings
 
 class Arrow(QGraphicsLineItem):
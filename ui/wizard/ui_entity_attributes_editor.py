@@ -95,4 +95,5 @@ class Ui_EntityAttributesEditor(object):
         self.groupBox.setTitle(QtGui.QApplication.translate("EntityAttributesEditor", "Attributes:", None, QtGui.QApplication.UnicodeUTF8))
 
 from stdm.ui.wizard.attributes_table_view import AttributesTableView
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
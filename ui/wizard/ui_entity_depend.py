@@ -91,4 +91,5 @@ class Ui_dlgEntityDepend(object):
         self.btnCancel.setText(_translate("dlgEntityDepend", "Cancel", None))
         self.btnDelete.setText(_translate("dlgEntityDepend", "Delete entity", None))
 
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
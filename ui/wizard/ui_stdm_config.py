@@ -695,4 +695,5 @@ from stdm.ui.wizard.party_list_view import STRPartyListView
 from qgis.gui import QgsCollapsibleGroupBox
 from stdm.ui.wizard.profile_tenure_view import ProfileTenureDiagram
 from spatial_unit_list_view import STRSpatialUnitListView
-from stdm import resources_rc
+from stdm.utils.resources import register_resources
+register_resources()
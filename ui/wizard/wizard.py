@@ -34,6 +34,8 @@ from PyQt4.QtGui import *
 from PyQt4.QtCore import *
 from PyQt4.QtXml import QDomDocument
 
+from sqlalchemy.exc import SQLAlchemyError
+
 from stdm.data.configuration.stdm_configuration import (
         StdmConfiguration, 
         Profile
@@ -1263,21 +1265,26 @@ class ConfigWizard(QWizard, Ui_STDMWizard):
             profile = self.current_profile()
             profile.description = self.edtDesc.text()
 
-            # before any updates, backup your current working profile
-            self.backup_config_file()
-
             #* commit config to DB
             self.config_updater = ConfigurationSchemaUpdater()
 
-            ##*Thread to handle schema updating
-            self.updater_thread = QThread(self)
-            self.config_updater.moveToThread(self.updater_thread)
-
             ##*Connect schema updater slots
             self.config_updater.update_started.connect(self.config_update_started)
             self.config_updater.update_progress.connect(self.config_update_progress)
             self.config_updater.update_completed.connect(self.config_update_completed)
 
+            # show the changes to the database before they are applied
+            self.update_plan = self.schema_update_plan()
+            if self.update_plan is None:
+                return False
+
+            # before any updates, backup your current working profile
+            self.backup_config_file()
+
+            ##*Thread to handle schema updating
+            self.updater_thread = QThread(self)
+            self.config_updater.moveToThread(self.updater_thread)
+
             ##*Connect thread signals
             self.updater_thread.started.connect(self._updater_thread_started)
             self.updater_thread.finished.connect(self.updater_thread.deleteLater)
@@ -1303,6 +1310,44 @@ class ConfigWizard(QWizard, Ui_STDMWizard):
 
         return validPage
 
+    def schema_update_plan(self):
+        """
+        Computes the changes to the database and shows them to the user
+        before they are applied.
+        :return: Returns the schema update plan if the user confirmed the
+        changes, else None.
+        :rtype: SchemaUpdatePlan
+        """
+        try:
+            plan = self.config_updater.plan()
+
+        except SQLAlchemyError as sae:
+            self.show_message(unicode(sae))
+
+            return None
+
+        msgbox = QMessageBox(self)
+        msgbox.setIcon(QMessageBox.Question)
+        msgbox.setWindowTitle(self.tr("STDM Configuration Wizard"))
+        msgbox.setText(
+            self.tr("{0} update steps will be applied to the database. "
+                    "Do you want to continue?").format(len(plan))
+        )
+        msgbox.setInformativeText(
+            self.tr("Lookup values and social tenure views are written "
+                    "after the other changes have been committed. If "
+                    "writing them fails, the database is left partially "
+                    "updated.")
+        )
+        msgbox.setDetailedText(u'\n\n'.join(plan.preview()))
+        msgbox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        msgbox.setDefaultButton(QMessageBox.Yes)
+
+        if msgbox.exec_() != QMessageBox.Yes:
+            return None
+
+        return plan
+
     def pause_wizard_dialog(self):
         """
         Pause the wizard before closing to allow user to 
@@ -1371,7 +1416,7 @@ class ConfigWizard(QWizard, Ui_STDMWizard):
         """
         Slot for initiating the schema updating process.
         """
-        self.config_updater.exec_()
+        self.config_updater.exec_(plan=self.update_plan)
 
     def config_update_started(self):
         self.button(QWizard.FinishButton).setEnabled(False)
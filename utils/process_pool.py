@@ -0,0 +1,46 @@
+"""
+/***************************************************************************
+Name                 : Process Pool
+Description          : Checks whether work can be shared with a pool of
+                       forked processes.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import sys
+
+from PyQt4.QtCore import QCoreApplication
+from PyQt4.QtGui import QApplication
+
+
+def process_pool_supported():
+    """
+    Checks whether a multiprocessing pool can be used by the current
+    process. Pool processes are forked from the current process, which is
+    not safe in the QGIS desktop where the GUI, GDAL and database threads
+    are running. On Windows, the pool processes would start another QGIS
+    executable. If a pool cannot be used, the work should be done in the
+    current process.
+    :return: True if the current process is not a GUI application and is
+    not running on Windows, else False.
+    :rtype: bool
+    """
+    if sys.platform == 'win32':
+        return False
+
+    app = QCoreApplication.instance()
+    if app is None:
+        return True
+
+    return QApplication.type() == QApplication.Tty
@@ -0,0 +1,266 @@
+"""
+/***************************************************************************
+Name                 : Startup Profiler
+Description          : Times the phases of the login and module loading in
+                       nested spans, counts the SQL statements executed in
+                       each span and reports the results.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from qgis.core import QgsMessageLog
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from stdm import LOG_DIR
+
+LOGGER = logging.getLogger('stdm')
+
+#Tag of the STDM tab in the QGIS log panel
+LOG_PANEL_TAG = 'STDM'
+
+#Number of SQL statements executed by all engines
+_SQL_COUNT = [0]
+_SQL_LISTENER_INSTALLED = [False]
+
+
+def _on_cursor_execute(conn, cursor, statement, parameters, context,
+                       executemany):
+    _SQL_COUNT[0] += 1
+
+
+def _install_sql_listener():
+    if _SQL_LISTENER_INSTALLED[0]:
+        return
+
+    event.listen(Engine, 'before_cursor_execute', _on_cursor_execute)
+    _SQL_LISTENER_INSTALLED[0] = True
+
+
+def sql_count():
+    """
+    :return: Returns the number of SQL statements executed since the first
+    profiler was enabled.
+    :rtype: int
+    """
+    return _SQL_COUNT[0]
+
+
+class ProfileSpan(object):
+    """
+    Duration and number of SQL statements of a phase and its nested
+    phases.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.sql_start = sql_count()
+        self.sql_end = None
+        self.children = []
+
+    def close(self):
+        self.end = time.time()
+        self.sql_end = sql_count()
+
+    def duration(self):
+        """
+        :return: Returns the duration of the span in seconds.
+        :rtype: float
+        """
+        end = self.end
+        if end is None:
+            end = time.time()
+
+        return end - self.start
+
+    def sql_statements(self):
+        """
+        :return: Returns the number of SQL statements executed in the span.
+        :rtype: int
+        """
+        sql_end = self.sql_end
+        if sql_end is None:
+            sql_end = sql_count()
+
+        return sql_end - self.sql_start
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'seconds': round(self.duration(), 3),
+            'sql': self.sql_statements(),
+            'children': [c.to_dict() for c in self.children]
+        }
+
+
+class StartupProfiler(object):
+    """
+    Records nested spans for the phases of a process such as the login. A
+    disabled profiler does not record anything so that the spans can be
+    left in the code.
+    """
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self._roots = []
+        self._stack = []
+        self._info = {}
+
+        if self.enabled:
+            _install_sql_listener()
+
+    def begin(self, name):
+        """
+        Starts a span nested in the current span.
+        :param name: Name of the phase.
+        :type name: str
+        """
+        if not self.enabled:
+            return
+
+        span = ProfileSpan(name)
+        if len(self._stack) > 0:
+            self._stack[-1].children.append(span)
+        else:
+            self._roots.append(span)
+
+        self._stack.append(span)
+
+    def end(self):
+        """
+        Closes the current span.
+        """
+        if not self.enabled or len(self._stack) == 0:
+            return
+
+        self._stack.pop().close()
+
+    @contextmanager
+    def span(self, name):
+        """
+        Context manager for timing a phase.
+        """
+        self.begin(name)
+
+        try:
+            yield
+
+        finally:
+            self.end()
+
+    def set_info(self, key, value):
+        """
+        Adds information, such as the profile name, that is included in the
+        report to compare runs.
+        """
+        self._info[key] = value
+
+    def report(self):
+        """
+        :return: Returns the spans and information of the run.
+        :rtype: dict
+        """
+        total = 0
+        sql = 0
+        if len(self._roots) > 0:
+            total = self._roots[-1].start - self._roots[0].start + \
+                    self._roots[-1].duration()
+            sql = sum([s.sql_statements() for s in self._roots])
+
+        return {
+            'name': self.name,
+            'date': datetime.now().isoformat(),
+            'seconds': round(total, 3),
+            'sql': sql,
+            'info': self._info,
+            'spans': [s.to_dict() for s in self._roots]
+        }
+
+    def report_text(self):
+        """
+        :return: Returns the report as indented lines of text.
+        :rtype: str
+        """
+        report = self.report()
+        lines = [u'{0}: {1:.3f}s, {2} SQL statement(s)'.format(
+            self.name, report['seconds'], report['sql']
+        )]
+
+        def add_lines(spans, depth):
+            for s in spans:
+                lines.append(u'{0}{1}: {2:.3f}s, {3} SQL'.format(
+                    u'  ' * depth, s['name'], s['seconds'], s['sql']
+                ))
+                add_lines(s['children'], depth + 1)
+
+        add_lines(report['spans'], 1)
+
+        return u'\n'.join(lines)
+
+    def write(self, log_dir=LOG_DIR):
+        """
+        Writes the report to a JSON file in the log directory.
+        :return: Returns the path of the file or None if it could not be
+        written.
+        :rtype: str
+        """
+        file_name = u'{0}_profile_{1}.json'.format(
+            self.name, datetime.now().strftime('%Y%m%d_%H%M%S')
+        )
+        path = u'{0}/{1}'.format(log_dir, file_name)
+
+        try:
+            if not os.path.isdir(log_dir):
+                os.makedirs(log_dir)
+
+            with open(path, 'wb') as f:
+                json.dump(self.report(), f, indent=1, sort_keys=True)
+
+        except (IOError, OSError) as ex:
+            LOGGER.debug(u'Could not write profile report. {0}'.format(ex))
+
+            return None
+
+        return path
+
+    def finish(self):
+        """
+        Closes the open spans, shows the report in the QGIS log panel and
+        writes it to the log directory. Nothing is reported if the
+        profiler is disabled or no span was recorded.
+        """
+        if not self.enabled:
+            return
+
+        while len(self._stack) > 0:
+            self.end()
+
+        if len(self._roots) == 0:
+            return
+
+        text = self.report_text()
+        path = self.write()
+        if not path is None:
+            text = u'{0}\n{1}'.format(text, path)
+
+        QgsMessageLog.logMessage(text, LOG_PANEL_TAG, QgsMessageLog.INFO)
@@ -0,0 +1,69 @@
+"""
+/***************************************************************************
+Name                 : Qt Resources
+Description          : Registers the STDM icons and images with the Qt
+                       resource system from the compiled resource file.
+Date                 : 18/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import os
+
+from PyQt4.QtCore import QResource
+
+LOGGER = logging.getLogger('stdm')
+
+#Binary resource file compiled from resources.qrc by resources_rcc.bat
+RESOURCE_FILE = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, 'resources.rcc')
+)
+
+_REGISTERED = [False]
+
+
+def register_resources():
+    """
+    Registers the STDM resources the first time it is called. The binary
+    resource file is mapped by Qt without being parsed by Python. If it
+    has not been compiled, the resources_rc module is imported instead.
+    """
+    if _REGISTERED[0]:
+        return
+
+    if os.path.isfile(RESOURCE_FILE) and \
+            QResource.registerResource(RESOURCE_FILE):
+        _REGISTERED[0] = True
+
+        return
+
+    LOGGER.debug('Could not register {0}, the resources module will be '
+                 'used.'.format(RESOURCE_FILE))
+
+    from stdm import resources_rc
+
+    _REGISTERED[0] = True
+
+
+def unregister_resources():
+    """
+    Unregisters the binary resource file when the plugin is unloaded.
+    """
+    if not _REGISTERED[0]:
+        return
+
+    if os.path.isfile(RESOURCE_FILE):
+        QResource.unregisterResource(RESOURCE_FILE)
+
+    _REGISTERED[0] = False
@@ -591,8 +591,8 @@ def lookup_parent_entity(profile, col):
     #     if r.child_column == col and 'check_' in r.parent.name:
     #         print vars(r.parent)
     parent_entity = [
-        r.parent for r in profile.relations.values()
-        if r.child_column == col and 'check_' in r.parent.name
+        r.parent for r in profile.child_column_relations(col)
+        if 'check_' in r.parent.name
     ]
     if len(parent_entity) > 0:
         return parent_entity[0]
@@ -614,7 +614,7 @@ def lookup_id_to_value(profile, col, id):
     value if no match is found.
     :rtype: Integer or String
     """
-    if col in profile_lookup_columns(profile):
+    if len(profile.child_column_relations(col)) > 0:
         parent_entity = lookup_parent_entity(profile, col)
 
         if parent_entity is not None: